@@ -1,4 +1,6 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+import json
+import time
+from flask import Flask, render_template, request, redirect, url_for, session, flash, g, jsonify, abort, Response
 import pymysql
 import entity.patient as patient_module
 import entity.department as department_module
@@ -7,29 +9,145 @@ import entity.prescription as prescription_module
 import entity.payment as payment_module
 import entity.doctor as doctor_module
 import entity.drug as drug_module
+import entity.slot as slot_module
+import entity.summary as summary_module
 import setup
+from config import (DB_BACKEND, DB_CONFIG, SQLITE_CONFIG, POOL_CONFIG, CACHE_CONFIG, METRICS_CONFIG,
+                    SLOW_QUERY_CONFIG, QUERY_DETECTOR_CONFIG, DRUG_INDEX_CONFIG, ASSIGNMENT_CONFIG,
+                    SLOT_CONFIG, EVENT_CONFIG)
+from db.backend import create_backend
+from db.pagination import page_size, DEFAULT_PAGE_SIZE
+from db import export
+from db.cache import query_cache
+from db.instrument import InstrumentedCursor, QueryStats
+from db.slowlog import SlowQueryLog
+from db import querywatch
+from db.identity import IdentityMap
+from search.drugs import drug_index
+from schedule.assignment import doctor_assigner
+from schedule.slots import slot_index
+from events import event_bus, doctor_topic
+from log import get_logger
+from metrics import AppMetrics
 
 app = Flask(__name__)
+logger = get_logger(__name__)
 app.secret_key = 'your-secret-key-here-change-in-production'  # Change this in production
 
 registration_fee = 50  # 挂号费用
-
-# 配置数据库连接
-config = {
-    'host': '124.70.86.207',
-    'port': 3306,
-    'user': 'u23371057',
-    'password': 'Aa727319',
-    'database': 'try_db23371057',
-    'charset': 'utf8mb4',
-    'cursorclass': pymysql.cursors.DictCursor,
-    'autocommit': True
-}
+prescription_line_count = 5  # 开具处方页面的处方明细行数
+drug_suggestion_limit = 20  # 药品联想最多返回的条数
+weekday_names = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']  # 出诊时段模板的星期
+
+# 数据库连接池，所有请求共享
+backend = create_backend(DB_BACKEND, mysql_config=DB_CONFIG, sqlite_config=SQLITE_CONFIG)
+pool = backend.create_pool(**POOL_CONFIG)
+query_cache.configure(**CACHE_CONFIG)
+drug_index.configure(**DRUG_INDEX_CONFIG)
+doctor_assigner.configure(**{key: value for key, value in ASSIGNMENT_CONFIG.items() if key != 'enabled'})
+slot_index.configure(**SLOT_CONFIG)
+event_bus.configure(queue_size=EVENT_CONFIG['queue_size'], max_subscribers=EVENT_CONFIG['max_connections'])
+
+# 运行指标，通过 /metrics 输出
+metrics = AppMetrics(pool, query_cache, METRICS_CONFIG['max_fingerprints']) if METRICS_CONFIG['enabled'] else None
+
+# 慢查询日志（可选）
+slow_query_log = None
+if SLOW_QUERY_CONFIG['enabled']:
+    slow_query_log = SlowQueryLog(explain_prefix=backend.explain_prefix,
+                                  **{key: value for key, value in SLOW_QUERY_CONFIG.items() if key != 'enabled'})
 
 def get_db_cursor():
-    """获取数据库游标"""
-    connection = pymysql.connect(**config)
-    return connection.cursor()
+    """获取数据库游标（同一请求内复用从连接池借出的连接，请求结束时归还）"""
+    if 'db_connection' not in g:
+        g.db_connection = pool.acquire()
+    cursor = g.db_connection.cursor()
+    if 'query_stats' in g:
+        route = request.url_rule.rule if request.url_rule else None
+        cursor = InstrumentedCursor(cursor, g.query_stats, g.query_listeners, {'route': route}, g.identity_map)
+    return cursor
+
+@app.before_request
+def start_request_metrics():
+    """请求开始时计时，并为本请求创建 SQL 执行统计与标识映射"""
+    g.request_started = time.perf_counter()
+    g.query_stats = QueryStats()
+    g.identity_map = IdentityMap()
+    g.query_detector = None
+    if QUERY_DETECTOR_CONFIG['enabled'] or querywatch.capturing():
+        g.query_detector = querywatch.RedundantQueryDetector(QUERY_DETECTOR_CONFIG['same_shape_threshold'],
+                                                             QUERY_DETECTOR_CONFIG['stack_depth'])
+    g.query_listeners = tuple(listener for listener in (slow_query_log, g.query_detector) if listener is not None)
+
+@app.after_request
+def remember_response_status(response):
+    g.response_status = response.status_code
+    return response
+
+@app.teardown_request
+def record_request_metrics(exception):
+    """请求结束时把耗时与 SQL 统计合并到全局指标，并报告重复查询"""
+    if 'request_started' not in g:
+        return
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    if metrics is not None:
+        metrics.observe_request(route, request.method, g.get('response_status', 500),
+                                time.perf_counter() - g.request_started, g.query_stats, exception)
+    if g.query_detector is not None and QUERY_DETECTOR_CONFIG['enabled']:
+        report = g.query_detector.report()
+        if report:
+            logger.warning("%s %s 存在重复查询:\n%s", request.method, request.path, report)
+    querywatch.publish(g.query_stats, g.query_detector)
+
+@app.teardown_appcontext
+def release_db_connection(exception):
+    """请求结束时将连接归还连接池"""
+    connection = g.pop('db_connection', None)
+    if connection is not None:
+        pool.release(connection)
+
+def get_page_args():
+    """读取分页参数 after/before/limit，返回可直接传给 query_* 的关键字参数"""
+    return {
+        'after_id': request.args.get('after', type=int),
+        'before_id': request.args.get('before', type=int),
+        'limit': page_size(request.args.get('limit', type=int)),
+    }
+
+def page_links(rows, key, page, **params):
+    """
+    生成上一页/下一页链接
+
+    Args:
+        rows: 当前页记录（按主键升序）
+        key: 主键字段名
+        page: get_page_args() 的返回值
+        **params: 翻页时需要保留的其他查询参数
+
+    Returns:
+        dict: {'prev': 上一页链接或None, 'next': 下一页链接或None}
+    """
+    after_id, before_id, limit = page['after_id'], page['before_id'], page['limit']
+    if 'limit' in request.args:
+        params['limit'] = limit
+
+    def link(**cursor):
+        return url_for(request.endpoint, **(request.view_args or {}), **params, **cursor)
+
+    if not rows:
+        # 翻过了头：只提供返回的方向
+        return {
+            'prev': link(before=after_id + 1) if after_id else None,
+            'next': link(after=before_id - 1) if before_id else None,
+        }
+
+    full = len(rows) >= limit
+    has_prev = bool(after_id) or (bool(before_id) and full)
+    has_next = bool(before_id) or full
+    return {
+        'prev': link(before=rows[0][key]) if has_prev else None,
+        'next': link(after=rows[-1][key]) if has_next else None,
+    }
 
 # 主页路由
 @app.route('/')
@@ -45,15 +163,22 @@ def patient_home():
 @app.route('/patient/query', methods=['GET', 'POST'])
 def patient_query():
     results = []
-    if request.method == 'POST':
+    pages = None
+    # 同时接受表单提交与翻页链接中的查询参数
+    query_type = request.values.get('query_type')
+    query_key = request.values.get('query_key')
+    
+    if query_type in ('patient_id', 'name', 'phone_number') and query_key:
         cursor = get_db_cursor()
-        query_type = request.form.get('query_type')
-        query_key = request.form.get('query_key')
-        
-        if query_type and query_key:
-            results = patient_module.query_patient(cursor, **{query_type: query_key})
+        if query_type == 'name':
+            # 姓名支持拼音与首字母，按匹配程度排序，只返回最相关的一页
+            results = patient_module.search_patient(cursor, query_key, limit=DEFAULT_PAGE_SIZE)
+        else:
+            page = get_page_args()
+            results = patient_module.query_patient(cursor, **{query_type: query_key}, **page)
+            pages = page_links(results, 'patient_id', page, query_type=query_type, query_key=query_key)
     
-    return render_template('patient/query.html', results=results)
+    return render_template('patient/query.html', results=results, pages=pages)
 
 @app.route('/patient/register', methods=['GET', 'POST'])
 def patient_register():
@@ -97,9 +222,45 @@ def patient_dashboard():
     
     cursor = get_db_cursor()
     patient_id = session['patient_id']
-    patient_info = patient_module.query_patient(cursor, patient_id=patient_id)
+    # 资料、未结束的挂号、待缴费用与最近处方一次查询取得
+    summary = summary_module.query_patient_summary(cursor, patient_id)
+    
+    return render_template('patient/dashboard.html', summary=summary,
+                           status_labels=registration_module.STATUS_LABELS)
+
+@app.route('/patient/summary')
+def patient_summary():
+    """
+    病人概览 JSON：资料、未结束的挂号、待缴费用与合计、最近处方
     
-    return render_template('patient/dashboard.html', patient=patient_info[0] if patient_info else None)
+    响应带 ETag（病人的概览版本号），请求带 If-None-Match 且版本号未变化时只做一次主键读取并返回 304
+    """
+    if 'patient_id' not in session or session.get('user_type') != 'patient':
+        return jsonify({'error': '请先登录'}), 401
+    
+    cursor = get_db_cursor()
+    patient_id = session['patient_id']
+    if request.if_none_match:
+        version = summary_module.get_summary_version(cursor, patient_id)
+        if version is not None and request.if_none_match.contains(f'{patient_id}-{version}'):
+            response = Response(status=304)
+            response.set_etag(f'{patient_id}-{version}')
+            return response
+    
+    summary = summary_module.query_patient_summary(cursor, patient_id)
+    if summary is None:
+        return jsonify({'error': '病人不存在'}), 404
+    
+    version = summary.pop('version')
+    response = jsonify(summary)
+    if version is None:
+        # 升级前注册的病人还没有版本号，建立后下次访问即可使用 ETag
+        summary_module.init_summary_version(cursor, patient_id)
+    else:
+        response.set_etag(f'{patient_id}-{version}')
+    # 浏览器每次都带 If-None-Match 重新验证
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 @app.route('/patient/update', methods=['GET', 'POST'])
 def patient_update():
@@ -146,13 +307,43 @@ def patient_create_registration():
     
     if request.method == 'POST':
         department_id = request.form.get('department_id')
-        registration_module.create_registration(cursor, patient_id, int(department_id))
-        flash('挂号成功', 'success')
+        
+        # 预约：占用科室最早的空闲时段，挂号直接分配给该时段的医生
+        if request.form.get('mode') == 'appointment':
+            result = slot_module.book_next_slot(cursor, patient_id, int(department_id), registration_fee)
+            if result:
+                flash(f"预约成功：{result['start']:%Y-%m-%d %H:%M}，医生工号 {result['doctor_id']}，"
+                      f"挂号编号 {result['registration_id']}", 'success')
+                return redirect(url_for('patient_registration_query'))
+            flash('预约失败：该科室近期没有空闲时段', 'danger')
+            return redirect(url_for('patient_create_registration'))
+        
+        registration_id = registration_module.create_registration(cursor, patient_id, int(department_id))
+        
+        # 自动分配科室中负担最轻的医生，失败时留待管理员手工受理
+        doctor_id = None
+        if registration_id and ASSIGNMENT_CONFIG['enabled']:
+            doctor_id = doctor_assigner.assign(cursor, registration_id, int(department_id), registration_fee)
+        flash(f'挂号成功，已分配医生（工号 {doctor_id}）' if doctor_id else '挂号成功', 'success')
         return redirect(url_for('patient_registration_query'))
     
     departments = department_module.query_department(cursor)
     return render_template('patient/create_registration.html', departments=departments)
 
+@app.route('/patient/next_slot')
+def patient_next_slot():
+    """科室最早的空闲时段：?department_id=，返回 JSON（没有空闲时段时为 null）"""
+    if 'patient_id' not in session or session.get('user_type') != 'patient':
+        return jsonify({'error': '请先登录'}), 401
+    
+    department_id = request.args.get('department_id', type=int)
+    if not department_id:
+        return jsonify({'error': '缺少 department_id'}), 400
+    slot = slot_index.next_free(get_db_cursor(), department_id)
+    if slot:
+        slot = dict(slot, slot_date=slot['slot_date'].isoformat(), start=f"{slot['start']:%Y-%m-%d %H:%M}")
+    return jsonify(slot)
+
 @app.route('/patient/registration_query')
 def patient_registration_query():
     if 'patient_id' not in session or session.get('user_type') != 'patient':
@@ -161,9 +352,13 @@ def patient_registration_query():
     
     cursor = get_db_cursor()
     patient_id = session['patient_id']
-    registrations = registration_module.query_registration(cursor, patient_id=patient_id)
+    page = get_page_args()
+    # 从工作列表读模型读取（已含医生姓名与科室名称），(patient_id, registration_id) 索引范围扫描
+    registrations = registration_module.query_worklist(cursor, patient_id=patient_id, **page)
+    pages = page_links(registrations, 'registration_id', page)
     
-    return render_template('patient/registration_query.html', registrations=registrations)
+    return render_template('patient/registration_query.html', registrations=registrations, pages=pages,
+                           status_labels=registration_module.STATUS_LABELS)
 
 @app.route('/patient/prescription_query', methods=['GET', 'POST'])
 def patient_prescription_query():
@@ -173,12 +368,15 @@ def patient_prescription_query():
     
     cursor = get_db_cursor()
     prescriptions = []
+    pages = None
+    registration_id = request.values.get('registration_id', type=int)
     
-    if request.method == 'POST':
-        registration_id = request.form.get('registration_id')
-        prescriptions = prescription_module.query_prescription(cursor, registration_id=int(registration_id))
+    if registration_id:
+        page = get_page_args()
+        prescriptions = prescription_module.query_prescription(cursor, registration_id=registration_id, **page)
+        pages = page_links(prescriptions, 'prescription_id', page, registration_id=registration_id)
     
-    return render_template('patient/prescription_query.html', prescriptions=prescriptions)
+    return render_template('patient/prescription_query.html', prescriptions=prescriptions, pages=pages)
 
 @app.route('/patient/payment', methods=['GET', 'POST'])
 def patient_payment():
@@ -190,12 +388,51 @@ def patient_payment():
     patient_id = session['patient_id']
     
     if request.method == 'POST':
-        payment_id = request.form.get('payment_id')
-        payment_module.complete_payment(cursor, int(payment_id))
-        flash('缴费成功', 'success')
+        action = request.form.get('action')
+        if action in ('all', 'selected'):
+            # 批量缴费：全部缴清，或只缴勾选的缴费单
+            payment_ids = request.form.getlist('payment_ids', type=int) if action == 'selected' else None
+            if payment_ids == []:
+                flash('请先勾选要缴纳的费用', 'warning')
+            else:
+                result = payment_module.settle_payments(cursor, patient_id, payment_ids)
+                if result is None:
+                    flash('缴费失败，请重试', 'danger')
+                elif not result['payment_ids']:
+                    flash('没有待缴费用', 'info')
+                else:
+                    flash(f"缴费成功：共 {len(result['payment_ids'])} 笔，合计 ¥{result['total']}", 'success')
+        else:
+            payment_id = request.form.get('payment_id')
+            payment_module.complete_payment(cursor, int(payment_id))
+            flash('缴费成功', 'success')
+    
+    page = get_page_args()
+    payments = payment_module.query_payment(cursor, patient_id=patient_id, time_is_null=True, **page)
+    pages = page_links(payments, 'payment_id', page)
+    return render_template('patient/payment.html', payments=payments, pages=pages)
+
+@app.route('/patient/payment/settle', methods=['POST'])
+def patient_payment_settle():
+    """
+    批量缴费（JSON）：{"payment_ids": [1, 2, ...]} 只缴这些缴费单，省略 payment_ids 时缴清全部待缴费用；
+    返回本次缴清的缴费号、合计金额与因此缴清费用的挂号
+    """
+    if 'patient_id' not in session or session.get('user_type') != 'patient':
+        return jsonify({'error': '请先登录'}), 401
     
-    payments = payment_module.query_payment(cursor, patient_id=patient_id, time_is_null=True)
-    return render_template('patient/payment.html', payments=payments)
+    data = request.get_json(silent=True) or {}
+    payment_ids = data.get('payment_ids')
+    if payment_ids is not None:
+        try:
+            payment_ids = [int(payment_id) for payment_id in payment_ids]
+        except (TypeError, ValueError):
+            return jsonify({'error': 'payment_ids 须为整数列表'}), 400
+    
+    result = payment_module.settle_payments(get_db_cursor(), session['patient_id'], payment_ids)
+    if result is None:
+        return jsonify({'error': '缴费失败，请重试'}), 500
+    return jsonify(result)
 
 @app.route('/patient/logout')
 def patient_logout():
@@ -246,9 +483,65 @@ def doctor_registrations():
     
     cursor = get_db_cursor()
     doctor_id = session['doctor_id']
-    registrations = registration_module.query_registration(cursor, doctor_id=doctor_id)
+    page = get_page_args()
+    # 待办队列：分配给本医生且尚未结束就诊的挂号，从工作列表读模型的 (doctor_id, doctor_open, registration_id)
+    # 索引一次范围扫描读取
+    registrations = registration_module.query_worklist(cursor, doctor_id=doctor_id, **page)
+    pages = page_links(registrations, 'registration_id', page)
+    
+    return render_template('doctor/registrations.html', registrations=registrations, pages=pages,
+                           status_labels=registration_module.STATUS_LABELS)
+
+@app.route('/doctor/registrations/stream')
+def doctor_registrations_stream():
+    """
+    医生待办的实时推送（Server-Sent Events）：挂号新分配、开具处方、缴清费用、结束就诊时
+    推送一条事件（event 为事件类型，data 为挂号字段的 JSON），不查询数据库
+    """
+    if 'doctor_id' not in session or session.get('user_type') != 'doctor':
+        return jsonify({'error': '请先登录'}), 401
+    
+    keepalive = EVENT_CONFIG['keepalive']
+    # 每条连接长期占用一个工作线程，本进程的连接数达到上限时拒绝，页面退回为定时刷新
+    subscription = event_bus.subscribe(doctor_topic(session['doctor_id']))
+    if subscription is None:
+        return jsonify({'error': '推送连接数已满，请稍后重试'}), 503, {'Retry-After': str(keepalive)}
+    
+    def generate():
+        try:
+            yield f"retry: {keepalive * 1000}\n\n"
+            while True:
+                event = subscription.get(timeout=keepalive)
+                if subscription.overflowed:
+                    # 积压过多，通知页面整体刷新后结束本连接
+                    yield "event: reset\ndata: {}\n\n"
+                    return
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                data = json.dumps(event['registration'], default=str, ensure_ascii=False)
+                yield f"event: {event['type']}\ndata: {data}\n\n"
+        finally:
+            subscription.close()
+    
+    response = Response(generate(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # 客户端在响应开始前断开时生成器不会执行，由服务器关闭响应时取消订阅
+    response.call_on_close(subscription.close)
+    return response
+
+@app.route('/doctor/registrations/<int:registration_id>/close', methods=['POST'])
+def doctor_close_registration(registration_id):
+    if 'doctor_id' not in session or session.get('user_type') != 'doctor':
+        flash('请先登录', 'warning')
+        return redirect(url_for('doctor_login'))
     
-    return render_template('doctor/registrations.html', registrations=registrations)
+    cursor = get_db_cursor()
+    if registration_module.close_registration(cursor, registration_id, doctor_id=session['doctor_id']):
+        flash(f'挂号 {registration_id} 已结束就诊', 'success')
+    else:
+        flash(f'挂号 {registration_id} 无法结束就诊：费用尚未缴清', 'danger')
+    return redirect(url_for('doctor_registrations'))
 
 @app.route('/doctor/create_prescription', methods=['GET', 'POST'])
 def doctor_create_prescription():
@@ -261,27 +554,36 @@ def doctor_create_prescription():
     
     if request.method == 'POST':
         registration_id = request.form.get('registration_id')
-        drug_id = request.form.get('drug_id')
-        quantity = request.form.get('quantity')
+        # 每行处方明细提交一组 drug_id/quantity，未填写的行忽略
+        items = [(int(drug_id), int(quantity))
+                 for drug_id, quantity in zip(request.form.getlist('drug_id'), request.form.getlist('quantity'))
+                 if drug_id and quantity]
         
-        if not drug_module.check_drug_exists(cursor, int(drug_id)):
-            flash('未找到药品信息，请先联系管理员添加药品', 'danger')
+        result = prescription_module.prescribe_drugs(cursor, int(registration_id), items)
+        if not result:
+            flash('处方开具失败：请检查挂号编号、药品及库存', 'danger')
             return redirect(url_for('doctor_create_prescription'))
         
-        price = drug_module.get_drug_info(cursor, int(drug_id), info_type='price') * int(quantity)
-        patient_id = registration_module.get_registration_info(cursor, int(registration_id), info_type='patient')
-        payment_id = payment_module.create_payment(cursor, patient_id, price)
-        
-        prescription_module.create_prescription(cursor, int(registration_id), int(drug_id), int(quantity), payment_id)
-        
-        original_quantity = drug_module.get_drug_info(cursor, int(drug_id), info_type='quantity')
-        drug_module.update_drug_info(cursor, int(drug_id), stored_quantity=original_quantity - int(quantity))
-        
-        flash(f'处方开具成功，药品剩余库存: {original_quantity - int(quantity)}', 'success')
+        stock = '，'.join(f"药品{line['drug_id']}剩余库存: {line['stored_quantity']}" for line in result['lines'])
+        flash(f'处方开具成功，共 {len(result["lines"])} 种药品，应缴金额 ¥{result["price"]}（{stock}）', 'success')
         return redirect(url_for('doctor_registrations'))
     
-    drugs = drug_module.query_drug(cursor)
-    return render_template('doctor/create_prescription.html', drugs=drugs)
+    # 药品通过 /doctor/drug_search 联想选择，页面不再列出全部药品
+    return render_template('doctor/create_prescription.html', line_count=prescription_line_count)
+
+@app.route('/doctor/drug_search')
+def doctor_drug_search():
+    """药品联想：?q=名称、拼音或首字母，返回 JSON 列表（编号、名称、单价、库存）"""
+    if 'doctor_id' not in session or session.get('user_type') != 'doctor':
+        return jsonify({'error': '请先登录'}), 401
+    
+    try:
+        limit = max(1, min(int(request.args.get('limit', drug_suggestion_limit)), drug_suggestion_limit))
+    except ValueError:
+        limit = drug_suggestion_limit
+    cursor = get_db_cursor()
+    drugs = drug_module.search_drug(cursor, request.args.get('q', ''), limit)
+    return jsonify(drugs)
 
 @app.route('/doctor/logout')
 def doctor_logout():
@@ -333,16 +635,21 @@ def admin_doctors():
             doctor_id = request.form.get('doctor_id')
             department_id = request.form.get('department_id')
             doctor_module.set_doctor_department(cursor, int(doctor_id), int(department_id))
+            doctor_assigner.clear()
+            slot_index.clear()
             flash('医生科室更新成功', 'success')
         elif action == 'set_position':
             doctor_id = request.form.get('doctor_id')
             position = request.form.get('position')
             doctor_module.set_doctor_position(cursor, int(doctor_id), position)
+            doctor_assigner.clear()
             flash('医生职称更新成功', 'success')
     
-    doctors = doctor_module.query_doctor(cursor)
+    page = get_page_args()
+    doctors = doctor_module.query_doctor(cursor, **page)
+    pages = page_links(doctors, 'doctor_id', page)
     departments = department_module.query_department(cursor)
-    return render_template('admin/doctors.html', doctors=doctors, departments=departments)
+    return render_template('admin/doctors.html', doctors=doctors, departments=departments, pages=pages)
 
 @app.route('/admin/drugs', methods=['GET', 'POST'])
 def admin_drugs():
@@ -362,55 +669,129 @@ def admin_drugs():
             update_type = request.form.get('update_type')
             update_value = request.form.get('update_value')
             
+            updated = False
             if update_type == 'price':
-                drug_module.update_drug(cursor, int(drug_id), price=float(update_value))
+                updated = drug_module.update_drug_info(cursor, int(drug_id), drug_price=float(update_value))
             elif update_type == 'quantity':
-                drug_module.update_drug(cursor, int(drug_id), quantity=int(update_value))
+                updated = drug_module.update_drug_info(cursor, int(drug_id), stored_quantity=int(update_value))
             
-            flash('药品更新成功', 'success')
+            if updated:
+                flash('药品更新成功', 'success')
+            else:
+                flash('药品更新失败：请检查药品编号', 'danger')
     
-    drugs = drug_module.query_drug(cursor)
-    return render_template('admin/drugs.html', drugs=drugs)
+    page = get_page_args()
+    drugs = drug_module.query_drug(cursor, **page)
+    pages = page_links(drugs, 'drug_id', page)
+    return render_template('admin/drugs.html', drugs=drugs, pages=pages)
 
 @app.route('/admin/registrations', methods=['GET', 'POST'])
 def admin_registrations():
     cursor = get_db_cursor()
     
     if request.method == 'POST':
-        registration_id = request.form.get('registration_id')
-        doctor_id = request.form.get('doctor_id')
-        
-        if registration_module.process_registration(cursor, int(registration_id), int(doctor_id)):
-            patient_id = registration_module.get_registration_info(cursor, int(registration_id), info_type='patient')
-            payment_id = payment_module.create_payment(cursor, patient_id, registration_fee)
-            registration_module.set_registration_payment(cursor, int(registration_id), payment_id)
-            flash('挂号受理成功', 'success')
-        else:
+        # 同一科室勾选的挂号一次分配给所选医生
+        try:
+            doctor_id = int(request.form.get('doctor_id'))
+            assignments = [(int(registration_id), doctor_id)
+                           for registration_id in request.form.getlist('registration_id')]
+        except (TypeError, ValueError):
+            flash('请选择医生并勾选要受理的挂号', 'danger')
+            return redirect(url_for('admin_registrations', department_id=request.args.get('department_id', type=int)))
+
+        results = registration_module.process_registrations(cursor, assignments, registration_fee) if assignments else []
+        if results is None:
             flash('挂号受理失败', 'danger')
+        elif not results:
+            flash('请先勾选要受理的挂号', 'warning')
+        else:
+            assigned = [item for item in results if item['status'] == 'assigned']
+            if assigned:
+                flash(f'挂号受理成功 {len(assigned)} 个', 'success')
+            for item in results:
+                if item['status'] != 'assigned':
+                    flash(f"挂号 {item['registration_id']} 受理失败：{item['message']}", 'danger')
+    
+    # 未受理挂号按挂号编号分页，可只看某个科室（?department_id=）
+    page = get_page_args()
+    department_id = request.args.get('department_id', type=int)
+    registrations = registration_module.query_worklist(cursor, department_id=department_id,
+                                                       unassigned_only=True, **page)
+    pages = page_links(registrations, 'registration_id', page, department_id=department_id)
+    
+    # 本页挂号按科室分组，每个科室只查询（缓存）并渲染一次本科室的医生列表
+    groups = {}
+    for reg in registrations:
+        groups.setdefault(reg['department_id'], []).append(reg)
+    department_groups = [{
+        'department_id': group_department_id,
+        'department_name': group[0]['department_name'],
+        'registrations': group,
+        'doctors': doctor_module.query_doctor(cursor, department_id=group_department_id),
+    } for group_department_id, group in groups.items()]
     
-    registrations = registration_module.query_registration(cursor, unassigned_only=True)
-    doctors = doctor_module.query_doctor(cursor)
-    return render_template('admin/registrations.html', registrations=registrations, doctors=doctors)
+    departments = department_module.query_department(cursor)
+    return render_template('admin/registrations.html', department_groups=department_groups,
+                           departments=departments, department_id=department_id, pages=pages)
+
+@app.route('/admin/registrations/batch', methods=['POST'])
+def admin_registrations_batch():
+    """
+    批量受理挂号（JSON）：{"assignments": [{"registration_id": 1, "doctor_id": 2}, ...]}，
+    返回每一项的受理结果
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        assignments = [(int(item['registration_id']), int(item['doctor_id'])) for item in data.get('assignments', [])]
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'assignments 的每一项须包含整数 registration_id 与 doctor_id'}), 400
+    if not assignments:
+        return jsonify({'error': 'assignments 不能为空'}), 400
+    
+    cursor = get_db_cursor()
+    results = registration_module.process_registrations(cursor, assignments, registration_fee)
+    if results is None:
+        return jsonify({'error': '批量受理失败'}), 500
+    return jsonify({'results': results})
 
 @app.route('/admin/tables')
 def admin_tables():
     cursor = get_db_cursor()
     
-    tables = {
-        'patient': [],
-        'department': [],
-        'doctor': [],
-        'drug': [],
-        'payment': [],
-        'registration': [],
-        'prescription': []
-    }
-    
-    for table_name in tables.keys():
-        cursor.execute(f"SELECT * FROM {table_name}")
+    # 页面只显示每张表的前一页数据，完整数据通过 /admin/export 流式下载
+    tables = {}
+    for table_name, primary_key in export.TABLES.items():
+        cursor.execute(f"SELECT * FROM {table_name} ORDER BY {primary_key} LIMIT %s", (DEFAULT_PAGE_SIZE,))
         tables[table_name] = cursor.fetchall()
     
-    return render_template('admin/tables.html', tables=tables)
+    return render_template('admin/tables.html', tables=tables, page_size=DEFAULT_PAGE_SIZE)
+
+@app.route('/admin/export/<table_name>')
+def admin_export(table_name):
+    """流式导出整张表：?format=csv|ndjson，?gzip=1 时压缩"""
+    fmt = request.args.get('format', 'csv')
+    compress = request.args.get('gzip') == '1'
+    if table_name not in export.TABLES or fmt not in export.FORMATS:
+        abort(404)
+    
+    def generate():
+        # 使用独立连接与服务器端游标，响应发送期间逐块读取，不在内存中保留整张表
+        connection = pool.acquire()
+        finished = False
+        try:
+            cursor = backend.streaming_cursor(connection)
+            chunks = export.export_table(cursor, table_name, fmt)
+            yield from export.gzip_chunks(chunks) if compress else chunks
+            cursor.close()
+            finished = True
+        finally:
+            # 客户端中途断开时结果集尚未读完，直接丢弃连接，避免归还前读完剩余行
+            pool.release(connection, discard=not finished)
+    
+    filename = f"{table_name}.{fmt}" + ('.gz' if compress else '')
+    mimetype = 'application/gzip' if compress else export.FORMATS[fmt]
+    return Response(generate(), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
 
 @app.route('/admin/reset', methods=['POST'])
 def admin_reset():
@@ -418,9 +799,68 @@ def admin_reset():
     
     setup.drop_all_tables_for_testing(cursor)
     setup.create_table(cursor)
+    query_cache.bump(*export.TABLES)
+    drug_index.clear()
+    doctor_assigner.clear()
+    slot_index.clear()
     
     flash('系统重置成功！', 'success')
     return redirect(url_for('admin_home'))
 
+@app.route('/admin/pool_stats')
+def admin_pool_stats():
+    return jsonify(pool.stats())
+
+@app.route('/admin/assignment_stats')
+def admin_assignment_stats():
+    return jsonify(doctor_assigner.stats())
+
+@app.route('/admin/slots', methods=['GET', 'POST'])
+def admin_slots():
+    cursor = get_db_cursor()
+    
+    if request.method == 'POST':
+        action = request.form.get('action')
+        doctor_id = int(request.form.get('doctor_id'))
+        weekday = int(request.form.get('weekday'))
+        
+        if action == 'set':
+            # 开始时间为 HH:MM
+            hour, minute = request.form.get('start_time', '08:00').split(':')
+            if slot_module.set_slot_template(cursor, doctor_id, weekday, int(hour) * 60 + int(minute),
+                                             int(request.form.get('slot_minutes')), int(request.form.get('slot_count'))):
+                flash('出诊时段设置成功', 'success')
+            else:
+                flash('出诊时段设置失败：请检查医生工号与时段参数', 'danger')
+        elif action == 'remove':
+            if slot_module.remove_slot_template(cursor, doctor_id, weekday):
+                flash('出诊时段已删除', 'success')
+            else:
+                flash('出诊时段删除失败', 'danger')
+    
+    department_id = request.args.get('department_id', type=int)
+    templates = slot_module.query_slot_templates(cursor, department_id=department_id)
+    departments = department_module.query_department(cursor)
+    return render_template('admin/slots.html', templates=templates, departments=departments,
+                           department_id=department_id, weekdays=weekday_names)
+
+@app.route('/admin/slot_stats')
+def admin_slot_stats():
+    return jsonify(slot_index.stats())
+
+@app.route('/admin/event_stats')
+def admin_event_stats():
+    return jsonify(event_bus.stats())
+
+@app.route('/admin/cache_stats')
+def admin_cache_stats():
+    return jsonify(query_cache.stats())
+
+@app.route('/metrics')
+def prometheus_metrics():
+    if metrics is None:
+        abort(404)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,89 @@
+import os
+
+import pymysql
+
+# 存储后端：'mysql'（默认）或 'sqlite'（内嵌数据库，用于离线压测与测试）
+DB_BACKEND = os.environ.get('OMS_DB_BACKEND', 'mysql')
+
+# 配置 SQLite 数据库（仅 DB_BACKEND 为 'sqlite' 时使用）
+SQLITE_CONFIG = {
+    'database': os.environ.get('OMS_SQLITE_DATABASE', 'outpatient.db'),  # 数据库文件路径，':memory:' 为内存数据库
+}
+
+# 配置 MySQL 数据库连接
+DB_CONFIG = {
+    'host': '124.70.86.207',
+    'port': 3306,
+    'user': 'u23371057', # 设置为你的用户名
+    'password': 'Aa727319', # 设置为你的密码
+    'database': 'try_db23371057', # 设置为你的数据库名
+    'charset': 'utf8mb4',
+    'cursorclass': pymysql.cursors.DictCursor, # 设置返回结果为字典类型
+    'autocommit': True  # 设置自动提交
+}
+
+# 配置连接池
+POOL_CONFIG = {
+    'size': 5,               # 常驻连接数
+    'max_overflow': 10,      # 高峰期允许额外创建的连接数
+    'timeout': 30,           # 借用连接的最长等待时间（秒）
+    'idle_timeout': 300,     # 空闲连接超过该时间（秒）将被回收
+    'ping_on_checkout': True # 借出前检查连接是否可用
+}
+
+# 配置查询结果缓存（科室、医生、药品等基础数据）
+CACHE_CONFIG = {
+    'enabled': True,     # 是否启用缓存
+    'max_entries': 256,  # 最多缓存的查询结果数，超出时淘汰最久未使用的
+    'ttl': 30            # 结果最长缓存时间（秒），也是多进程部署时其他进程修改可见的最长延迟
+}
+
+# 配置药品联想索引（开具处方时按名称、拼音联想药品）
+DRUG_INDEX_CONFIG = {
+    'reload_interval': 300  # 整体重新加载的间隔（秒），也是多进程部署时其他进程新增药品可见的最长延迟
+}
+
+# 配置挂号自动分配医生（默认关闭，挂号由管理员手工受理；设置环境变量 OMS_AUTO_ASSIGN=1 开启）
+ASSIGNMENT_CONFIG = {
+    'enabled': os.environ.get('OMS_AUTO_ASSIGN', '0') == '1',
+    'reconcile_interval': 60,  # 按挂号表重新统计医生负担的间隔（秒）
+    'position_weights': {}     # 职称 -> 权重（默认 1.0），如 {'主任医师': 0.5} 表示主任医师分到约一半的挂号
+}
+
+# 配置预约时段索引（schedule/slots.py）
+SLOT_CONFIG = {
+    'reload_interval': 60,  # 整体重新加载的间隔（秒），也是多进程部署时其他进程的预约可见的最长延迟
+    'horizon_days': 14      # 可预约的天数（含今天）
+}
+
+# 配置医生工作台的实时推送（events.py，/doctor/registrations/stream）
+EVENT_CONFIG = {
+    'queue_size': 100,  # 每条推送连接最多积压的事件数，超出时通知页面整体刷新
+    'keepalive': 15,    # 没有事件时发送保活注释的间隔（秒），避免代理断开空闲连接
+    # 每个工作进程最多的推送连接数，每条连接长期占用一个线程，应小于服务器的线程数；超出时返回 503
+    'max_connections': int(os.environ.get('OMS_EVENT_MAX_CONNECTIONS', 50)),
+}
+
+# 配置运行指标（/metrics）
+METRICS_CONFIG = {
+    'enabled': True,         # 是否统计每个请求的 SQL 执行情况并开放 /metrics
+    'max_fingerprints': 500  # 最多单独统计的 SQL 指纹数，超出的归入 "other"
+}
+
+# 配置慢查询日志（默认关闭，设置环境变量 OMS_SLOW_QUERY_LOG=1 开启）
+SLOW_QUERY_CONFIG = {
+    'enabled': os.environ.get('OMS_SLOW_QUERY_LOG') == '1',
+    'path': os.environ.get('OMS_SLOW_QUERY_LOG_PATH', 'logs/slow_query.log'),  # 日志文件，按大小轮转
+    'threshold_ms': int(os.environ.get('OMS_SLOW_QUERY_MS', 200)),  # 慢查询阈值（毫秒）
+    'redact_params': True,         # 只记录参数类型，不记录参数值
+    'explain': True,               # 自动获取执行计划
+    'max_bytes': 10 * 1024 * 1024, # 单个日志文件最大字节数
+    'backup_count': 5              # 保留的历史日志文件数
+}
+
+# 配置重复查询检测（开发环境使用，设置环境变量 OMS_QUERY_DETECTOR=1 开启）
+QUERY_DETECTOR_CONFIG = {
+    'enabled': os.environ.get('OMS_QUERY_DETECTOR') == '1',
+    'same_shape_threshold': 3,  # 同一形状的语句在一个请求中执行多少次视为 N+1
+    'stack_depth': 6            # 报告中每条语句显示的调用栈深度
+}
@@ -0,0 +1,3 @@
+"""
+数据库访问基础设施（连接池等），供 app.py、main.py 与 entity 层共用
+"""
@@ -0,0 +1,64 @@
+"""
+存储后端抽象
+
+entity 层只依赖“连接 -> 游标”这一 DB-API 接口：游标的 execute/fetchone/fetchall
+返回字典行，并提供 lastrowid/rowcount。具体数据库由后端负责：
+
+- mysql:  生产环境使用的 MySQL（PyMySQL）
+- sqlite: 内嵌 SQLite，用于离线压测与测试，自动把 entity 层的 MySQL 方言翻译为 SQLite
+"""
+from db.pool import ConnectionPool
+
+
+class Backend:
+    """存储后端基类"""
+
+    name = None
+    explain_prefix = 'EXPLAIN'  # 获取执行计划的语句前缀
+
+    def connect(self):
+        """创建一个新的数据库连接"""
+        raise NotImplementedError
+
+    def create_pool(self, **pool_config):
+        """创建使用本后端建立连接的连接池"""
+        return ConnectionPool(self.connect, **pool_config)
+
+    def streaming_cursor(self, connection):
+        """
+        获取不缓冲结果集的游标，逐行从数据库读取，用于导出大表
+
+        结果集读完（或游标关闭）之前，该连接不能执行其他语句。
+        """
+        return connection.cursor()
+
+
+def is_integrity_error(error):
+    """
+    判断异常是否为违反约束（外键、唯一键、非空等）
+
+    PyMySQL 与 sqlite3 都按 DB-API 规范命名为 IntegrityError，这里按名称判断，
+    使 entity 层不必依赖具体驱动。
+    """
+    return type(error).__name__ == 'IntegrityError'
+
+
+def create_backend(name, mysql_config=None, sqlite_config=None):
+    """
+    根据名称创建存储后端
+
+    Args:
+        name: 后端名称，'mysql' 或 'sqlite'
+        mysql_config: MySQL 连接参数（pymysql.connect 的参数）
+        sqlite_config: SQLite 连接参数（至少包含 database 文件路径）
+
+    Returns:
+        Backend: 存储后端实例
+    """
+    if name == 'mysql':
+        from db.mysql_backend import MySQLBackend
+        return MySQLBackend(mysql_config or {})
+    if name == 'sqlite':
+        from db.sqlite_backend import SQLiteBackend
+        return SQLiteBackend(**(sqlite_config or {}))
+    raise ValueError(f"未知的存储后端: {name}，请使用 'mysql' 或 'sqlite'")
@@ -0,0 +1,192 @@
+"""
+查询结果缓存
+
+科室、医生、药品等基础数据几乎每个页面都要查询，但很少变化。entity 层的查询函数用
+``@cached('表名', ...)`` 装饰后，结果按规范化后的查询参数缓存；修改这些表的函数用
+``@invalidates('表名', ...)`` 装饰，成功后递增对应表的版本号，依赖该表的缓存随即失效：
+
+    @cached('doctor', 'department')
+    def query_doctor(cursor, ...): ...
+
+    @invalidates('doctor')
+    def set_doctor_position(cursor, ...): ...
+
+版本号只在本进程内有效，多进程部署时其他进程的修改要等 ttl 过期后才能看到。
+"""
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+
+
+class QueryCache:
+    """带 TTL 与 LRU 淘汰、按表版本号失效的查询结果缓存"""
+
+    def __init__(self, enabled=True, max_entries=256, ttl=30):
+        """
+        Args:
+            enabled: 是否启用缓存，关闭时每次都直接查询数据库
+            max_entries: 最多缓存的结果数，超出时淘汰最久未使用的结果
+            ttl: 结果的最长缓存时间（秒）
+        """
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._entries = OrderedDict()  # key -> (结果, 过期时间, 加载时的表版本号)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def configure(self, enabled=None, max_entries=None, ttl=None):
+        """修改缓存配置并清空已缓存的结果"""
+        if enabled is not None:
+            self.enabled = enabled
+        if max_entries is not None:
+            self.max_entries = max_entries
+        if ttl is not None:
+            self.ttl = ttl
+        self.clear()
+
+    def _table_versions(self, tables):
+        return tuple(self._versions.get(table, 0) for table in tables)
+
+    def get_or_load(self, key, tables, loader, keep=None):
+        """
+        读取缓存结果，未命中时调用 loader 查询并缓存
+
+        Args:
+            key: 缓存键（须可哈希）
+            tables: 结果所依赖的表
+            loader: 无参函数，返回要缓存的结果
+            keep: 判断结果是否可以缓存的函数（可选），返回假值时本次结果不缓存
+
+        Returns:
+            loader 的返回值（或其缓存）
+        """
+        if not self.enabled:
+            return loader()
+
+        now = time.monotonic()
+        with self._lock:
+            versions = self._table_versions(tables)
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now and entry[2] == versions:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[0]
+            self._misses += 1
+
+        # 版本号在查询前读取：查询期间若有写入，该结果会因版本号落后而在下次读取时失效
+        value = loader()
+        if keep is not None and not keep(value):
+            return value
+
+        with self._lock:
+            self._entries[key] = (value, now + self.ttl, versions)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return value
+
+    def bump(self, *tables):
+        """递增表的版本号，使依赖这些表的缓存结果失效"""
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def clear(self):
+        """清空所有缓存结果"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        获取缓存统计信息
+
+        Returns:
+            dict: 命中数、未命中数、命中率、淘汰数、当前条目数与各表版本号
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'enabled': self.enabled,
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'entries': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+                'versions': dict(self._versions),
+            }
+
+
+# 进程内共享的查询缓存，由 app.py 按 config.CACHE_CONFIG 配置
+query_cache = QueryCache()
+
+
+def _normalize(value):
+    # entity 层的查询条件按真值判断，空字符串、0、False 与 None 等价
+    if not value:
+        return None
+    if isinstance(value, (list, tuple, set)):
+        return tuple(value)
+    return value
+
+
+def cached(*tables):
+    """
+    缓存查询函数的结果（函数的第一个参数须为游标）
+
+    缓存键由函数名和绑定默认值后的参数组成，因此位置参数、关键字参数以及
+    显式传入默认值的调用共享同一个缓存结果。返回的行是缓存的副本，调用方可以修改。
+    空结果不缓存：查询函数出错时同样返回空列表，不能让一次失败在 ttl 内一直生效。
+
+    Args:
+        *tables: 查询结果依赖的表
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(cursor, *args, **kwargs):
+            bound = signature.bind(cursor, *args, **kwargs)
+            bound.apply_defaults()
+            key = (name,) + tuple((arg, _normalize(value)) for arg, value in bound.arguments.items()
+                                  if arg != 'cursor')
+            try:
+                hash(key)
+            except TypeError:
+                return func(cursor, *args, **kwargs)
+
+            rows = query_cache.get_or_load(key, tables, lambda: func(cursor, *args, **kwargs), keep=bool)
+            return [dict(row) for row in rows]
+
+        return wrapper
+    return decorator
+
+
+def invalidates(*tables):
+    """
+    写操作成功（返回值不为 None/False）后递增相关表的版本号
+
+    Args:
+        *tables: 写操作修改的表
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            result = func(*args, **kwargs)
+            if result is not None and result is not False:
+                query_cache.bump(*tables)
+            return result
+
+        return wrapper
+    return decorator
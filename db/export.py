@@ -0,0 +1,121 @@
+"""
+表数据流式导出
+
+按主键顺序逐行读取表数据并编码为 CSV 或 NDJSON（每行一个 JSON 对象），
+以字节块的生成器返回，可选 gzip 压缩。配合后端的 streaming_cursor 使用时，
+内存占用只与单个块的大小有关，与表的行数无关。
+"""
+import csv
+import io
+import json
+import zlib
+
+# 可导出的表及其主键（顺序即界面上的显示顺序）
+TABLES = {
+    'patient': 'patient_id',
+    'department': 'department_id',
+    'doctor': 'doctor_id',
+    'drug': 'drug_id',
+    'payment': 'payment_id',
+    'registration': 'registration_id',
+    'prescription': 'prescription_id',
+}
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+CHUNK_SIZE = 64 * 1024  # 每次输出的字节数（约）
+
+
+def _select_all(cursor, table_name):
+    if table_name not in TABLES:
+        raise ValueError(f"不支持导出的表: {table_name}")
+    cursor.execute(f"SELECT * FROM {table_name} ORDER BY {TABLES[table_name]}")
+    return [column[0] for column in cursor.description]
+
+
+def iter_csv(cursor, table_name):
+    """
+    以 CSV 格式逐块导出表数据（首行为列名）
+
+    Args:
+        cursor: 数据库游标，导出大表时应使用 streaming_cursor
+        table_name: 表名，必须是 TABLES 中的表
+
+    Yields:
+        bytes: UTF-8 编码的 CSV 数据块
+    """
+    columns = _select_all(cursor, table_name)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in cursor:
+        writer.writerow([row[column] for column in columns])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def iter_ndjson(cursor, table_name):
+    """
+    以 NDJSON 格式逐块导出表数据
+
+    Args:
+        cursor: 数据库游标，导出大表时应使用 streaming_cursor
+        table_name: 表名，必须是 TABLES 中的表
+
+    Yields:
+        bytes: UTF-8 编码的 NDJSON 数据块
+    """
+    _select_all(cursor, table_name)
+    lines, size = [], 0
+    for row in cursor:
+        line = json.dumps(row, ensure_ascii=False, default=str) + '\n'
+        lines.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield ''.join(lines).encode('utf-8')
+            lines, size = [], 0
+    yield ''.join(lines).encode('utf-8')
+
+
+def export_table(cursor, table_name, fmt='csv'):
+    """
+    按格式导出表数据
+
+    Args:
+        cursor: 数据库游标
+        table_name: 表名
+        fmt: 'csv' 或 'ndjson'
+
+    Returns:
+        generator: 字节块生成器
+    """
+    if fmt == 'csv':
+        return iter_csv(cursor, table_name)
+    if fmt == 'ndjson':
+        return iter_ndjson(cursor, table_name)
+    raise ValueError(f"不支持的导出格式: {fmt}")
+
+
+def gzip_chunks(chunks, level=6):
+    """
+    对字节块流做 gzip 压缩
+
+    Args:
+        chunks: 字节块迭代器
+        level: 压缩级别
+
+    Yields:
+        bytes: gzip 格式的数据块
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
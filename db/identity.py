@@ -0,0 +1,86 @@
+"""
+请求内的标识映射（identity map）
+
+同一请求中按主键读取的行只从数据库读取一次：entity 层的 check_*_exists、get_*_info
+等函数通过 fetch_row 读取整行，第一次读取后保存在游标所属请求的 IdentityMap 中，
+之后的读取（包括“不存在”的结果）直接返回这份记录。
+
+失效按表而不是按行：同一请求中通过任一共享该映射的游标执行的 INSERT/UPDATE/DELETE
+（含 REPLACE、INSERT IGNORE）会使被写入表的记录全部失效，事务回滚时整个映射清空，
+因此不会读到本请求自己改过之前的旧值。写语句影响哪些行要解析 WHERE 条件才能知道
+（IN 列表、CASE、子查询、按非主键列更新），按行失效容易漏掉行；而一个请求内缓存的行
+只有几条，整表失效最多多读几次主键，所以只识别语句写入的表名。没有 identity_map 的游标
+（如命令行界面使用的原始游标）每次都直接查询数据库。
+"""
+import re
+
+_WRITE = re.compile(r"\s*(?:INSERT\s+(?:IGNORE\s+)?INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM)\s+(\w+)", re.IGNORECASE)
+_DDL = re.compile(r"\s*(?:DROP|CREATE|ALTER|TRUNCATE)\b", re.IGNORECASE)
+
+_MISSING = object()
+
+
+class IdentityMap:
+    """按 (表名, 主键) 保存本请求已读取的行"""
+
+    def __init__(self):
+        self._rows = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, table, key):
+        """
+        Returns:
+            已保存的行；已知不存在时返回 None；尚未读取过时返回 _MISSING
+        """
+        return self._rows.get((table, key), _MISSING)
+
+    def put(self, table, key, row):
+        self._rows[(table, key)] = row
+
+    def invalidate(self, table):
+        """使某张表的全部记录失效（不区分写入的是哪一行）"""
+        for cached_table, key in [item for item in self._rows if item[0] == table]:
+            del self._rows[(cached_table, key)]
+
+    def clear(self):
+        self._rows.clear()
+
+    def observe(self, sql):
+        """语句执行后调用：写语句使被写入的表失效，DDL 清空全部记录"""
+        match = _WRITE.match(sql)
+        if match:
+            self.invalidate(match.group(1).lower())
+        elif _DDL.match(sql):
+            self.clear()
+
+
+def fetch_row(cursor, table, key_column, key):
+    """
+    按主键读取一行，同一请求内重复读取时直接返回已读取的记录
+
+    Args:
+        cursor: 数据库游标
+        table: 表名
+        key_column: 主键列名
+        key: 主键值
+
+    Returns:
+        dict: 该行（副本，调用方可以修改），不存在时返回 None
+    """
+    identity_map = getattr(cursor, 'identity_map', None)
+    if isinstance(key, str) and key.isdigit():
+        key = int(key)
+    if identity_map is not None:
+        row = identity_map.get(table, key)
+        if row is not _MISSING:
+            identity_map.hits += 1
+            return dict(row) if row is not None else None
+        identity_map.misses += 1
+
+    cursor.execute(f"SELECT * FROM {table} WHERE {key_column} = %s", (key,))
+    row = cursor.fetchone()
+
+    if identity_map is not None:
+        identity_map.put(table, key, dict(row) if row is not None else None)
+    return row
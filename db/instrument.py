@@ -0,0 +1,146 @@
+"""
+SQL 执行统计
+
+InstrumentedCursor 包装任意 DB-API 游标，记录每条语句的耗时、返回行数和 SQL 指纹，
+累计到一个 QueryStats 中（Web 端每个请求一个）。指纹把 SQL 中的参数、字面量和
+IN 列表归一化，同一处代码发出的语句得到同一个指纹：
+
+    SELECT * FROM drug WHERE drug_id IN (%s, %s, %s)  ->  SELECT * FROM drug WHERE drug_id IN (...)
+"""
+import re
+import time
+from functools import lru_cache
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|\?")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+")
+_CASE_LIST = re.compile(r"(WHEN \? THEN \?)(?: WHEN \? THEN \?)+", re.IGNORECASE)
+_UNION_LIST = re.compile(r"(UNION ALL SELECT \?(?:, \?)*)(?: UNION ALL SELECT \?(?:, \?)*)+", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """
+    计算 SQL 指纹
+
+    Args:
+        sql: SQL 语句
+
+    Returns:
+        str: 去掉参数与字面量、压缩空白后的语句
+    """
+    sql = _WHITESPACE.sub(' ', sql).strip()
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _VALUES_LIST.sub(r'\1, ...', sql)
+    sql = _CASE_LIST.sub(r'\1 ...', sql)
+    sql = _UNION_LIST.sub(r'\1 ...', sql)
+    return sql
+
+
+class QueryStats:
+    """一组语句（通常是一个请求）的执行统计"""
+
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.errors = 0
+        self.by_fingerprint = {}  # 指纹 -> [执行次数, 累计耗时, 出错次数]
+
+    def record(self, sql, elapsed, error=False):
+        """记录一条语句的执行"""
+        self.statements += 1
+        self.db_time += elapsed
+        entry = self.by_fingerprint.get(sql)
+        if entry is None:
+            entry = self.by_fingerprint[sql] = [0, 0.0, 0]
+        entry[0] += 1
+        entry[1] += elapsed
+        if error:
+            self.errors += 1
+            entry[2] += 1
+
+    def fingerprints(self):
+        """
+        按指纹汇总
+
+        Returns:
+            dict: 指纹 -> (执行次数, 累计耗时, 出错次数)
+        """
+        summary = {}
+        for sql, (count, elapsed, errors) in self.by_fingerprint.items():
+            key = fingerprint(sql)
+            total = summary.get(key, (0, 0.0, 0))
+            summary[key] = (total[0] + count, total[1] + elapsed, total[2] + errors)
+        return summary
+
+
+class InstrumentedCursor:
+    """记录执行统计的游标包装，其余属性与方法直接转发给原游标"""
+
+    def __init__(self, cursor, stats, listeners=(), context=None, identity_map=None):
+        """
+        Args:
+            cursor: 原游标
+            stats: 累计统计的 QueryStats
+            listeners: 每条语句成功执行后调用其 check(cursor, sql, params, elapsed, context) 的对象，
+                       如慢查询日志、重复查询检测
+            context: 传给 listeners 的附加字段（可选），如所在路由
+            identity_map: 本请求的 IdentityMap（可选），写语句执行后使相应记录失效
+        """
+        self._cursor = cursor
+        self.stats = stats
+        self.listeners = listeners
+        self.context = context
+        self.identity_map = identity_map
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _run(self, method, sql, params):
+        start = time.perf_counter()
+        try:
+            result = method(sql, params)
+        except Exception:
+            self.stats.record(sql, time.perf_counter() - start, error=True)
+            raise
+        elapsed = time.perf_counter() - start
+        self.stats.record(sql, elapsed)
+        if self.identity_map is not None:
+            self.identity_map.observe(sql)
+        for listener in self.listeners:
+            listener.check(self._cursor, sql, params, elapsed, self.context)
+        return result
+
+    def execute(self, sql, params=None):
+        return self._run(self._cursor.execute, sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self._run(self._cursor.executemany, sql, seq_of_params)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self.stats.rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        self.stats.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self.stats.rows += len(rows)
+        return rows
+
+    def __iter__(self):
+        for row in self._cursor:
+            self.stats.rows += 1
+            yield row
@@ -0,0 +1,24 @@
+import pymysql
+
+from db.backend import Backend
+
+
+class MySQLBackend(Backend):
+    """MySQL 存储后端（PyMySQL）"""
+
+    name = 'mysql'
+
+    def __init__(self, config):
+        """
+        Args:
+            config: pymysql.connect 的连接参数
+        """
+        self.config = dict(config)
+        self.config.setdefault('cursorclass', pymysql.cursors.DictCursor)
+
+    def connect(self):
+        return pymysql.connect(**self.config)
+
+    def streaming_cursor(self, connection):
+        # 服务器端游标：行在迭代时才从网络读取，而不是 execute 时全部载入内存
+        return connection.cursor(pymysql.cursors.SSDictCursor)
@@ -0,0 +1,61 @@
+"""
+键集（keyset）分页
+
+列表查询按主键排序，翻页时以上一页最后（或第一条）记录的主键为游标：
+
+    下一页: WHERE id > :after  ORDER BY id      LIMIT n
+    上一页: WHERE id < :before ORDER BY id DESC LIMIT n（结果再反转为升序）
+
+与 OFFSET 分页不同，每一页都是一次主键索引范围扫描，翻到多深都一样快。
+"""
+
+DEFAULT_PAGE_SIZE = 50   # 默认每页条数
+MAX_PAGE_SIZE = 200      # 每页条数上限
+
+
+def page_size(limit=None):
+    """
+    将请求的每页条数限制在 1 到 MAX_PAGE_SIZE 之间
+
+    Args:
+        limit: 请求的每页条数，None 或 0 表示使用默认值
+
+    Returns:
+        int: 实际每页条数
+    """
+    if not limit:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+def keyset_clause(column, conditions, params, after_id=None, before_id=None, limit=None):
+    """
+    为列表查询追加键集分页条件
+
+    Args:
+        column: 排序所用的主键列（如 'r.registration_id'）
+        conditions: 查询条件列表，会追加游标条件
+        params: 查询参数列表，会追加游标参数
+        after_id: 只返回主键大于该值的记录（下一页）
+        before_id: 只返回主键小于该值的记录（上一页）
+        limit: 返回条数，None 表示不分页（仍受 after_id/before_id 约束），否则不超过 MAX_PAGE_SIZE
+
+    Returns:
+        tuple: (ORDER BY ... LIMIT ... 子句, 结果是否需要反转为升序)
+    """
+    if after_id:
+        conditions.append(f"{column} > %s")
+        params.append(after_id)
+
+    if before_id:
+        conditions.append(f"{column} < %s")
+        params.append(before_id)
+
+    # 向前翻页时倒序取最接近游标的 n 条，再由调用方反转
+    reverse = bool(before_id) and not after_id and limit is not None
+    clause = f"ORDER BY {column} DESC" if reverse else f"ORDER BY {column}"
+
+    if limit is not None:
+        clause += f" LIMIT {min(int(limit), MAX_PAGE_SIZE)}"
+
+    return clause, reverse
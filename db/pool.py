@@ -0,0 +1,210 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    """等待空闲连接超时"""
+
+
+class ConnectionPool:
+    """
+    有界数据库连接池
+
+    常驻 size 个连接，高峰期最多再额外创建 max_overflow 个连接；
+    连接全部借出时借用方阻塞等待，超过 timeout 秒抛出 PoolTimeout。
+    借出前可选地 ping 检查连接是否可用，空闲超过 idle_timeout 秒的连接会被回收。
+    """
+
+    def __init__(self, creator, size=5, max_overflow=10, timeout=30, idle_timeout=300, ping_on_checkout=True):
+        """
+        Args:
+            creator: 无参可调用对象，返回一个新的数据库连接
+            size: 常驻连接数
+            max_overflow: 允许额外创建的连接数
+            timeout: 借用连接的最长等待时间（秒）
+            idle_timeout: 空闲连接的最长保留时间（秒），None 表示不回收
+            ping_on_checkout: 借出前是否检查连接可用性
+        """
+        self._creator = creator
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.ping_on_checkout = ping_on_checkout
+
+        self._lock = threading.Condition()
+        self._idle = deque()  # (connection, 归还时间)
+        self._opened = 0
+        self._in_use = 0
+        self._waiting = 0
+
+        # 统计信息
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._created = 0
+        self._closed = 0
+
+    @property
+    def max_size(self):
+        return self.size + self.max_overflow
+
+    def acquire(self):
+        """
+        从池中借出一个连接
+
+        Returns:
+            数据库连接
+
+        Raises:
+            PoolTimeout: 超过 timeout 秒仍没有可用连接
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout if self.timeout is not None else None
+
+        with self._lock:
+            self._reap_idle_locked()
+            self._waiting += 1
+            try:
+                while True:
+                    if self._idle:
+                        connection, _ = self._idle.pop()
+                        break
+                    if self._opened < self.max_size:
+                        # 先占位再在锁外建连，避免建连期间阻塞其他借用方
+                        self._opened += 1
+                        connection = None
+                        break
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(f"等待数据库连接超时（{self.timeout} 秒）")
+                    self._lock.wait(remaining)
+            finally:
+                self._waiting -= 1
+            self._in_use += 1
+
+        try:
+            if connection is None:
+                connection = self._create()
+            elif self.ping_on_checkout and not self._is_alive(connection):
+                self._close(connection)
+                connection = self._create()
+        except Exception:
+            with self._lock:
+                self._in_use -= 1
+                self._opened -= 1
+                self._lock.notify()
+            raise
+
+        waited = time.monotonic() - started
+        with self._lock:
+            self._checkouts += 1
+            self._wait_time_total += waited
+            self._wait_time_max = max(self._wait_time_max, waited)
+        return connection
+
+    def release(self, connection, discard=False):
+        """
+        归还连接
+
+        Args:
+            connection: 之前借出的连接
+            discard: 是否直接关闭该连接而不放回池中（如连接已损坏）
+        """
+        with self._lock:
+            self._in_use -= 1
+            keep = not discard and len(self._idle) < self.size
+            if keep:
+                self._idle.append((connection, time.monotonic()))
+            else:
+                self._opened -= 1
+            self._lock.notify()
+
+        if not keep:
+            self._close(connection)
+
+    @contextmanager
+    def connection(self):
+        """借出一个连接，离开 with 块时自动归还"""
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def reap_idle(self):
+        """关闭空闲时间超过 idle_timeout 的连接，返回关闭的连接数"""
+        with self._lock:
+            return self._reap_idle_locked()
+
+    def stats(self):
+        """
+        获取连接池统计信息
+
+        Returns:
+            dict: 包括当前连接数、借出数、等待数以及累计等待时间等
+        """
+        with self._lock:
+            return {
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'opened': self._opened,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'waiting': self._waiting,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'created': self._created,
+                'closed': self._closed,
+                'wait_time_total': self._wait_time_total,
+                'wait_time_max': self._wait_time_max,
+                'wait_time_avg': self._wait_time_total / self._checkouts if self._checkouts else 0.0,
+            }
+
+    def close(self):
+        """关闭池中所有空闲连接（借出中的连接归还时会被关闭）"""
+        with self._lock:
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            self._opened -= len(idle)
+            self.size = 0
+            self._lock.notify_all()
+        for connection in idle:
+            self._close(connection)
+
+    def _reap_idle_locked(self):
+        if self.idle_timeout is None:
+            return 0
+        now = time.monotonic()
+        expired = [item for item in self._idle if now - item[1] > self.idle_timeout]
+        for item in expired:
+            self._idle.remove(item)
+            self._opened -= 1
+            self._close(item[0])
+        return len(expired)
+
+    def _create(self):
+        connection = self._creator()
+        with self._lock:
+            self._created += 1
+        return connection
+
+    def _close(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._closed += 1
+
+    @staticmethod
+    def _is_alive(connection):
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
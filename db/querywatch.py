@@ -0,0 +1,177 @@
+"""
+重复查询检测与查询预算
+
+开发环境下（OMS_QUERY_DETECTOR=1）每个请求附带一个 RedundantQueryDetector，请求结束时
+报告两类问题并打印发出这些语句的调用栈：
+
+- 完全相同的语句（SQL 与参数都相同）在同一请求中执行了多次，说明同一行被重复读取；
+- 同一形状（SQL 指纹相同、参数不同）的语句执行次数达到阈值，通常是循环里逐条查询的 N+1。
+
+测试中可以用 assert_query_budget 限制某个路由的语句数，超出时测试失败
+（主要写入路由的预算见 tests/test_query_budget.py）：
+
+    from db.querywatch import assert_query_budget
+
+    def test_admin_registrations_budget(client):
+        assert_query_budget(client, 'post', '/admin/registrations', max_queries=8, allow_redundant=False,
+                            data={'registration_id': 1, 'doctor_id': 1})
+"""
+import os
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+
+from db.instrument import fingerprint
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_DB_DIR = os.path.join(_ROOT, 'db')
+
+_collectors = []  # capture_queries() 正在收集的列表
+
+
+def _params_key(params):
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return tuple(sorted(params.items()))
+    try:
+        key = tuple(params)
+        hash(key)
+        return key
+    except TypeError:
+        return repr(params)
+
+
+def _project_stack(depth):
+    """只保留本项目（db 包之外）的调用栈帧，最近的调用在最后"""
+    frames = [frame for frame in traceback.extract_stack()
+              if frame.filename.startswith(_ROOT) and not frame.filename.startswith(_DB_DIR)]
+    return frames[-depth:]
+
+
+class RedundantQueryDetector:
+    """检测一个请求内的重复查询与 N+1 查询"""
+
+    def __init__(self, same_shape_threshold=3, stack_depth=6):
+        """
+        Args:
+            same_shape_threshold: 同一形状的语句执行多少次视为 N+1
+            stack_depth: 每条语句记录的调用栈深度
+        """
+        self.same_shape_threshold = same_shape_threshold
+        self.stack_depth = stack_depth
+        self._calls = {}  # 指纹 -> [(参数, 调用栈), ...]
+
+    def check(self, cursor, sql, params, elapsed, context=None):
+        """记录一条已执行的语句（由 InstrumentedCursor 调用）"""
+        calls = self._calls.setdefault(fingerprint(sql), [])
+        calls.append((_params_key(params), _project_stack(self.stack_depth)))
+
+    def findings(self):
+        """
+        汇总检测结果
+
+        Returns:
+            list: [{'kind': 'identical' 或 'same_shape', 'fingerprint': 指纹, 'count': 次数,
+                    'stacks': [调用栈, ...]}, ...]
+        """
+        results = []
+        for key, calls in self._calls.items():
+            counts = Counter(params for params, _ in calls)
+            repeated = {params for params, count in counts.items() if count > 1}
+            if repeated:
+                stacks = [stack for params, stack in calls if params in repeated]
+                results.append({'kind': 'identical', 'fingerprint': key, 'count': len(stacks), 'stacks': stacks})
+            elif len(calls) >= self.same_shape_threshold:
+                results.append({'kind': 'same_shape', 'fingerprint': key, 'count': len(calls),
+                                'stacks': [stack for _, stack in calls]})
+        return results
+
+    def report(self):
+        """
+        生成可读的检测报告
+
+        Returns:
+            str: 报告文本，没有问题时为空字符串
+        """
+        lines = []
+        for finding in self.findings():
+            title = "相同语句重复执行" if finding['kind'] == 'identical' else "同一形状的语句逐条执行（N+1）"
+            lines.append(f"{title} {finding['count']} 次: {finding['fingerprint']}")
+            # 调用栈相同的只打印一次
+            printed = set()
+            for stack in finding['stacks']:
+                text = ''.join(traceback.format_list(stack))
+                if text not in printed:
+                    printed.add(text)
+                    lines.append(text.rstrip())
+        return '\n'.join(lines)
+
+
+@contextmanager
+def capture_queries():
+    """
+    收集 with 块内所有请求的 SQL 统计
+
+    Yields:
+        list: 每个请求结束时追加一个 (QueryStats, RedundantQueryDetector) 元组
+    """
+    captured = []
+    _collectors.append(captured)
+    try:
+        yield captured
+    finally:
+        _collectors.remove(captured)
+
+
+def capturing():
+    """是否有 capture_queries() 正在收集"""
+    return bool(_collectors)
+
+
+def publish(stats, detector=None):
+    """请求结束时由 app.py 调用，把该请求的统计交给正在收集的 capture_queries()"""
+    for captured in _collectors:
+        captured.append((stats, detector))
+
+
+def assert_query_budget(client, method, url, max_queries, allow_redundant=True, **kwargs):
+    """
+    发出一个请求并断言其执行的 SQL 语句数不超过预算
+
+    Args:
+        client: Flask 测试客户端（app.test_client()）
+        method: 请求方法，如 'get'、'post'
+        url: 请求地址
+        max_queries: 允许执行的最多语句数
+        allow_redundant: 为 False 时，出现重复查询或 N+1 查询也视为失败
+        **kwargs: 传给测试客户端的其他参数（如 data）
+
+    Returns:
+        测试客户端的响应
+
+    Raises:
+        AssertionError: 超出预算或存在不允许的重复查询
+    """
+    with capture_queries() as captured:
+        response = getattr(client, method.lower())(url, **kwargs)
+
+    statements = sum(stats.statements for stats, _ in captured)
+    problems = []
+    if statements > max_queries:
+        summary = Counter()
+        for stats, _ in captured:
+            for key, (count, _, _) in stats.fingerprints().items():
+                summary[key] += count
+        detail = '\n'.join(f"  {count} x {key}" for key, count in summary.most_common())
+        problems.append(f"{method.upper()} {url} 执行了 {statements} 条语句，预算为 {max_queries}:\n{detail}")
+
+    if not allow_redundant:
+        for _, detector in captured:
+            report = detector.report() if detector is not None else ''
+            if report:
+                problems.append(report)
+
+    if problems:
+        raise AssertionError('\n'.join(problems))
+    return response
@@ -0,0 +1,228 @@
+"""
+慢查询日志
+
+执行时间超过阈值的语句以 JSON 行写入按大小轮转的本地日志，每条记录包括：
+耗时、SQL 指纹与原语句、参数（默认脱敏，只保留类型）、发出该语句的 entity 函数、
+所在路由，以及该语句的执行计划（EXPLAIN，同一指纹在 explain_interval 秒内只取一次）。
+
+由 InstrumentedCursor 在每条语句执行后调用 check()，未超过阈值时只有一次比较的开销。
+
+汇总日志中最慢的语句：
+
+    python -m db.slowlog logs/slow_query.log --top 10 --sort total
+"""
+import argparse
+import json
+import logging
+import logging.handlers
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+
+from db.instrument import fingerprint
+
+_EXPLAINABLE = re.compile(r"\s*(SELECT|UPDATE|DELETE|INSERT|REPLACE)\b", re.IGNORECASE)
+
+
+class SlowQueryLog:
+    """慢查询记录器"""
+
+    def __init__(self, path='logs/slow_query.log', threshold_ms=200, redact_params=True, explain=True,
+                 explain_prefix='EXPLAIN', explain_interval=300, max_bytes=10 * 1024 * 1024, backup_count=5):
+        """
+        Args:
+            path: 日志文件路径
+            threshold_ms: 慢查询阈值（毫秒）
+            redact_params: 是否隐藏参数值（只记录参数类型），避免病人姓名、电话等写入日志
+            explain: 是否自动获取执行计划
+            explain_prefix: 获取执行计划的语句前缀（MySQL 为 'EXPLAIN'，SQLite 为 'EXPLAIN QUERY PLAN'）
+            explain_interval: 同一 SQL 指纹两次获取执行计划的最短间隔（秒）
+            max_bytes: 单个日志文件的最大字节数，超过后轮转
+            backup_count: 保留的历史日志文件数
+        """
+        self.path = path
+        self.threshold = threshold_ms / 1000
+        self.redact_params = redact_params
+        self.explain = explain
+        self.explain_prefix = explain_prefix
+        self.explain_interval = explain_interval
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                       encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self._logger = logging.getLogger(f'oms.slowlog.{path}')
+        self._logger.handlers[:] = [handler]
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+
+        self._explained = {}  # 指纹 -> 上次获取执行计划的时间
+        self._lock = threading.Lock()
+
+    def check(self, cursor, sql, params, elapsed, context=None):
+        """
+        语句执行后调用，超过阈值时写入慢查询日志
+
+        Args:
+            cursor: 执行该语句的原始游标（用于获取执行计划）
+            sql: 语句
+            params: 参数
+            elapsed: 执行耗时（秒）
+            context: 附加字段（可选），如 {'route': '/admin/drugs'}
+        """
+        if elapsed < self.threshold:
+            return
+        try:
+            key = fingerprint(sql)
+            entry = {
+                'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'duration_ms': round(elapsed * 1000, 3),
+                'fingerprint': key,
+                'sql': ' '.join(sql.split()),
+                'params': self._format_params(params),
+                'caller': _find_caller(),
+            }
+            if context:
+                entry.update(context)
+            if self.explain and self._should_explain(key, sql):
+                entry['explain'] = self._explain(cursor, sql, params)
+            self._logger.info(json.dumps(entry, ensure_ascii=False, default=str))
+        except Exception as e:
+            # 记录慢查询失败不能影响业务语句
+            logging.getLogger('oms.slowlog').warning("记录慢查询失败", extra={'error': e})
+
+    def _format_params(self, params):
+        if params is None:
+            return None
+        if isinstance(params, dict):
+            values = params.items()
+            return {key: (type(value).__name__ if self.redact_params else value) for key, value in values}
+        params = list(params)
+        if self.redact_params:
+            return [type(value).__name__ for value in params]
+        return params
+
+    def _should_explain(self, key, sql):
+        if not _EXPLAINABLE.match(sql):
+            return False
+        now = time.monotonic()
+        with self._lock:
+            last = self._explained.get(key)
+            if last is not None and now - last < self.explain_interval:
+                return False
+            self._explained[key] = now
+            return True
+
+    def _explain(self, cursor, sql, params):
+        # 使用同一连接上的新游标，不影响原游标的结果集、rowcount 与 lastrowid
+        explain_cursor = cursor.connection.cursor()
+        try:
+            explain_cursor.execute(f"{self.explain_prefix} {sql}", params)
+            return explain_cursor.fetchall()
+        except Exception as e:
+            return f"获取执行计划失败: {e}"
+        finally:
+            explain_cursor.close()
+
+
+def _find_caller():
+    """找到发出语句的 entity 函数（找不到时返回最近的非 db 包函数）"""
+    frame = sys._getframe(2)
+    fallback = None
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module.startswith('entity.'):
+            return f"{module}.{frame.f_code.co_name}"
+        if fallback is None and not module.startswith('db.') and module != 'contextlib':
+            fallback = f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return fallback
+
+
+def read_entries(path):
+    """
+    读取慢查询日志（包括轮转出的历史文件）
+
+    Args:
+        path: 日志文件路径
+
+    Yields:
+        dict: 日志记录
+    """
+    paths = [path] + [f"{path}.{index}" for index in range(1, 100)]
+    for file_path in reversed([p for p in paths if os.path.exists(p)]):
+        with open(file_path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def summarize(entries, sort='total'):
+    """
+    按 SQL 指纹汇总慢查询
+
+    Args:
+        entries: 日志记录
+        sort: 排序依据，'total'（累计耗时）、'count'（次数）或 'max'（最大耗时）
+
+    Returns:
+        list: 每个指纹的汇总，按 sort 降序
+    """
+    summary = {}
+    for entry in entries:
+        item = summary.setdefault(entry['fingerprint'], {
+            'fingerprint': entry['fingerprint'], 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+            'callers': set(), 'routes': set(), 'explain': None,
+        })
+        item['count'] += 1
+        item['total_ms'] += entry['duration_ms']
+        item['max_ms'] = max(item['max_ms'], entry['duration_ms'])
+        if entry.get('caller'):
+            item['callers'].add(entry['caller'])
+        if entry.get('route'):
+            item['routes'].add(entry['route'])
+        if entry.get('explain') is not None:
+            item['explain'] = entry['explain']
+
+    key = {'total': 'total_ms', 'count': 'count', 'max': 'max_ms'}[sort]
+    return sorted(summary.values(), key=lambda item: item[key], reverse=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='汇总慢查询日志中最慢的语句')
+    parser.add_argument('path', nargs='?', default='logs/slow_query.log', help='慢查询日志路径')
+    parser.add_argument('--top', type=int, default=10, help='显示前几条')
+    parser.add_argument('--sort', choices=('total', 'count', 'max'), default='total', help='排序依据')
+    parser.add_argument('--explain', action='store_true', help='同时显示执行计划')
+    args = parser.parse_args(argv)
+
+    items = summarize(read_entries(args.path), args.sort)
+    if not items:
+        print("没有慢查询记录")
+        return
+
+    for rank, item in enumerate(items[:args.top], 1):
+        print(f"#{rank} 次数 {item['count']}  累计 {item['total_ms']:.1f} ms  "
+              f"平均 {item['total_ms'] / item['count']:.1f} ms  最大 {item['max_ms']:.1f} ms")
+        print(f"    {item['fingerprint']}")
+        if item['callers']:
+            print(f"    调用: {', '.join(sorted(item['callers']))}")
+        if item['routes']:
+            print(f"    路由: {', '.join(sorted(item['routes']))}")
+        if args.explain and item['explain'] is not None:
+            print(f"    执行计划: {json.dumps(item['explain'], ensure_ascii=False, default=str)}")
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,284 @@
+"""
+内嵌 SQLite 存储后端
+
+entity 层与 setup.py 中的 SQL 都是 MySQL 方言，这里在游标层面做翻译：
+- 占位符 %s -> ?
+- NOW() -> 本地时间，LAST_INSERT_ID() -> last_insert_rowid()，去掉 FROM DUAL
+- SET FOREIGN_KEY_CHECKS -> PRAGMA foreign_keys
+- CREATE TABLE 中的 AUTO_INCREMENT、ENUM、COMMENT、内联 INDEX、表选项，
+  以及 ON UPDATE CURRENT_TIMESTAMP（改用触发器实现）
+- ALTER TABLE ... ADD COLUMN 中的 ENUM、COMMENT
+"""
+import datetime
+import itertools
+import re
+import sqlite3
+import threading
+from decimal import Decimal
+from functools import lru_cache
+
+from db.backend import Backend
+
+_LOCAL_NOW = "datetime('now', 'localtime')"
+_memory_names = itertools.count(1)  # 内存库的名称，每个后端实例各用一个
+
+
+def _convert_timestamp(value):
+    return datetime.datetime.fromisoformat(value.decode())
+
+
+def _convert_date(value):
+    return datetime.date.fromisoformat(value.decode()[:10])
+
+
+def _convert_decimal(value):
+    return Decimal(value.decode())
+
+
+sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(' '))
+sqlite3.register_adapter(datetime.date, lambda value: value.isoformat())
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_converter('TIMESTAMP', _convert_timestamp)
+sqlite3.register_converter('DATETIME', _convert_timestamp)
+sqlite3.register_converter('DATE', _convert_date)
+sqlite3.register_converter('DECIMAL', _convert_decimal)
+
+
+class SQLiteBackend(Backend):
+    """SQLite 存储后端"""
+
+    name = 'sqlite'
+    explain_prefix = 'EXPLAIN QUERY PLAN'
+
+    def __init__(self, database='outpatient.db', timeout=30):
+        """
+        Args:
+            database: 数据库文件路径，':memory:' 表示进程内共享的内存数据库
+            timeout: 等待写锁的最长时间（秒）
+        """
+        self.database = database
+        self.timeout = timeout
+        self._memory_keeper = None
+        self._memory_name = f"oms_{next(_memory_names)}"
+        self._lock = threading.Lock()
+
+    def connect(self):
+        if self.database == ':memory:':
+            # 每个连接默认各自拥有一个内存库，改用共享缓存让连接池中的连接看到同一份数据
+            uri = f"file:{self._memory_name}?mode=memory&cache=shared"
+            raw = sqlite3.connect(uri, uri=True, timeout=self.timeout, check_same_thread=False,
+                                  isolation_level=None, detect_types=sqlite3.PARSE_DECLTYPES)
+            with self._lock:
+                if self._memory_keeper is None:
+                    # 最后一个连接关闭时内存库会被销毁，保留一个连接维持其生命周期
+                    self._memory_keeper = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            raw = sqlite3.connect(self.database, timeout=self.timeout, check_same_thread=False,
+                                  isolation_level=None, detect_types=sqlite3.PARSE_DECLTYPES)
+            raw.execute("PRAGMA journal_mode = WAL")
+        raw.execute("PRAGMA foreign_keys = ON")
+        raw.row_factory = _dict_row
+        return SQLiteConnection(raw)
+
+
+def _dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+class SQLiteConnection:
+    """包装 sqlite3 连接，提供与 PyMySQL 连接相同的接口"""
+
+    def __init__(self, raw):
+        self._raw = raw
+
+    def cursor(self, cursor_class=None):
+        return SQLiteCursor(self)
+
+    def ping(self, reconnect=False):
+        self._raw.execute("SELECT 1")
+
+    def begin(self):
+        # 立即获取写锁，避免事务中途由读锁升级为写锁时发生死锁
+        self._raw.execute("BEGIN IMMEDIATE")
+
+    def commit(self):
+        if self._raw.in_transaction:
+            self._raw.execute("COMMIT")
+
+    def rollback(self):
+        if self._raw.in_transaction:
+            self._raw.execute("ROLLBACK")
+
+    def close(self):
+        self._raw.close()
+
+
+class SQLiteCursor:
+    """包装 sqlite3 游标，执行前把 MySQL 方言翻译为 SQLite"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = connection._raw.cursor()
+        self._first_rowid = None
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        # 与 MySQL 一致：多行 INSERT 返回第一行的编号（sqlite3 返回最后一行的）
+        if self._first_rowid is not None:
+            return self._first_rowid
+        return self._cursor.lastrowid
+
+    def execute(self, sql, params=None):
+        statements = translate(sql, params is not None)
+        for statement in statements[:-1]:
+            self._cursor.execute(statement)
+        self._cursor.execute(statements[-1], tuple(params) if params is not None else ())
+        self._first_rowid = None
+        # 只有 INSERT 的 rowcount 等于新行数；REPLACE 的 rowcount 还包含被替换（删除）的行
+        if self._cursor.rowcount > 1 and re.match(r"\s*INSERT\b", statements[-1], re.IGNORECASE):
+            self._first_rowid = self._cursor.lastrowid - self._cursor.rowcount + 1
+        return self._cursor.rowcount
+
+    def executemany(self, sql, seq_of_params):
+        statement, = translate(sql, True)
+        self._cursor.executemany(statement, [tuple(params) for params in seq_of_params])
+        self._first_rowid = None
+        return self._cursor.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size or self._cursor.arraysize)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+@lru_cache(maxsize=1024)
+def translate(sql, has_params=True):
+    """
+    将一条 MySQL 语句翻译为一条或多条 SQLite 语句
+
+    Args:
+        sql: MySQL 方言的 SQL
+        has_params: 是否带参数执行（决定是否处理 %s 与 %% 转义）
+
+    Returns:
+        tuple: SQLite 语句，只有最后一条绑定参数
+    """
+    stripped = sql.strip()
+
+    match = re.fullmatch(r"SET\s+FOREIGN_KEY_CHECKS\s*=\s*([01])", stripped, re.IGNORECASE)
+    if match:
+        return (f"PRAGMA foreign_keys = {'ON' if match.group(1) == '1' else 'OFF'}",)
+
+    if re.match(r"CREATE\s+TABLE", stripped, re.IGNORECASE):
+        return _translate_create_table(stripped)
+
+    match = re.fullmatch(r"(ALTER\s+TABLE\s+\w+\s+ADD\s+COLUMN\s+)(.*)", stripped, re.IGNORECASE | re.DOTALL)
+    if match:
+        return (match.group(1) + _translate_column(match.group(2)),)
+
+    if has_params:
+        stripped = stripped.replace('%s', '?').replace('%%', '%')
+    if re.fullmatch(r"SELECT\s+LAST_INSERT_ID\(\)", stripped, re.IGNORECASE):
+        # 保持与 MySQL 相同的结果列名
+        return ('SELECT last_insert_rowid() AS "LAST_INSERT_ID()"',)
+    stripped = re.sub(r"\bLAST_INSERT_ID\(\)", "last_insert_rowid()", stripped, flags=re.IGNORECASE)
+    stripped = re.sub(r"\bNOW\(\)", _LOCAL_NOW, stripped, flags=re.IGNORECASE)
+    stripped = re.sub(r"\bINSERT\s+IGNORE\b", "INSERT OR IGNORE", stripped, flags=re.IGNORECASE)
+    stripped = re.sub(r"\s+FROM\s+DUAL\b", "", stripped, flags=re.IGNORECASE)
+    return (stripped,)
+
+
+def _split_top_level(body):
+    """按顶层逗号拆分建表语句的列定义（忽略括号和引号内的逗号）"""
+    parts, depth, quote, current = [], 0, None, []
+    for char in body:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            parts.append(''.join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    if ''.join(current).strip():
+        parts.append(''.join(current).strip())
+    return parts
+
+
+def _translate_column(definition):
+    """列定义：去掉 COMMENT，ENUM 改为 TEXT 加 CHECK 约束"""
+    definition = re.sub(r"\s+COMMENT\s+'[^']*'", '', definition, flags=re.IGNORECASE)
+    enum = re.search(r"\bENUM\s*(\([^)]*\))", definition, re.IGNORECASE)
+    if enum:
+        name = definition.split()[0]
+        definition = definition.replace(enum.group(0), 'TEXT') + f" CHECK ({name} IN {enum.group(1)})"
+    return definition
+
+
+def _translate_create_table(sql):
+    match = re.match(r"CREATE\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?(\w+)\s*\((.*)\)[^)]*$", sql,
+                     re.IGNORECASE | re.DOTALL)
+    if not match:
+        return (sql,)
+    if_not_exists, table, body = match.group(1) or '', match.group(2), match.group(3)
+
+    columns, extra = [], []
+    for definition in _split_top_level(body):
+        definition = re.sub(r"\s+COMMENT\s+'[^']*'", '', definition, flags=re.IGNORECASE)
+
+        index = re.match(r"(UNIQUE\s+)?(?:INDEX|KEY)\s+(\w+)\s*(\(.*\))", definition, re.IGNORECASE)
+        if index:
+            unique = 'UNIQUE ' if index.group(1) else ''
+            extra.append(f"CREATE {unique}INDEX IF NOT EXISTS {index.group(2)} ON {table} {index.group(3)}")
+            continue
+
+        if re.match(r"(PRIMARY\s+KEY|FOREIGN\s+KEY|UNIQUE|CONSTRAINT|CHECK)\b", definition, re.IGNORECASE):
+            columns.append(definition)
+            continue
+
+        name = definition.split()[0]
+        if re.search(r"\bAUTO_INCREMENT\b", definition, re.IGNORECASE):
+            columns.append(f"{name} INTEGER PRIMARY KEY AUTOINCREMENT")
+            continue
+
+        definition = _translate_column(definition)
+
+        if re.search(r"\bON\s+UPDATE\s+CURRENT_TIMESTAMP\b", definition, re.IGNORECASE):
+            definition = re.sub(r"\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP\b", '', definition, flags=re.IGNORECASE)
+            extra.append(
+                f"CREATE TRIGGER IF NOT EXISTS trg_{table}_{name}_on_update AFTER UPDATE ON {table} "
+                f"FOR EACH ROW WHEN NEW.{name} IS OLD.{name} "
+                f"BEGIN UPDATE {table} SET {name} = {_LOCAL_NOW} WHERE rowid = NEW.rowid; END"
+            )
+
+        definition = re.sub(r"\bDEFAULT\s+CURRENT_TIMESTAMP\b", f"DEFAULT ({_LOCAL_NOW})", definition,
+                            flags=re.IGNORECASE)
+        definition = re.sub(r"\s+UNSIGNED\b", '', definition, flags=re.IGNORECASE)
+        columns.append(definition)
+
+    create = f"CREATE TABLE {if_not_exists}{table} (\n    " + ",\n    ".join(columns) + "\n)"
+    return tuple([create] + extra)
@@ -0,0 +1,42 @@
+from contextlib import contextmanager
+
+
+class Rollback(Exception):
+    """在 transaction 块内抛出以回滚事务，该异常不会继续向外传播"""
+
+
+@contextmanager
+def transaction(cursor):
+    """
+    在游标所属连接上开启事务，with 块正常结束时提交，抛出异常时回滚
+
+    连接默认是自动提交模式，需要多条语句原子生效时使用：
+
+        with transaction(cursor):
+            cursor.execute(...)
+            if not cursor.rowcount:
+                raise Rollback
+            cursor.execute(...)
+
+    Args:
+        cursor: 数据库游标
+    """
+    connection = cursor.connection
+    connection.begin()
+    try:
+        yield cursor
+    except Rollback:
+        _rollback(cursor)
+    except BaseException:
+        _rollback(cursor)
+        raise
+    else:
+        connection.commit()
+
+
+def _rollback(cursor):
+    cursor.connection.rollback()
+    # 事务内读取并保存在标识映射中的记录可能包含已回滚的修改
+    identity_map = getattr(cursor, 'identity_map', None)
+    if identity_map is not None:
+        identity_map.clear()
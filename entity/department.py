@@ -1,5 +1,14 @@
 import pymysql
+from log import get_logger
+from db.cache import cached, invalidates
+from db.identity import fetch_row
+from db.transaction import transaction
+from schedule import worklist
+import entity.summary as summary_module
 
+logger = get_logger(__name__)
+
+@invalidates('department')
 def create_department(cursor, department_name):
     """
     创建新科室
@@ -12,35 +21,29 @@ def create_department(cursor, department_name):
         int: 新创建科室的编号，失败返回None
     """
     try:
-        # 检查科室名称是否已存在
-        cursor.execute("SELECT department_id FROM department WHERE department_name = %s", (department_name,))
-        if cursor.fetchone():
-            print(f"❌ 科室 '{department_name}' 已存在")
-            return None
-        
-        # 插入新科室
+        # 仅当科室名称不存在时插入新科室（名称检查与插入在同一条语句中完成）
         sql = """
         INSERT INTO department (department_name, created_at) 
-        VALUES (%s, NOW())
+        SELECT %s, NOW() FROM DUAL 
+        WHERE NOT EXISTS (SELECT 1 FROM department WHERE department_name = %s)
         """
-        cursor.execute(sql, (department_name,))
+        cursor.execute(sql, (department_name, department_name))
         
-        # 获取刚插入的科室编号
-        cursor.execute("SELECT LAST_INSERT_ID()")
-        result = cursor.fetchone()
+        if not cursor.rowcount:
+            logger.warning("科室已存在", extra={'department_name': department_name})
+            return None
         
-        if isinstance(result, tuple):
-            department_id = result[0]
-        else:
-            department_id = result['LAST_INSERT_ID()']
+        # 获取刚插入的科室编号（随 INSERT 响应返回，无需额外查询）
+        department_id = cursor.lastrowid
         
-        print(f"✅ 科室创建成功！科室编号: {department_id}, 科室名称: {department_name}")
+        logger.info("科室创建成功", extra={'department_id': department_id, 'department_name': department_name})
         return department_id
         
     except Exception as e:
-        print(f"❌ 创建科室失败: {e}")
+        logger.error("创建科室失败", extra={'error': e})
         return None
 
+@invalidates('department')
 def update_department(cursor, department_id, new_department_name):
     """
     更新科室名称
@@ -59,7 +62,7 @@ def update_department(cursor, department_id, new_department_name):
         old_department = cursor.fetchone()
         
         if not old_department:
-            print(f"❌ 科室编号 {department_id} 不存在")
+            logger.warning("科室编号不存在", extra={'department_id': department_id})
             return False
         
         old_name = old_department['department_name'] if isinstance(old_department, dict) else old_department[1]
@@ -68,26 +71,29 @@ def update_department(cursor, department_id, new_department_name):
         cursor.execute("SELECT department_id FROM department WHERE department_name = %s AND department_id != %s", 
                       (new_department_name, department_id))
         if cursor.fetchone():
-            print(f"❌ 科室名称 '{new_department_name}' 已被其他科室使用")
+            logger.warning("科室名称已被其他科室使用", extra={'department_name': new_department_name})
             return False
         
-        # 更新科室名称
+        # 更新科室名称，同步挂号工作列表中的科室名称
         sql = """
         UPDATE department 
         SET department_name = %s, updated_at = NOW() 
         WHERE department_id = %s
         """
-        cursor.execute(sql, (new_department_name, department_id))
+        with transaction(cursor):
+            cursor.execute(sql, (new_department_name, department_id))
+            worklist.rename_department(cursor, department_id, new_department_name)
+            summary_module.touch_department(cursor, department_id)
         
-        print(f"✅ 科室更新成功！科室编号: {department_id}")
-        print(f"   原名称: {old_name}")
-        print(f"   新名称: {new_department_name}")
+        logger.info("科室更新成功", extra={'department_id': department_id, 'old_name': old_name,
+                                      'new_name': new_department_name})
         return True
         
     except Exception as e:
-        print(f"❌ 更新科室失败: {e}")
+        logger.error("更新科室失败", extra={'error': e})
         return False
 
+@cached('department')
 def query_department(cursor, department_id=None, department_name=None):
     """
     查询科室信息
@@ -121,29 +127,11 @@ def query_department(cursor, department_id=None, department_name=None):
         
         cursor.execute(sql, params)
         results = cursor.fetchall()
-        
-        # 输出查询结果
-        print(f"\n🔍 查询到 {len(results)} 条科室记录")
-        print("-" * 80)
-        print(f"{'科室编号':<10} {'科室名称':<20} {'创建时间':<20} {'更新时间':<20}")
-        print("-" * 80)
-        
-        if results:
-            for dept in results:
-                created_time = str(dept['created_at']) if dept['created_at'] else 'NULL'
-                updated_time = str(dept['updated_at']) if dept['updated_at'] else 'NULL'
-                
-                print(f"{dept['department_id']:<10} {dept['department_name']:<20} "
-                      f"{created_time:<20} {updated_time:<20}")
-        else:
-            print("  没有找到匹配的科室记录")
-        
-        print("-" * 80)
-        
+        logger.debug("查询科室", extra={'row_count': len(results)})
         return results
         
     except Exception as e:
-        print(f"❌ 查询科室失败: {e}")
+        logger.error("查询科室失败", extra={'error': e})
         return []
     
 def check_department_exists(cursor, department_id):
@@ -158,15 +146,9 @@ def check_department_exists(cursor, department_id):
         bool: 存在返回True，不存在返回False
     """
     try:
-        # 查询科室是否存在
-        cursor.execute("SELECT department_id FROM department WHERE department_id = %s", (department_id,))
-        result = cursor.fetchone()
-        
-        if result:
-            return True
-        else:
-            return False
+        # 查询科室是否存在（同一请求内已读取过该行时不再查询）
+        return fetch_row(cursor, 'department', 'department_id', department_id) is not None
             
     except Exception as e:
-        print(f"❌ 检查科室ID失败: {e}")
+        logger.error("检查科室ID失败", extra={'error': e})
         return False
\ No newline at end of file
@@ -1,5 +1,14 @@
 import pymysql
+from log import get_logger
+from db.cache import cached, invalidates
+from db.pagination import keyset_clause
+from db.identity import fetch_row
+from db.transaction import transaction
+from search import names
 
+logger = get_logger(__name__)
+
+@invalidates('doctor')
 def register_doctor(cursor, name, gender, phone_number, position=None, department_id=None):
     """
     新医生注册
@@ -16,40 +25,42 @@ def register_doctor(cursor, name, gender, phone_number, position=None, departmen
         int: 新注册医生的工号，失败返回None
     """
     try:
-        # 插入新医生信息
-        sql = """
-        INSERT INTO doctor (name, gender, phone_number, position, department_id, created_at) 
-        VALUES (%s, %s, %s, %s, %s, NOW())
-        """
-        cursor.execute(sql, (name, gender, phone_number, position, department_id))
-        
-        # 获取刚插入的医生工号
-        cursor.execute("SELECT LAST_INSERT_ID()")
-        result = cursor.fetchone()
-        
-        if isinstance(result, tuple):
-            doctor_id = result[0]
-        else:
-            doctor_id = result['LAST_INSERT_ID()']
+        with transaction(cursor):
+            # 插入新医生信息
+            sql = """
+            INSERT INTO doctor (name, gender, phone_number, position, department_id, created_at) 
+            VALUES (%s, %s, %s, %s, %s, NOW())
+            """
+            cursor.execute(sql, (name, gender, phone_number, position, department_id))
+            
+            # 获取刚插入的医生工号（随 INSERT 响应返回，无需额外查询）
+            doctor_id = cursor.lastrowid
+            
+            # 写入姓名检索词
+            names.index_name(cursor, 'doctor', doctor_id, name)
         
-        print(f"✅ 医生注册成功！工号: {doctor_id}")
+        logger.info("医生注册成功", extra={'doctor_id': doctor_id})
         return doctor_id
         
     except Exception as e:
-        print(f"❌ 医生注册失败: {e}")
+        logger.error("医生注册失败", extra={'error': e})
         return None
 
-def query_doctor(cursor, doctor_id=None, name=None, phone_number=None, position=None, department_id=None):
+@cached('doctor', 'department')
+def query_doctor(cursor, doctor_id=None, name=None, phone_number=None, position=None, department_id=None, after_id=None, before_id=None, limit=None):
     """
     查询医生信息
     
     Args:
         cursor: 数据库游标
         doctor_id: 医生工号（可选）
-        name: 姓名（可选，支持模糊查询）
+        name: 姓名（可选，支持模糊查询，先通过姓名检索表缩小范围）
         phone_number: 电话号码（可选，支持模糊查询）
         position: 职称（可选，支持模糊查询）
         department_id: 科室编号（可选）
+        after_id: 分页游标，只返回医生工号大于该值的记录（可选）
+        before_id: 分页游标，只返回医生工号小于该值的记录（可选）
+        limit: 返回条数（可选，默认不分页，最多 MAX_PAGE_SIZE 条）
     
     Returns:
         list: 查询结果列表
@@ -64,6 +75,11 @@ def query_doctor(cursor, doctor_id=None, name=None, phone_number=None, position=
             params.append(doctor_id)
         
         if name:
+            # 姓名检索表给出候选医生工号，LIKE 只校验候选行，不再全表扫描
+            candidate_sql, candidate_params = names.name_filter('doctor', 'd.doctor_id', name)
+            if candidate_sql:
+                conditions.append(candidate_sql)
+                params.extend(candidate_params)
             conditions.append("d.name LIKE %s")
             params.append(f"%{name}%")
         
@@ -79,13 +95,15 @@ def query_doctor(cursor, doctor_id=None, name=None, phone_number=None, position=
             conditions.append("d.department_id = %s")
             params.append(department_id)
         
+        order_sql, reverse = keyset_clause("d.doctor_id", conditions, params, after_id, before_id, limit)
+
         # 构建SQL查询，包含科室名称
         if not conditions:
-            sql = """
+            sql = f"""
             SELECT d.*, dept.department_name 
             FROM doctor d 
             LEFT JOIN department dept ON d.department_id = dept.department_id 
-            ORDER BY d.doctor_id
+            {order_sql}
             """
         else:
             sql = f"""
@@ -93,38 +111,56 @@ def query_doctor(cursor, doctor_id=None, name=None, phone_number=None, position=
             FROM doctor d 
             LEFT JOIN department dept ON d.department_id = dept.department_id 
             WHERE {' AND '.join(conditions)} 
-            ORDER BY d.doctor_id
+            {order_sql}
             """
         
         cursor.execute(sql, params)
         results = cursor.fetchall()
+        if reverse:
+            results = list(reversed(results))
+        logger.debug("查询医生", extra={'row_count': len(results)})
+        return results
         
-        # 输出查询结果
-        print(f"\n🔍 查询到 {len(results)} 条医生记录")
-        print("-" * 120)
-        print(f"{'工号':<8} {'姓名':<10} {'性别':<6} {'电话号码':<15} {'职称':<12} {'科室':<15} {'科室ID':<8} {'创建时间':<20}")
-        print("-" * 120)
-        
-        if results:
-            for doctor in results:
-                dept_name = doctor['department_name'] if doctor['department_name'] else '未分配'
-                dept_id = doctor['department_id'] if doctor['department_id'] else 'NULL'
-                position = doctor['position'] if doctor['position'] else '未分配'
-                created_time = str(doctor['created_at']) if doctor['created_at'] else 'NULL'
-                
-                print(f"{doctor['doctor_id']:<8} {doctor['name']:<10} {doctor['gender']:<6} "
-                      f"{doctor['phone_number']:<15} {position:<12} {dept_name:<15} {dept_id:<8} {created_time:<20}")
-        else:
-            print("  没有找到匹配的医生记录")
-        
-        print("-" * 120)
-        
+    except Exception as e:
+        logger.error("查询医生失败", extra={'error': e})
+        return []
+
+@cached('doctor', 'department')
+def search_doctor(cursor, keyword, limit=20):
+    """
+    按姓名、拼音或拼音首字母检索医生，结果按匹配程度排序
+    
+    Args:
+        cursor: 数据库游标
+        keyword: 查询词，如 "张三"、"zhangsan"、"zs"
+        limit: 最多返回条数
+    
+    Returns:
+        list: 查询结果列表（包含科室名称）
+    """
+    try:
+        doctor_ids = names.search_names(cursor, 'doctor', keyword, limit)
+        if not doctor_ids:
+            return []
+        
+        placeholders = ', '.join(['%s'] * len(doctor_ids))
+        sql = f"""
+        SELECT d.*, dept.department_name 
+        FROM doctor d 
+        LEFT JOIN department dept ON d.department_id = dept.department_id 
+        WHERE d.doctor_id IN ({placeholders})
+        """
+        cursor.execute(sql, doctor_ids)
+        rows = {row['doctor_id']: row for row in cursor.fetchall()}
+        results = [rows[doctor_id] for doctor_id in doctor_ids if doctor_id in rows]
+        logger.debug("检索医生", extra={'row_count': len(results)})
         return results
         
     except Exception as e:
-        print(f"❌ 查询医生失败: {e}")
+        logger.error("检索医生失败", extra={'error': e})
         return []
 
+@invalidates('doctor')
 def set_doctor_department(cursor, doctor_id, department_id):
     """
     设置医生所属科室
@@ -143,7 +179,7 @@ def set_doctor_department(cursor, doctor_id, department_id):
         doctor = cursor.fetchone()
         
         if not doctor:
-            print(f"❌ 医生工号 {doctor_id} 不存在")
+            logger.warning("医生工号不存在", extra={'doctor_id': doctor_id})
             return False
         
         # 2. 检查科室是否存在
@@ -151,7 +187,7 @@ def set_doctor_department(cursor, doctor_id, department_id):
         department = cursor.fetchone()
         
         if not department:
-            print(f"❌ 科室编号 {department_id} 不存在")
+            logger.warning("科室编号不存在", extra={'department_id': department_id})
             return False
         
         # 3. 获取当前信息
@@ -161,7 +197,7 @@ def set_doctor_department(cursor, doctor_id, department_id):
         
         # 4. 检查是否已经是该科室
         if current_dept_id == department_id:
-            print(f"⚠️ 医生 {doctor_name} 已经在科室 {dept_name} 中")
+            logger.warning("医生已经在该科室中", extra={'doctor_id': doctor_id, 'department_id': department_id})
             return True
         
         # 5. 更新医生科室
@@ -172,26 +208,17 @@ def set_doctor_department(cursor, doctor_id, department_id):
         """
         cursor.execute(sql, (department_id, doctor_id))
         
-        # 6. 输出结果信息
-        if current_dept_id:
-            # 获取原科室名称
-            cursor.execute("SELECT department_name FROM department WHERE department_id = %s", (current_dept_id,))
-            old_dept = cursor.fetchone()
-            old_dept_name = old_dept['department_name'] if old_dept else "未知科室"
-            print(f"✅ 医生科室设置成功！")
-            print(f"   医生: {doctor_name} (工号: {doctor_id})")
-            print(f"   从: {old_dept_name} → 调入: {dept_name}")
-        else:
-            print(f"✅ 医生科室设置成功！")
-            print(f"   医生: {doctor_name} (工号: {doctor_id})")
-            print(f"   分配到: {dept_name}")
+        logger.info("医生科室设置成功", extra={'doctor_id': doctor_id, 'doctor_name': doctor_name,
+                                         'old_department_id': current_dept_id, 'department_id': department_id,
+                                         'department_name': dept_name})
         
         return True
         
     except Exception as e:
-        print(f"❌ 设置医生科室失败: {e}")
+        logger.error("设置医生科室失败", extra={'error': e})
         return False
 
+@invalidates('doctor')
 def remove_doctor_department(cursor, doctor_id):
     """
     移除医生科室（设为未分配状态）
@@ -209,19 +236,14 @@ def remove_doctor_department(cursor, doctor_id):
         doctor = cursor.fetchone()
         
         if not doctor:
-            print(f"❌ 医生工号 {doctor_id} 不存在")
+            logger.warning("医生工号不存在", extra={'doctor_id': doctor_id})
             return False
         
         # 检查是否已经有科室
         if not doctor['department_id']:
-            print(f"⚠️ 医生 {doctor['name']} 已经是未分配状态")
+            logger.warning("医生已经是未分配科室状态", extra={'doctor_id': doctor_id})
             return True
         
-        # 获取当前科室名称
-        cursor.execute("SELECT department_name FROM department WHERE department_id = %s", (doctor['department_id'],))
-        dept = cursor.fetchone()
-        dept_name = dept['department_name'] if dept else "未知科室"
-        
         # 更新为NULL
         sql = """
         UPDATE doctor 
@@ -230,16 +252,15 @@ def remove_doctor_department(cursor, doctor_id):
         """
         cursor.execute(sql, (doctor_id,))
         
-        print(f"✅ 医生科室移除成功！")
-        print(f"   医生: {doctor['name']} (工号: {doctor_id})")
-        print(f"   从 {dept_name} 移除，现为未分配状态")
+        logger.info("医生科室移除成功", extra={'doctor_id': doctor_id, 'old_department_id': doctor['department_id']})
         
         return True
         
     except Exception as e:
-        print(f"❌ 移除医生科室失败: {e}")
+        logger.error("移除医生科室失败", extra={'error': e})
         return False
 
+@invalidates('doctor')
 def set_doctor_position(cursor, doctor_id, position):
     """
     设置医生职称
@@ -258,7 +279,7 @@ def set_doctor_position(cursor, doctor_id, position):
         doctor = cursor.fetchone()
         
         if not doctor:
-            print(f"❌ 医生工号 {doctor_id} 不存在")
+            logger.warning("医生工号不存在", extra={'doctor_id': doctor_id})
             return False
         
         # 2. 获取当前信息
@@ -267,7 +288,7 @@ def set_doctor_position(cursor, doctor_id, position):
         
         # 3. 检查是否已经是该职称
         if current_position == position:
-            print(f"⚠️ 医生 {doctor_name} 的职称已经是 '{position}'")
+            logger.warning("医生已经是该职称", extra={'doctor_id': doctor_id, 'position': position})
             return True
         
         # 4. 更新医生职称
@@ -278,22 +299,16 @@ def set_doctor_position(cursor, doctor_id, position):
         """
         cursor.execute(sql, (position, doctor_id))
         
-        # 5. 输出结果信息
-        if current_position:
-            print(f"✅ 医生职称设置成功！")
-            print(f"   医生: {doctor_name} (工号: {doctor_id})")
-            print(f"   职称: {current_position} → {position}")
-        else:
-            print(f"✅ 医生职称设置成功！")
-            print(f"   医生: {doctor_name} (工号: {doctor_id})")
-            print(f"   设置职称: {position}")
+        logger.info("医生职称设置成功", extra={'doctor_id': doctor_id, 'doctor_name': doctor_name,
+                                         'old_position': current_position, 'position': position})
         
         return True
         
     except Exception as e:
-        print(f"❌ 设置医生职称失败: {e}")
+        logger.error("设置医生职称失败", extra={'error': e})
         return False
 
+@invalidates('doctor')
 def remove_doctor_position(cursor, doctor_id):
     """
     移除医生职称（设为未分配状态）
@@ -311,12 +326,12 @@ def remove_doctor_position(cursor, doctor_id):
         doctor = cursor.fetchone()
         
         if not doctor:
-            print(f"❌ 医生工号 {doctor_id} 不存在")
+            logger.warning("医生工号不存在", extra={'doctor_id': doctor_id})
             return False
         
         # 2. 检查是否已经有职称
         if not doctor['position']:
-            print(f"⚠️ 医生 {doctor['name']} 已经是未分配职称状态")
+            logger.warning("医生已经是未分配职称状态", extra={'doctor_id': doctor_id})
             return True
         
         # 3. 更新为NULL
@@ -327,14 +342,12 @@ def remove_doctor_position(cursor, doctor_id):
         """
         cursor.execute(sql, (doctor_id,))
         
-        print(f"✅ 医生职称移除成功！")
-        print(f"   医生: {doctor['name']} (工号: {doctor_id})")
-        print(f"   职称 '{doctor['position']}' 已移除，现为未分配状态")
+        logger.info("医生职称移除成功", extra={'doctor_id': doctor_id, 'old_position': doctor['position']})
         
         return True
         
     except Exception as e:
-        print(f"❌ 移除医生职称失败: {e}")
+        logger.error("移除医生职称失败", extra={'error': e})
         return False
     
 def check_doctor_exists(cursor, doctor_id):
@@ -349,15 +362,9 @@ def check_doctor_exists(cursor, doctor_id):
         bool: 存在返回True，不存在返回False
     """
     try:
-        # 查询医生是否存在
-        cursor.execute("SELECT doctor_id FROM doctor WHERE doctor_id = %s", (doctor_id,))
-        result = cursor.fetchone()
-        
-        if result:
-            return True
-        else:
-            return False
+        # 查询医生是否存在（同一请求内已读取过该行时不再查询）
+        return fetch_row(cursor, 'doctor', 'doctor_id', doctor_id) is not None
             
     except Exception as e:
-        print(f"❌ 检查医生ID失败: {e}")
+        logger.error("检查医生ID失败", extra={'error': e})
         return False
\ No newline at end of file
@@ -1,5 +1,15 @@
 import pymysql
+from log import get_logger
+from db.cache import cached, invalidates
+from db.pagination import keyset_clause
+from db.identity import fetch_row
+from db.transaction import transaction
+from search.drugs import drug_index
+import entity.summary as summary_module
 
+logger = get_logger(__name__)
+
+@invalidates('drug')
 def add_drug(cursor, drug_name, stored_quantity, drug_price):
     """
     新药品入库
@@ -21,23 +31,21 @@ def add_drug(cursor, drug_name, stored_quantity, drug_price):
         """
         cursor.execute(sql, (drug_name, stored_quantity, drug_price))
         
-        # 获取刚插入的药品编号
-        cursor.execute("SELECT LAST_INSERT_ID()")
-        result = cursor.fetchone()
+        # 获取刚插入的药品编号（随 INSERT 响应返回，无需额外查询）
+        drug_id = cursor.lastrowid
         
-        if isinstance(result, tuple):
-            drug_id = result[0]
-        else:
-            drug_id = result['LAST_INSERT_ID()']
+        # 增量更新药品联想索引
+        drug_index.upsert(drug_id, drug_name, drug_price, stored_quantity)
         
-        print(f"✅ 药品入库成功！药品编号: {drug_id}")
+        logger.info("药品入库成功", extra={'drug_id': drug_id})
         return drug_id
         
     except Exception as e:
-        print(f"❌ 药品入库失败: {e}")
+        logger.error("药品入库失败", extra={'error': e})
         return None
 
-def query_drug(cursor, drug_id=None, drug_name=None):
+@cached('drug')
+def query_drug(cursor, drug_id=None, drug_name=None, after_id=None, before_id=None, limit=None):
     """
     查询药品信息
     
@@ -45,6 +53,9 @@ def query_drug(cursor, drug_id=None, drug_name=None):
         cursor: 数据库游标
         drug_id: 药品编号（可选）
         drug_name: 药品名称（可选，支持模糊查询）
+        after_id: 分页游标，只返回药品编号大于该值的记录（可选）
+        before_id: 分页游标，只返回药品编号小于该值的记录（可选）
+        limit: 返回条数（可选，默认不分页，最多 MAX_PAGE_SIZE 条）
     
     Returns:
         list: 查询结果列表
@@ -62,42 +73,54 @@ def query_drug(cursor, drug_id=None, drug_name=None):
             conditions.append("drug_name LIKE %s")
             params.append(f"%{drug_name}%")
         
+        order_sql, reverse = keyset_clause("drug_id", conditions, params, after_id, before_id, limit)
+
         # 如果没有查询条件，返回所有药品
         if not conditions:
-            sql = "SELECT * FROM drug ORDER BY drug_id"
+            sql = f"SELECT * FROM drug {order_sql}"
         else:
-            sql = f"SELECT * FROM drug WHERE {' AND '.join(conditions)} ORDER BY drug_id"
+            sql = f"SELECT * FROM drug WHERE {' AND '.join(conditions)} {order_sql}"
         
         cursor.execute(sql, params)
         results = cursor.fetchall()
+        if reverse:
+            results = list(reversed(results))
+        logger.debug("查询药品", extra={'row_count': len(results)})
+        return results
         
-        # 输出查询结果
-        print(f"\n🔍 查询到 {len(results)} 条药品记录")
-        print("-" * 90)
-        print(f"{'药品编号':<8} {'药品名称':<20} {'库存数量':<10} {'单价':<10} {'创建时间':<20}")
-        print("-" * 90)
-        
-        if results:
-            for drug in results:
-                # 确保时间字段正确显示
-                created_time = str(drug['created_at']) if drug['created_at'] else 'NULL'
-                print(f"{drug['drug_id']:<8} {drug['drug_name']:<20} {drug['stored_quantity']:<10} "
-                      f"{drug['drug_price']:<10} {created_time:<20}")
-        else:
-            print("  没有找到匹配的药品记录")
-        
-        print("-" * 90)
-        
+    except Exception as e:
+        logger.error("查询药品失败", extra={'error': e})
+        return []
+
+def search_drug(cursor, keyword, limit=20):
+    """
+    药品联想：按名称、拼音或拼音首字母前缀查找药品（使用进程内索引，不逐次查询数据库）
+    
+    Args:
+        cursor: 数据库游标（索引需要加载时使用）
+        keyword: 已输入的文字，如 "阿司"、"asp"
+        limit: 最多返回条数
+    
+    Returns:
+        list: 药品列表（drug_id、drug_name、drug_price、stored_quantity），按匹配程度排序
+    """
+    try:
+        results = drug_index.search(cursor, keyword, limit)
+        logger.debug("药品联想", extra={'row_count': len(results)})
         return results
         
     except Exception as e:
-        print(f"❌ 查询药品失败: {e}")
+        logger.error("药品联想失败", extra={'error': e})
         return []
 
+@invalidates('drug')
 def update_drug_info(cursor, drug_id, stored_quantity=None, drug_price=None):
     """
     修改药品信息（库存或价格）
     
+    已开处方按开具时的单价计费，调价不影响其金额；升级前开具、未保存单价的处方仍按当前单价显示，
+    调价时在同一事务中递增这些病人的概览版本号。
+    
     Args:
         cursor: 数据库游标
         drug_id: 药品编号
@@ -111,7 +134,7 @@ def update_drug_info(cursor, drug_id, stored_quantity=None, drug_price=None):
         # 检查药品是否存在
         cursor.execute("SELECT * FROM drug WHERE drug_id = %s", (drug_id,))
         if not cursor.fetchone():
-            print(f"❌ 药品编号 {drug_id} 不存在")
+            logger.warning("药品编号不存在", extra={'drug_id': drug_id})
             return False
         
         # 构建更新语句
@@ -127,7 +150,7 @@ def update_drug_info(cursor, drug_id, stored_quantity=None, drug_price=None):
             params.append(drug_price)
         
         if not updates:
-            print("❌ 没有提供要更新的信息")
+            logger.warning("没有提供要更新的信息", extra={'drug_id': drug_id})
             return False
         
         # 添加更新时间和药品编号
@@ -135,13 +158,19 @@ def update_drug_info(cursor, drug_id, stored_quantity=None, drug_price=None):
         params.append(drug_id)
         
         sql = f"UPDATE drug SET {', '.join(updates)} WHERE drug_id = %s"
-        cursor.execute(sql, params)
+        with transaction(cursor):
+            cursor.execute(sql, params)
+            if drug_price is not None:
+                summary_module.touch_drug(cursor, drug_id)
+        
+        # 增量更新药品联想索引中的库存与单价
+        drug_index.update(int(drug_id), stored_quantity=stored_quantity, drug_price=drug_price)
         
-        print(f"✅ 药品 {drug_id} 信息更新成功")
+        logger.info("药品信息更新成功", extra={'drug_id': drug_id})
         return True
         
     except Exception as e:
-        print(f"❌ 更新药品信息失败: {e}")
+        logger.error("更新药品信息失败", extra={'error': e})
         return False
 
 def get_drug_info(cursor, drug_id, info_type='drug_name'):
@@ -157,37 +186,29 @@ def get_drug_info(cursor, drug_id, info_type='drug_name'):
         根据info_type返回对应的信息值，如果不存在或查询失败返回None
     """
     try:
-        # 检查药品是否存在
-        if not check_drug_exists(cursor, drug_id):
-            print(f"❌ 获取药品信息失败：药品编号 {drug_id} 不存在")
-            return None
-        
-        # 查询药品记录
-        cursor.execute("SELECT drug_name, stored_quantity, drug_price FROM drug WHERE drug_id = %s", (drug_id,))
-        drug = cursor.fetchone()
+        # 查询药品记录（存在性检查与读取合并为一次按主键读取）
+        drug = fetch_row(cursor, 'drug', 'drug_id', drug_id)
         
         if not drug:
-            print(f"❌ 获取药品信息失败：药品编号 {drug_id} 的记录不存在")
+            logger.warning("获取药品信息失败：药品编号不存在", extra={'drug_id': drug_id})
             return None
         
         # 根据info_type返回对应的信息
         if info_type == 'drug_name':
             result = drug['drug_name']
-            print(f"✅ 药品编号 {drug_id} 对应的药品名称: {result}")
         elif info_type == 'quantity':
             result = drug['stored_quantity']
-            print(f"✅ 药品编号 {drug_id} 对应的库存数量: {result}")
         elif info_type == 'price':
             result = drug['drug_price']
-            print(f"✅ 药品编号 {drug_id} 对应的单价: {result}")
         else:
-            print(f"❌ 无效的信息类型: {info_type}，请使用 'drug_name', 'quantity' 或 'price'")
+            logger.error("无效的信息类型，请使用 'drug_name', 'quantity' 或 'price'", extra={'info_type': info_type})
             return None
         
+        logger.debug("获取药品信息", extra={'drug_id': drug_id, 'info_type': info_type})
         return result
         
     except Exception as e:
-        print(f"❌ 获取药品信息失败: {e}")
+        logger.error("获取药品信息失败", extra={'error': e})
         return None
 
 def check_drug_exists(cursor, drug_id):
@@ -202,15 +223,9 @@ def check_drug_exists(cursor, drug_id):
         bool: 存在返回True，不存在返回False
     """
     try:
-        # 查询药品是否存在
-        cursor.execute("SELECT drug_id FROM drug WHERE drug_id = %s", (drug_id,))
-        result = cursor.fetchone()
-        
-        if result:
-            return True
-        else:
-            return False
+        # 查询药品是否存在（同一请求内已读取过该行时不再查询）
+        return fetch_row(cursor, 'drug', 'drug_id', drug_id) is not None
             
     except Exception as e:
-        print(f"❌ 检查药品ID失败: {e}")
+        logger.error("检查药品ID失败", extra={'error': e})
         return False
@@ -1,4 +1,14 @@
 import pymysql
+from log import get_logger
+from db.pagination import keyset_clause
+from db.identity import fetch_row
+from db.transaction import transaction
+from search import names
+from schedule import worklist
+import entity.summary as summary_module
+from search.phone import normalize_phone, reverse_phone, phone_filter
+
+logger = get_logger(__name__)
 
 def register_patient(cursor, name, gender, phone_number):
     """
@@ -8,44 +18,47 @@ def register_patient(cursor, name, gender, phone_number):
         cursor: 数据库游标
         name: 病人姓名
         gender: 性别 ('男' 或 '女')
-        phone_number: 电话号码
+        phone_number: 电话号码（规范化为纯数字后保存）
     
     Returns:
         int: 新注册病人的病历号，失败返回None
     """
     try:
-        # 插入新病人信息
-        sql = """
-        INSERT INTO patient (name, gender, phone_number, created_at) 
-        VALUES (%s, %s, %s, NOW())
-        """
-        cursor.execute(sql, (name, gender, phone_number))
-        
-        # 获取刚插入的病历号
-        cursor.execute("SELECT LAST_INSERT_ID()")
-        result = cursor.fetchone()
-        
-        if isinstance(result, tuple):
-            patient_id = result[0]
-        else:
-            patient_id = result['LAST_INSERT_ID()']
+        phone_number = normalize_phone(phone_number)
+        with transaction(cursor):
+            # 插入新病人信息（同时保存反转的号码用于尾号查询）
+            sql = """
+            INSERT INTO patient (name, gender, phone_number, phone_reversed, created_at) 
+            VALUES (%s, %s, %s, %s, NOW())
+            """
+            cursor.execute(sql, (name, gender, phone_number, reverse_phone(phone_number)))
+            
+            # 获取刚插入的病历号（随 INSERT 响应返回，无需额外查询）
+            patient_id = cursor.lastrowid
+            
+            # 写入姓名检索词，建立概览版本号
+            names.index_name(cursor, 'patient', patient_id, name)
+            summary_module.init_summary_version(cursor, patient_id)
         
-        print(f"✅ 病人注册成功！病历号: {patient_id}")
+        logger.info("病人注册成功", extra={'patient_id': patient_id})
         return patient_id
         
     except Exception as e:
-        print(f"❌ 病人注册失败: {e}")
+        logger.error("病人注册失败", extra={'error': e})
         return None
 
-def query_patient(cursor, patient_id=None, name=None, phone_number=None):
+def query_patient(cursor, patient_id=None, name=None, phone_number=None, after_id=None, before_id=None, limit=None):
     """
     查询病人信息
     
     Args:
         cursor: 数据库游标
         patient_id: 病历号（可选）
-        name: 姓名（可选，支持模糊查询）
-        phone_number: 电话号码（可选，支持模糊查询）
+        name: 姓名（可选，支持模糊查询，先通过姓名检索表缩小范围）
+        phone_number: 电话号码（可选，完整号码精确匹配，较短的数字按尾号匹配）
+        after_id: 分页游标，只返回病历号大于该值的记录（可选）
+        before_id: 分页游标，只返回病历号小于该值的记录（可选）
+        limit: 返回条数（可选，默认不分页，最多 MAX_PAGE_SIZE 条）
     
     Returns:
         list: 查询结果列表
@@ -60,43 +73,65 @@ def query_patient(cursor, patient_id=None, name=None, phone_number=None):
             params.append(patient_id)
         
         if name:
+            # 姓名检索表给出候选病历号，LIKE 只校验候选行，不再全表扫描
+            candidate_sql, candidate_params = names.name_filter('patient', 'patient_id', name)
+            if candidate_sql:
+                conditions.append(candidate_sql)
+                params.extend(candidate_params)
             conditions.append("name LIKE %s")
             params.append(f"%{name}%")
         
         if phone_number:
-            conditions.append("phone_number LIKE %s")
-            params.append(f"%{phone_number}%")
+            # 完整号码走 idx_patient_phone，尾号走 idx_patient_phone_reversed
+            phone_sql, phone_params = phone_filter('phone_number', 'phone_reversed', phone_number)
+            conditions.append(phone_sql)
+            params.extend(phone_params)
         
+        order_sql, reverse = keyset_clause("patient_id", conditions, params, after_id, before_id, limit)
+
         # 如果没有查询条件，返回所有病人
         if not conditions:
-            sql = "SELECT * FROM patient ORDER BY patient_id"
+            sql = f"SELECT * FROM patient {order_sql}"
         else:
-            sql = f"SELECT * FROM patient WHERE {' AND '.join(conditions)} ORDER BY patient_id"
+            sql = f"SELECT * FROM patient WHERE {' AND '.join(conditions)} {order_sql}"
         
         cursor.execute(sql, params)
         results = cursor.fetchall()
+        if reverse:
+            results = list(reversed(results))
+        logger.debug("查询病人", extra={'row_count': len(results)})
+        return results
         
-        # 输出查询结果
-        print(f"\n🔍 查询到 {len(results)} 条病人记录")
-        print("-" * 90)
-        print(f"{'病历号':<8} {'姓名':<10} {'性别':<6} {'电话号码':<15} {'创建时间':<20}")
-        print("-" * 90)
-        
-        if results:
-            for patient in results:
-                # 确保时间字段正确显示
-                created_time = str(patient['created_at']) if patient['created_at'] else 'NULL'
-                print(f"{patient['patient_id']:<8} {patient['name']:<10} {patient['gender']:<6} "
-                      f"{patient['phone_number']:<15} {created_time:<20}")
-        else:
-            print("  没有找到匹配的病人记录")
-        
-        print("-" * 90)
-        
+    except Exception as e:
+        logger.error("查询病人失败", extra={'error': e})
+        return []
+
+def search_patient(cursor, keyword, limit=20):
+    """
+    按姓名、拼音或拼音首字母检索病人，结果按匹配程度排序
+    
+    Args:
+        cursor: 数据库游标
+        keyword: 查询词，如 "张三"、"zhangsan"、"zs"
+        limit: 最多返回条数
+    
+    Returns:
+        list: 查询结果列表
+    """
+    try:
+        patient_ids = names.search_names(cursor, 'patient', keyword, limit)
+        if not patient_ids:
+            return []
+        
+        placeholders = ', '.join(['%s'] * len(patient_ids))
+        cursor.execute(f"SELECT * FROM patient WHERE patient_id IN ({placeholders})", patient_ids)
+        rows = {row['patient_id']: row for row in cursor.fetchall()}
+        results = [rows[patient_id] for patient_id in patient_ids if patient_id in rows]
+        logger.debug("检索病人", extra={'row_count': len(results)})
         return results
         
     except Exception as e:
-        print(f"❌ 查询病人失败: {e}")
+        logger.error("检索病人失败", extra={'error': e})
         return []
 
 def update_patient(cursor, patient_id, name=None, phone_number=None):
@@ -107,7 +142,7 @@ def update_patient(cursor, patient_id, name=None, phone_number=None):
         cursor: 数据库游标
         patient_id: 病历号
         name: 新姓名（可选）
-        phone_number: 新电话号码（可选）
+        phone_number: 新电话号码（可选，规范化为纯数字后保存）
     
     Returns:
         bool: 修改是否成功
@@ -116,7 +151,7 @@ def update_patient(cursor, patient_id, name=None, phone_number=None):
         # 检查病人是否存在
         cursor.execute("SELECT * FROM patient WHERE patient_id = %s", (patient_id,))
         if not cursor.fetchone():
-            print(f"❌ 病历号 {patient_id} 不存在")
+            logger.warning("病历号不存在", extra={'patient_id': patient_id})
             return False
         
         # 构建更新语句
@@ -128,11 +163,13 @@ def update_patient(cursor, patient_id, name=None, phone_number=None):
             params.append(name)
         
         if phone_number:
+            phone_number = normalize_phone(phone_number)
             updates.append("phone_number = %s")
-            params.append(phone_number)
+            updates.append("phone_reversed = %s")
+            params.extend([phone_number, reverse_phone(phone_number)])
         
         if not updates:
-            print("❌ 没有提供要更新的信息")
+            logger.warning("没有提供要更新的信息", extra={'patient_id': patient_id})
             return False
         
         # 添加更新时间和病历号
@@ -140,13 +177,19 @@ def update_patient(cursor, patient_id, name=None, phone_number=None):
         params.append(patient_id)
         
         sql = f"UPDATE patient SET {', '.join(updates)} WHERE patient_id = %s"
-        cursor.execute(sql, params)
-        
-        print(f"✅ 病人 {patient_id} 信息更新成功")
+        with transaction(cursor):
+            cursor.execute(sql, params)
+            # 姓名修改后同步检索词与挂号工作列表中的病人姓名
+            if name:
+                names.index_name(cursor, 'patient', patient_id, name)
+                worklist.rename_patient(cursor, patient_id, name)
+            summary_module.touch_patients(cursor, [patient_id])
+        
+        logger.info("病人信息更新成功", extra={'patient_id': patient_id})
         return True
         
     except Exception as e:
-        print(f"❌ 更新病人信息失败: {e}")
+        logger.error("更新病人信息失败", extra={'error': e})
         return False
 
 def delete_patient(cursor, patient_id):
@@ -164,17 +207,19 @@ def delete_patient(cursor, patient_id):
         # 检查病人是否存在
         cursor.execute("SELECT * FROM patient WHERE patient_id = %s", (patient_id,))
         if not cursor.fetchone():
-            print(f"❌ 病历号 {patient_id} 不存在")
+            logger.warning("病历号不存在", extra={'patient_id': patient_id})
             return False
         
-        # 删除病人（由于外键约束，相关的挂号、缴费等记录会自动删除）
-        cursor.execute("DELETE FROM patient WHERE patient_id = %s", (patient_id,))
+        # 删除病人（由于外键约束，相关的挂号、缴费等记录会自动删除）及其姓名检索词
+        with transaction(cursor):
+            cursor.execute("DELETE FROM patient WHERE patient_id = %s", (patient_id,))
+            names.remove_name(cursor, 'patient', patient_id)
         
-        print(f"✅ 病人 {patient_id} 删除成功")
+        logger.info("病人删除成功", extra={'patient_id': patient_id})
         return True
         
     except Exception as e:
-        print(f"❌ 删除病人失败: {e}")
+        logger.error("删除病人失败", extra={'error': e})
         return False
 
 def check_patient_exists(cursor, patient_id):
@@ -189,15 +234,9 @@ def check_patient_exists(cursor, patient_id):
         bool: 存在返回True，不存在返回False
     """
     try:
-        # 查询病人是否存在
-        cursor.execute("SELECT patient_id FROM patient WHERE patient_id = %s", (patient_id,))
-        result = cursor.fetchone()
-        
-        if result:
-            return True
-        else:
-            return False
+        # 查询病人是否存在（同一请求内已读取过该行时不再查询）
+        return fetch_row(cursor, 'patient', 'patient_id', patient_id) is not None
             
     except Exception as e:
-        print(f"❌ 检查病人ID失败: {e}")
+        logger.error("检查病人ID失败", extra={'error': e})
         return False
@@ -1,5 +1,26 @@
 import pymysql
-import datetime
+from decimal import Decimal
+from log import get_logger
+from db.pagination import keyset_clause
+from db.identity import fetch_row
+from db.transaction import transaction, Rollback
+from events import publish_registration
+from schedule import worklist
+import entity.summary as summary_module
+
+logger = get_logger(__name__)
+
+# 缴费后，关联这些缴费单且不再有未缴费用（挂号费与全部处方费用）的挂号改为 paid：
+# 已开处方的挂号由 prescribed 改为 paid，未开处方的挂号缴清挂号费后由 assigned 改为 paid
+_SETTLED = """
+SELECT * FROM registration 
+WHERE status IN ('assigned', 'prescribed')
+  AND (payment_id IN ({placeholders})
+       OR registration_id IN (SELECT registration_id FROM prescription WHERE payment_id IN ({placeholders})))
+  AND NOT EXISTS (SELECT 1 FROM payment y WHERE y.payment_id = registration.payment_id AND y.time IS NULL)
+  AND NOT EXISTS (SELECT 1 FROM prescription p JOIN payment y ON y.payment_id = p.payment_id 
+                  WHERE p.registration_id = registration.registration_id AND y.time IS NULL)
+"""
 
 def create_payment(cursor, patient_id, price, time=None):
     """
@@ -15,30 +36,26 @@ def create_payment(cursor, patient_id, price, time=None):
         int: 新创建的缴费号，失败返回None
     """
     try:
-        # 插入新缴费记录
-        sql = """
-        INSERT INTO payment (patient_id, price, time, created_at) 
-        VALUES (%s, %s, %s, NOW())
-        """
-        cursor.execute(sql, (patient_id, price, time))
-        
-        # 获取刚插入的缴费号
-        cursor.execute("SELECT LAST_INSERT_ID()")
-        result = cursor.fetchone()
-        
-        if isinstance(result, tuple):
-            payment_id = result[0]
-        else:
-            payment_id = result['LAST_INSERT_ID()']
+        with transaction(cursor):
+            # 插入新缴费记录
+            sql = """
+            INSERT INTO payment (patient_id, price, time, created_at) 
+            VALUES (%s, %s, %s, NOW())
+            """
+            cursor.execute(sql, (patient_id, price, time))
+            
+            # 获取刚插入的缴费号（随 INSERT 响应返回，无需额外查询）
+            payment_id = cursor.lastrowid
+            summary_module.touch_patients(cursor, [patient_id])
         
-        print(f"✅ 缴费记录创建成功！缴费号: {payment_id}")
+        logger.info("缴费记录创建成功", extra={'payment_id': payment_id})
         return payment_id
         
     except Exception as e:
-        print(f"❌ 创建缴费记录失败: {e}")
+        logger.error("创建缴费记录失败", extra={'error': e})
         return None
 
-def query_payment(cursor, payment_id=None, patient_id=None, time_is_null=False):
+def query_payment(cursor, payment_id=None, patient_id=None, time_is_null=False, after_id=None, before_id=None, limit=None):
     """
     查询缴费信息
     
@@ -47,6 +64,9 @@ def query_payment(cursor, payment_id=None, patient_id=None, time_is_null=False):
         payment_id: 缴费号（可选）
         patient_id: 病历号（可选）
         time_is_null: 是否只查询缴费时间为NULL的记录（可选，默认为False）
+        after_id: 分页游标，只返回缴费号大于该值的记录（可选）
+        before_id: 分页游标，只返回缴费号小于该值的记录（可选）
+        limit: 返回条数（可选，默认不分页，最多 MAX_PAGE_SIZE 条）
     
     Returns:
         list: 查询结果列表
@@ -67,43 +87,52 @@ def query_payment(cursor, payment_id=None, patient_id=None, time_is_null=False):
         if time_is_null:
             conditions.append("time IS NULL")
         
+        order_sql, reverse = keyset_clause("payment_id", conditions, params, after_id, before_id, limit)
+
         # 构建SQL查询
         if not conditions:
-            sql = "SELECT * FROM payment ORDER BY payment_id"
+            sql = f"SELECT * FROM payment {order_sql}"
         else:
-            sql = f"SELECT * FROM payment WHERE {' AND '.join(conditions)} ORDER BY payment_id"
+            sql = f"SELECT * FROM payment WHERE {' AND '.join(conditions)} {order_sql}"
         
         cursor.execute(sql, params)
         results = cursor.fetchall()
-        
-        # 输出查询结果
-        print(f"\n🔍 查询到 {len(results)} 条缴费记录")
-        print("-" * 120)
-        print(f"{'缴费号':<10} {'病历号':<10} {'缴费价格':<12} {'缴费时间':<20} {'创建时间':<20}")
-        print("-" * 120)
-        
-        if results:
-            for payment in results:
-                payment_time = str(payment['time']) if payment['time'] else 'NULL'
-                created_time = str(payment['created_at']) if payment['created_at'] else 'NULL'
-                
-                print(f"{payment['payment_id']:<10} {payment['patient_id']:<10} {payment['price']:<12} "
-                      f"{payment_time:<20} {created_time:<20}")
-        else:
-            print("  没有找到匹配的缴费记录")
-        
-        print("-" * 120)
-        
+        if reverse:
+            results = list(reversed(results))
+        logger.debug("查询缴费记录", extra={'row_count': len(results)})
         return results
         
     except Exception as e:
-        print(f"❌ 查询缴费记录失败: {e}")
+        logger.error("查询缴费记录失败", extra={'error': e})
         return []
 
+def _mark_settled(cursor, payment_ids):
+    """
+    与这些刚缴清的缴费单关联、且已没有待缴费用的挂号由 assigned 或 prescribed 改为 paid（在调用方的事务中执行）
+    
+    Returns:
+        list: 改为 paid 的挂号（修改前的记录）
+    """
+    placeholders = ', '.join(['%s'] * len(payment_ids))
+    cursor.execute(_SETTLED.format(placeholders=placeholders), list(payment_ids) * 2)
+    settled = cursor.fetchall()
+    if settled:
+        registration_ids = [registration['registration_id'] for registration in settled]
+        sql = f"""
+        UPDATE registration 
+        SET status = 'paid', updated_at = NOW() 
+        WHERE registration_id IN ({', '.join(['%s'] * len(settled))}) AND status IN ('assigned', 'prescribed')
+        """
+        cursor.execute(sql, registration_ids)
+        worklist.project_registrations(cursor, registration_ids)
+    return settled
+
 def complete_payment(cursor, payment_id):
     """
     完成缴费操作，将缴费时间设置为当前时间
     
+    与该缴费单关联（挂号费或处方费用）的挂号若已没有待缴费用，在同一事务中改为 paid。
+    
     Args:
         cursor: 数据库游标
         payment_id: 缴费号
@@ -112,50 +141,121 @@ def complete_payment(cursor, payment_id):
         bool: 缴费操作是否成功
     """
     try:
-        # 1. 检查缴费记录是否存在
-        if not check_payment_exists(cursor, payment_id):
-            print(f"❌ 缴费失败：缴费号 {payment_id} 不存在")
-            return False
-        
-        # 2. 查询当前缴费记录信息
-        cursor.execute("SELECT patient_id, price, time FROM payment WHERE payment_id = %s", (payment_id,))
-        payment = cursor.fetchone()
+        # 1. 查询缴费记录（存在性检查与读取合并为一次按主键读取）
+        payment = fetch_row(cursor, 'payment', 'payment_id', payment_id)
         
         if not payment:
-            print(f"❌ 缴费失败：缴费号 {payment_id} 的记录不存在")
+            logger.warning("缴费失败：缴费号不存在", extra={'payment_id': payment_id})
             return False
         
-        # 3. 检查是否已经缴费过
+        # 2. 检查是否已经缴费过
         if payment['time']:
-            print(f"⚠️ 缴费号 {payment_id} 已经缴费过，缴费时间: {payment['time']}")
+            logger.warning("缴费号已经缴费过", extra={'payment_id': payment_id, 'paid_at': payment['time']})
             return True
         
-        # 4. 更新缴费时间
-        sql = """
-        UPDATE payment 
-        SET time = NOW(), updated_at = NOW() 
-        WHERE payment_id = %s
-        """
-        cursor.execute(sql, (payment_id,))
+        with transaction(cursor):
+            # 3. 更新缴费时间
+            sql = """
+            UPDATE payment 
+            SET time = NOW(), updated_at = NOW() 
+            WHERE payment_id = %s
+            """
+            cursor.execute(sql, (payment_id,))
+            summary_module.touch_patients(cursor, [payment['patient_id']])
+            
+            # 4. 费用已全部缴清的关联挂号进入 paid 状态
+            settled = _mark_settled(cursor, [payment_id])
         
-        # 5. 查询并打印详细信息
-        # 获取病人姓名
-        cursor.execute("SELECT name FROM patient WHERE patient_id = %s", (payment['patient_id'],))
-        patient = cursor.fetchone()
+        for registration in settled:
+            publish_registration('paid', dict(registration, status='paid'))
+        
+        # 5. 查询病人姓名并记录缴费信息
+        patient = fetch_row(cursor, 'patient', 'patient_id', payment['patient_id'])
         patient_name = patient['name'] if patient else "未知病人"
         
-        print(f"✅ 缴费成功！")
-        print(f"   缴费号: {payment_id}")
-        print(f"   病人: {patient_name} (病历号: {payment['patient_id']})")
-        print(f"   缴费金额: {payment['price']} 元")
-        print(f"   缴费时间: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        logger.info("缴费成功", extra={'payment_id': payment_id, 'patient_id': payment['patient_id'],
+                                   'patient_name': patient_name, 'price': payment['price']})
         
         return True
         
     except Exception as e:
-        print(f"❌ 缴费失败: {e}")
+        logger.error("缴费失败", extra={'error': e})
         return False
 
+def settle_payments(cursor, patient_id, payment_ids=None, attempts=3):
+    """
+    批量缴费：在一个事务中缴清病人全部（或选中的）待缴费用
+    
+    读取待缴费用后用一条 UPDATE ... WHERE time IS NULL 条件更新全部缴费时间，语句数与缴费单数无关。
+    若更新行数不足（期间有缴费单被其他请求缴清），整批回滚后重新读取，最多尝试 attempts 次。
+    费用已全部缴清的关联挂号在同一事务中改为 paid。
+    
+    Args:
+        cursor: 数据库游标
+        patient_id: 病历号（只缴该病人的缴费单）
+        payment_ids: 要缴的缴费号列表（可选，默认缴清全部待缴费用；不属于该病人或已缴的缴费号被忽略）
+        attempts: 最多尝试次数
+    
+    Returns:
+        dict: payment_ids（本次缴清的缴费号）、total（合计金额）、registration_ids（因此缴清费用的挂号）；
+              没有待缴费用时 payment_ids 为空列表；失败返回None
+    """
+    conditions = ["patient_id = %s", "time IS NULL"]
+    params = [patient_id]
+    if payment_ids is not None:
+        payment_ids = sorted(set(payment_ids))
+        if not payment_ids:
+            return {'payment_ids': [], 'total': Decimal('0'), 'registration_ids': []}
+        conditions.append(f"payment_id IN ({', '.join(['%s'] * len(payment_ids))})")
+        params.extend(payment_ids)
+    
+    try:
+        for _ in range(attempts):
+            result = None
+            settled = []
+            with transaction(cursor):
+                # 1. 读取待缴费用（(patient_id, time) 索引）
+                cursor.execute(f"SELECT payment_id, price FROM payment WHERE {' AND '.join(conditions)} "
+                               f"ORDER BY payment_id", params)
+                outstanding = cursor.fetchall()
+                ids = [payment['payment_id'] for payment in outstanding]
+                
+                if ids:
+                    # 2. 一条条件更新缴清全部费用（仅限仍未缴费的缴费单）
+                    sql = f"""
+                    UPDATE payment 
+                    SET time = NOW(), updated_at = NOW() 
+                    WHERE payment_id IN ({', '.join(['%s'] * len(ids))}) AND time IS NULL
+                    """
+                    cursor.execute(sql, ids)
+                    if cursor.rowcount != len(ids):
+                        logger.warning("批量缴费冲突：部分缴费单已被其他操作缴清，重试",
+                                       extra={'patient_id': patient_id, 'payment_ids': ids})
+                        raise Rollback
+                    summary_module.touch_patients(cursor, [patient_id])
+                    
+                    # 3. 费用已全部缴清的关联挂号进入 paid 状态
+                    settled = _mark_settled(cursor, ids)
+                
+                result = {
+                    'payment_ids': ids,
+                    'total': sum((Decimal(str(payment['price'])) for payment in outstanding), Decimal('0')),
+                    'registration_ids': [registration['registration_id'] for registration in settled],
+                }
+            
+            if result is not None:
+                for registration in settled:
+                    publish_registration('paid', dict(registration, status='paid'))
+                logger.info("批量缴费成功", extra={'patient_id': patient_id, **result})
+                return result
+        
+        logger.warning("批量缴费失败：多次重试仍有冲突", extra={'patient_id': patient_id})
+        return None
+        
+    except Exception as e:
+        logger.error("批量缴费失败", extra={'error': e})
+        return None
+
 def check_payment_exists(cursor, payment_id):
     """
     判断缴费ID是否存在
@@ -168,17 +268,11 @@ def check_payment_exists(cursor, payment_id):
         bool: 存在返回True，不存在返回False
     """
     try:
-        # 查询缴费记录是否存在
-        cursor.execute("SELECT payment_id FROM payment WHERE payment_id = %s", (payment_id,))
-        result = cursor.fetchone()
-        
-        if result:
-            return True
-        else:
-            return False
+        # 查询缴费记录是否存在（同一请求内已读取过该行时不再查询）
+        return fetch_row(cursor, 'payment', 'payment_id', payment_id) is not None
             
     except Exception as e:
-        print(f"❌ 检查缴费ID失败: {e}")
+        logger.error("检查缴费ID失败", extra={'error': e})
         return False
 
 
@@ -1,83 +1,132 @@
 import pymysql
-import entity.registration as registration_module
-import entity.drug as drug_module
-import entity.payment as payment_module
+from db.transaction import transaction, Rollback
+from db.pagination import keyset_clause
+from db.cache import invalidates
+from db.identity import fetch_row
+from search.drugs import drug_index
+from events import publish_registration
+from schedule import worklist
+import entity.summary as summary_module
+from log import get_logger
 
-def create_prescription(cursor, registration_id, drug_id, quantity, payment_id):
+logger = get_logger(__name__)
+
+# 可以开具处方的挂号状态（已分配医生且尚未结束就诊），以及开具后把挂号改为待缴费
+_PRESCRIBABLE = "r.status IN ('assigned', 'prescribed', 'paid')"
+_MARK_PRESCRIBED = """
+UPDATE registration 
+SET status = 'prescribed', updated_at = NOW() 
+WHERE registration_id = %s AND status IN ('assigned', 'paid')
+"""
+
+@invalidates('drug')
+def prescribe_drugs(cursor, registration_id, items):
     """
-    开具新处方
+    医生一次开具多种药品：在一个事务中扣减所有药品库存、生成一张合并缴费单并批量开具处方
+    
+    所有语句都与药品种数无关：一条 UPDATE 按 CASE 条件扣减全部库存，一次查询取回全部单价，
+    一条 INSERT 生成缴费单，一条多行 INSERT 写入全部处方。任一药品不存在或库存不足则整体回滚，
+    不会留下孤立的缴费单；条件扣减（stored_quantity >= n）使并发开药不会丢失更新或把库存扣成负数。
+    只开一种药品时 items 传一项即可。挂号须已分配医生且未结束就诊，开具后挂号进入 prescribed 状态。
     
     Args:
         cursor: 数据库游标
         registration_id: 挂号编号
-        drug_id: 药品编号
-        quantity: 药品数量
-        payment_id: 缴费号
+        items: 处方明细列表，每项为 (药品编号, 数量)，同一药品出现多次时数量合并
     
     Returns:
-        int: 新创建的处方号，失败返回None
+        dict: 包含 payment_id、price（应缴总金额）与 lines（每种药品的 drug_id、quantity、price、stored_quantity），
+              失败返回None
     """
+    # 合并同一药品的数量，保持首次出现的顺序
+    quantities = {}
+    for drug_id, quantity in items:
+        quantities[drug_id] = quantities.get(drug_id, 0) + quantity
+    
+    if not quantities or any(quantity <= 0 for quantity in quantities.values()):
+        logger.warning("开具处方失败：处方明细为空或药品数量无效", extra={'registration_id': registration_id})
+        return None
+    
+    drug_ids = list(quantities)
+    placeholders = ', '.join(['%s'] * len(drug_ids))
+    case_sql = 'CASE drug_id ' + ' '.join(['WHEN %s THEN %s'] * len(drug_ids)) + ' END'
+    case_params = [value for drug_id in drug_ids for value in (drug_id, quantities[drug_id])]
+    
+    result = None
     try:
-        # 1. 检查挂号是否存在
-        if not registration_module.check_registration_exists(cursor, registration_id):
-            print(f"❌ 开具处方失败：挂号编号 {registration_id} 不存在")
-            return None
-
-        # 2. 检查药品是否存在
-        if not drug_module.check_drug_exists(cursor, drug_id):
-            print(f"❌ 开具处方失败：药品编号 {drug_id} 不存在")
-            return None
-
-        # 3. 检查缴费记录是否存在
-        if not payment_module.check_payment_exists(cursor, payment_id):
-            print(f"❌ 开具处方失败：缴费号 {payment_id} 不存在")
-            return None
-        
-        # 4. 检查药品库存是否足够
-        cursor.execute("SELECT stored_quantity FROM drug WHERE drug_id = %s", (drug_id,))
-        drug = cursor.fetchone()
-        if not drug or drug['stored_quantity'] < quantity:
-            print(f"❌ 开具处方失败：药品库存不足。当前库存: {drug['stored_quantity'] if drug else 0}, 需求: {quantity}")
-            return None
-
-        # 5. 插入新处方记录
-        sql = """
-        INSERT INTO prescription (registration_id, drug_id, quantity, payment_id, created_at) 
-        VALUES (%s, %s, %s, %s, NOW())
-        """
-        cursor.execute(sql, (registration_id, drug_id, quantity, payment_id))
-        
-        # 6. 获取刚插入的处方号
-        cursor.execute("SELECT LAST_INSERT_ID()")
-        result = cursor.fetchone()
-        
-        if isinstance(result, tuple):
-            prescription_id = result[0]
-        else:
-            prescription_id = result['LAST_INSERT_ID()']
-        
-        # 7. 查询并打印详细信息
-        # 获取病人姓名
-        cursor.execute("SELECT p.name FROM registration r JOIN patient p ON r.patient_id = p.patient_id WHERE r.registration_id = %s", (registration_id,))
-        patient = cursor.fetchone()
-        patient_name = patient['name'] if patient else "未知病人"
-
-        # 获取药品名称
-        cursor.execute("SELECT drug_name FROM drug WHERE drug_id = %s", (drug_id,))
-        drug_info = cursor.fetchone()
-        drug_name = drug_info['drug_name'] if drug_info else "未知药品"
-        
-        print(f"✅ 处方开具成功！")
-        print(f"   处方号: {prescription_id}")
-        print(f"   病人: {patient_name} (挂号号: {registration_id})")
-        print(f"   药品: {drug_name} (药品ID: {drug_id})")
-        print(f"   数量: {quantity}")
-        print(f"   关联缴费号: {payment_id}")
+        with transaction(cursor):
+            # 1. 一条语句条件扣减所有药品库存
+            sql = f"""
+            UPDATE drug 
+            SET stored_quantity = stored_quantity - {case_sql}, updated_at = NOW() 
+            WHERE drug_id IN ({placeholders}) AND stored_quantity >= {case_sql}
+            """
+            cursor.execute(sql, case_params + drug_ids + case_params)
+            if cursor.rowcount != len(drug_ids):
+                logger.warning("开具处方失败：存在不存在或库存不足的药品",
+                               extra={'registration_id': registration_id, 'drug_ids': drug_ids})
+                raise Rollback
+            
+            # 2. 一次查询取回所有药品单价、剩余库存与挂号记录（病历号、状态等）
+            sql = f"""
+            SELECT d.drug_id, d.drug_price, d.stored_quantity, r.* 
+            FROM drug d JOIN registration r ON r.registration_id = %s AND {_PRESCRIBABLE} 
+            WHERE d.drug_id IN ({placeholders})
+            """
+            cursor.execute(sql, [registration_id] + drug_ids)
+            rows = {row['drug_id']: row for row in cursor.fetchall()}
+            if not rows:
+                logger.warning("开具处方失败：挂号编号不存在、尚未分配医生或已结束就诊",
+                               extra={'registration_id': registration_id})
+                raise Rollback
+            
+            lines = [{
+                'drug_id': drug_id,
+                'quantity': quantities[drug_id],
+                'price': rows[drug_id]['drug_price'] * quantities[drug_id],
+                'stored_quantity': rows[drug_id]['stored_quantity'],
+            } for drug_id in drug_ids]
+            total = sum(line['price'] for line in lines)
+            registration = next(iter(rows.values()))
+            patient_id = registration['patient_id']
+            
+            # 3. 生成一张合并缴费单
+            sql = """
+            INSERT INTO payment (patient_id, price, time, created_at) 
+            VALUES (%s, %s, NULL, NOW())
+            """
+            cursor.execute(sql, (patient_id, total))
+            payment_id = cursor.lastrowid
+            
+            # 4. 多行 INSERT 写入全部处方（保存计费时的单价，之后药品调价不影响已开处方的金额）
+            values = ', '.join(['(%s, %s, %s, %s, %s, NOW())'] * len(lines))
+            sql = f"""
+            INSERT INTO prescription (registration_id, drug_id, quantity, unit_price, payment_id, created_at) 
+            VALUES {values}
+            """
+            cursor.execute(sql, [value for line in lines
+                                 for value in (registration_id, line['drug_id'], line['quantity'],
+                                               rows[line['drug_id']]['drug_price'], payment_id)])
+            
+            # 5. 挂号进入待缴费状态
+            if registration['status'] != 'prescribed':
+                cursor.execute(_MARK_PRESCRIBED, (registration_id,))
+                worklist.project_registrations(cursor, [registration_id])
+            summary_module.touch_patients(cursor, [patient_id])
+            
+            result = {'payment_id': payment_id, 'price': total, 'lines': lines}
         
-        return prescription_id
+        if result:
+            for line in result['lines']:
+                drug_index.update(line['drug_id'], stored_quantity=line['stored_quantity'])
+            if registration['status'] != 'prescribed':
+                publish_registration('prescribed', dict(registration, status='prescribed'))
+            logger.info("处方开具成功", extra={'registration_id': registration_id, 'payment_id': result['payment_id'],
+                                         'price': result['price'], 'line_count': len(result['lines'])})
+        return result
         
     except Exception as e:
-        print(f"❌ 开具处方失败: {e}")
+        logger.error("开具处方失败", extra={'error': e})
         return None
 
 def check_prescription_exists(cursor, prescription_id):
@@ -92,20 +141,14 @@ def check_prescription_exists(cursor, prescription_id):
         bool: 存在返回True，不存在返回False
     """
     try:
-        # 查询处方是否存在
-        cursor.execute("SELECT prescription_id FROM prescription WHERE prescription_id = %s", (prescription_id,))
-        result = cursor.fetchone()
-        
-        if result:
-            return True
-        else:
-            return False
+        # 查询处方是否存在（同一请求内已读取过该行时不再查询）
+        return fetch_row(cursor, 'prescription', 'prescription_id', prescription_id) is not None
             
     except Exception as e:
-        print(f"❌ 检查处方ID失败: {e}")
+        logger.error("检查处方ID失败", extra={'error': e})
         return False
     
-def query_prescription(cursor, prescription_id=None, registration_id=None, drug_id=None, payment_id=None):
+def query_prescription(cursor, prescription_id=None, registration_id=None, drug_id=None, payment_id=None, after_id=None, before_id=None, limit=None):
     """
     查询处方信息（仅查询prescription表）
     
@@ -115,6 +158,9 @@ def query_prescription(cursor, prescription_id=None, registration_id=None, drug_
         registration_id: 挂号编号（可选）
         drug_id: 药品编号（可选）
         payment_id: 缴费号（可选）
+        after_id: 分页游标，只返回处方号大于该值的记录（可选）
+        before_id: 分页游标，只返回处方号小于该值的记录（可选）
+        limit: 返回条数（可选，默认不分页，最多 MAX_PAGE_SIZE 条）
     
     Returns:
         list: 查询结果列表
@@ -140,34 +186,21 @@ def query_prescription(cursor, prescription_id=None, registration_id=None, drug_
             conditions.append("payment_id = %s")
             params.append(payment_id)
         
+        order_sql, reverse = keyset_clause("prescription_id", conditions, params, after_id, before_id, limit)
+
         # 构建SQL查询，只查询单表
         if not conditions:
-            sql = "SELECT * FROM prescription ORDER BY prescription_id"
+            sql = f"SELECT * FROM prescription {order_sql}"
         else:
-            sql = f"SELECT * FROM prescription WHERE {' AND '.join(conditions)} ORDER BY prescription_id"
+            sql = f"SELECT * FROM prescription WHERE {' AND '.join(conditions)} {order_sql}"
         
         cursor.execute(sql, params)
         results = cursor.fetchall()
-        
-        # 输出查询结果
-        print(f"\n🔍 查询到 {len(results)} 条处方记录")
-        print("-" * 100)
-        print(f"{'处方号':<10} {'挂号号':<10} {'药品ID':<8} {'数量':<8} {'缴费号':<10} {'创建时间':<20}")
-        print("-" * 100)
-        
-        if results:
-            for pre in results:
-                created_time = str(pre['created_at']) if pre['created_at'] else 'NULL'
-                
-                print(f"{pre['prescription_id']:<10} {pre['registration_id']:<10} {pre['drug_id']:<8} "
-                      f"{pre['quantity']:<8} {pre['payment_id']:<10} {created_time:<20}")
-        else:
-            print("  没有找到匹配的处方记录")
-        
-        print("-" * 100)
-        
+        if reverse:
+            results = list(reversed(results))
+        logger.debug("查询处方", extra={'row_count': len(results)})
         return results
         
     except Exception as e:
-        print(f"❌ 查询处方失败: {e}")
+        logger.error("查询处方失败", extra={'error': e})
         return []
@@ -1,12 +1,34 @@
 import pymysql
-import entity.patient as patient_module
-import entity.department as department_module
 import entity.payment as payment_module
-import entity.doctor as doctor_module
+import entity.summary as summary_module
+from db.backend import is_integrity_error
+from db.transaction import transaction, Rollback
+from db.pagination import keyset_clause
+from db.identity import fetch_row
+from events import event_bus, doctor_topic, publish_registration
+from schedule import worklist
+from log import get_logger
+
+logger = get_logger(__name__)
+
+# 挂号状态：created（待分配医生）→ assigned（已分配医生）→ prescribed（已开处方，有待缴费用）
+# → paid（费用已全部缴清）→ closed（就诊结束），均由本模块与处方、缴费模块在写入时维护
+REGISTRATION_STATUSES = ('created', 'assigned', 'prescribed', 'paid', 'closed')
+STATUS_LABELS = {
+    'created': '待分配医生',
+    'assigned': '待诊',
+    'prescribed': '待缴费',
+    'paid': '已缴费',
+    'closed': '已完成',
+}
+# 医生待办：已分配但尚未结束就诊的挂号
+DOCTOR_OPEN_STATUSES = ('assigned', 'prescribed', 'paid')
 
 def create_registration(cursor, patient_id, department_id):
     """
-    创建挂号记录（医生和缴费信息留空）
+    创建挂号记录（医生和缴费信息留空，状态为 created）
+    
+    病人与科室是否存在由外键约束保证，挂号与工作列表读模型在同一事务中写入。
     
     Args:
         cursor: 数据库游标
@@ -17,61 +39,38 @@ def create_registration(cursor, patient_id, department_id):
         int: 新创建的挂号编号，失败返回None
     """
     try:
-        # 1. 检查病人是否存在
-        if not patient_module.check_patient_exists(cursor, patient_id):
-            print(f"❌ 创建挂号失败：病历号 {patient_id} 不存在")
-            return None
-        else:
-            print(f"✅ 病历号 {patient_id} 存在")
-        
-        # 2. 检查科室是否存在
-        if not department_module.check_department_exists(cursor, department_id):
-            print(f"❌ 创建挂号失败：科室编号 {department_id} 不存在")
-            return None
-        else:
-            print(f"✅ 科室编号 {department_id} 存在")
-
-        # 3. 插入新挂号记录
-        sql = """
-        INSERT INTO registration (patient_id, department_id, created_at) 
-        VALUES (%s, %s, NOW())
-        """
-        cursor.execute(sql, (patient_id, department_id))
-        
-        # 4. 获取刚插入的挂号编号
-        cursor.execute("SELECT LAST_INSERT_ID()")
-        result = cursor.fetchone()
-        
-        if isinstance(result, tuple):
-            registration_id = result[0]
-        else:
-            registration_id = result['LAST_INSERT_ID()']
-        
-        # 5. 查询并打印详细信息
-        cursor.execute("SELECT name FROM patient WHERE patient_id = %s", (patient_id,))
-        patient = cursor.fetchone()
-        patient_name = patient['name'] if patient else "未知病人"
-
-        cursor.execute("SELECT department_name FROM department WHERE department_id = %s", (department_id,))
-        department = cursor.fetchone()
-        dept_name = department['department_name'] if department else "未知科室"
-        
-        print(f"✅ 挂号创建成功！")
-        print(f"   挂号编号: {registration_id}")
-        print(f"   病人: {patient_name} (病历号: {patient_id})")
-        print(f"   挂号科室: {dept_name} (科室ID: {department_id})")
-        print(f"   状态: 待分配医生")
+        with transaction(cursor):
+            # 1. 插入新挂号记录（病人或科室不存在时违反外键约束）
+            sql = """
+            INSERT INTO registration (patient_id, department_id, created_at) 
+            VALUES (%s, %s, NOW())
+            """
+            cursor.execute(sql, (patient_id, department_id))
+            
+            # 2. 获取刚插入的挂号编号（随 INSERT 响应返回，无需额外查询），写入读模型
+            registration_id = cursor.lastrowid
+            worklist.project_registrations(cursor, [registration_id])
+            summary_module.touch_patients(cursor, [patient_id])
         
+        logger.info("挂号创建成功，待分配医生", extra={'registration_id': registration_id, 'patient_id': patient_id,
+                                             'department_id': department_id})
         return registration_id
         
     except Exception as e:
-        print(f"❌ 创建挂号失败: {e}")
+        if is_integrity_error(e):
+            logger.warning("创建挂号失败：病历号或科室编号不存在",
+                           extra={'patient_id': patient_id, 'department_id': department_id})
+        else:
+            logger.error("创建挂号失败", extra={'error': e})
         return None
 
 def process_registration(cursor, registration_id, doctor_id):
     """
     处理挂号（为挂号分配医生）
     
+    医生存在且属于挂号科室、挂号处于 created 状态这些条件都写在同一条 UPDATE 中，
+    与工作列表读模型在同一事务中提交；只有更新不到记录时才再查询一次以区分失败原因。
+    
     Args:
         cursor: 数据库游标
         registration_id: 挂号编号
@@ -81,68 +80,172 @@ def process_registration(cursor, registration_id, doctor_id):
         bool: 处理是否成功
     """
     try:
-        # 1. 检查挂号是否存在
-        cursor.execute("SELECT patient_id, department_id, doctor_id FROM registration WHERE registration_id = %s", (registration_id,))
+        # 1. 条件更新：仅当挂号待分配医生且医生属于挂号科室时分配
+        sql = """
+        UPDATE registration 
+        SET doctor_id = %s, status = 'assigned', updated_at = NOW() 
+        WHERE registration_id = %s AND status = 'created'
+          AND department_id = (SELECT department_id FROM doctor WHERE doctor_id = %s)
+        """
+        with transaction(cursor):
+            cursor.execute(sql, (doctor_id, registration_id, doctor_id))
+            assigned = cursor.rowcount
+            if assigned:
+                worklist.project_registrations(cursor, [registration_id])
+                summary_module.touch_registration(cursor, registration_id)
+        
+        if assigned:
+            # 医生工作台在线时推送新分配的挂号（只有此时才读取挂号详情）
+            if event_bus.has_subscribers(doctor_topic(doctor_id)):
+                publish_registration('assigned', fetch_row(cursor, 'registration', 'registration_id', registration_id))
+            logger.info("挂号处理成功", extra={'registration_id': registration_id, 'doctor_id': doctor_id})
+            return True
+        
+        # 2. 未更新任何记录，查询挂号以确定原因
+        cursor.execute("SELECT department_id, doctor_id, status FROM registration WHERE registration_id = %s", (registration_id,))
         registration = cursor.fetchone()
         
         if not registration:
-            print(f"❌ 处理挂号失败：挂号编号 {registration_id} 不存在")
+            logger.warning("处理挂号失败：挂号编号不存在", extra={'registration_id': registration_id})
             return False
         
-        # 2. 检查是否已经分配过医生
-        if registration['doctor_id']:
-            print(f"⚠️ 挂号 {registration_id} 已经分配过医生（工号: {registration['doctor_id']}），无需重复分配")
+        if registration['status'] != 'created':
+            logger.warning("挂号已经分配过医生，无需重复分配", extra={'registration_id': registration_id, 'doctor_id': registration['doctor_id']})
             return True
         
-        # 3. 检查医生是否存在
-        cursor.execute("SELECT doctor_id FROM doctor WHERE doctor_id = %s", (doctor_id,))
-        if not doctor_module.check_doctor_exists(cursor, doctor_id):
-            print(f"❌ 处理挂号失败：医生工号 {doctor_id} 不存在")
-            return False
-
-        # 4. 检查医生是否属于该挂号科室
-        cursor.execute("SELECT department_id FROM doctor WHERE doctor_id = %s", (doctor_id,))
-        doctor = cursor.fetchone()
-        
-        if not doctor or doctor['department_id'] != registration['department_id']:
-            print(f"❌ 处理挂号失败：医生工号 {doctor_id} 不属于挂号科室 {registration['department_id']}")
-            return False
-        
-        # 5. 更新挂号记录，分配医生
-        sql = """
-        UPDATE registration 
-        SET doctor_id = %s, updated_at = NOW() 
-        WHERE registration_id = %s
-        """
-        cursor.execute(sql, (doctor_id, registration_id))
+        logger.warning("处理挂号失败：医生不存在或不属于挂号科室", extra={'doctor_id': doctor_id, 'department_id': registration['department_id']})
+        return False
         
-        # 6. 查询并打印详细信息
-        # 获取病人姓名
-        cursor.execute("SELECT name FROM patient WHERE patient_id = %s", (registration['patient_id'],))
-        patient = cursor.fetchone()
-        patient_name = patient['name'] if patient else "未知病人"
-
-        # 获取医生姓名
-        cursor.execute("SELECT name FROM doctor WHERE doctor_id = %s", (doctor_id,))
-        doctor_info = cursor.fetchone()
-        doctor_name = doctor_info['name'] if doctor_info else "未知医生"
+    except Exception as e:
+        logger.error("处理挂号失败", extra={'error': e})
+        return False
+    
+# 批量受理挂号时每一项的结果
+BATCH_STATUS_MESSAGES = {
+    'assigned': '受理成功',
+    'not_found': '挂号编号不存在',
+    'already_assigned': '挂号已经分配过医生',
+    'invalid_doctor': '医生不存在或不属于挂号科室',
+    'duplicate': '同一挂号在本批中重复出现',
+    'conflict': '受理期间挂号被其他操作分配或医生调整了科室，请重试',
+}
 
-        # 获取科室名称
-        cursor.execute("SELECT department_name FROM department WHERE department_id = %s", (registration['department_id'],))
-        dept = cursor.fetchone()
-        dept_name = dept['department_name'] if dept else "未知科室"
-        
-        print(f"✅ 挂号处理成功！")
-        print(f"   挂号编号: {registration_id}")
-        print(f"   病人: {patient_name} (病历号: {registration['patient_id']})")
-        print(f"   科室: {dept_name} (科室ID: {registration['department_id']})")
-        print(f"   已分配医生: {doctor_name} (工号: {doctor_id})")
-        
-        return True
+def process_registrations(cursor, assignments, price):
+    """
+    批量受理挂号：为多个挂号分配医生并生成挂号费缴费单
+    
+    在一个事务中用一次联表查询校验全部挂号与医生（医生须属于挂号科室），逐个生成缴费单，
+    再用一条 UPDATE 按 CASE 条件写入医生和缴费号。缴费单逐条 INSERT，每个缴费号取自各自的
+    INSERT 响应：多行 INSERT 只返回第一个编号，auto_increment_increment 大于 1 或自增锁模式为
+    interleaved 时其余编号无法可靠推算。
+    
+    UPDATE 的条件中再次检查挂号仍处于 created 状态、医生仍属于挂号科室；若更新行数不足
+    （校验之后有挂号被其他操作分配或医生调整了科室），只把未更新的挂号报告为冲突，
+    删除为它们生成的缴费单，其余挂号照常受理。
+    
+    Args:
+        cursor: 数据库游标
+        assignments: 受理明细列表，每项为 (挂号编号, 医生工号)
+        price: 每个挂号的挂号费
+    
+    Returns:
+        list: 每项受理结果，与 assignments 顺序一致，包含 registration_id、doctor_id、
+              status（见 BATCH_STATUS_MESSAGES）、message 与 payment_id（受理成功时）；出错返回None
+    """
+    results = []
+    pending = {}  # 挂号编号 -> 结果（同一挂号只受理第一次出现的一项）
+    for registration_id, doctor_id in assignments:
+        item = {'registration_id': registration_id, 'doctor_id': doctor_id, 'status': None, 'payment_id': None}
+        results.append(item)
+        if registration_id in pending:
+            item['status'] = 'duplicate'
+        else:
+            pending[registration_id] = item
+    
+    try:
+        valid = []
+        with transaction(cursor):
+            if pending:
+                # 1. 一次联表查询校验全部挂号与医生（在事务中读取，与下面的写入使用同一事务）
+                request_rows = ['SELECT %s AS registration_id, %s AS doctor_id'] + ['SELECT %s, %s'] * (len(pending) - 1)
+                sql = f"""
+                SELECT req.registration_id, r.patient_id, r.department_id, r.status, r.created_at, 
+                       d.doctor_id AS found_doctor_id, d.department_id AS doctor_department_id
+                FROM ({' UNION ALL '.join(request_rows)}) req
+                LEFT JOIN registration r ON r.registration_id = req.registration_id
+                LEFT JOIN doctor d ON d.doctor_id = req.doctor_id
+                """
+                cursor.execute(sql, [value for registration_id, item in pending.items()
+                                     for value in (registration_id, item['doctor_id'])])
+                for row in cursor.fetchall():
+                    item = pending[row['registration_id']]
+                    if row['patient_id'] is None:
+                        item['status'] = 'not_found'
+                    elif row['status'] != 'created':
+                        item['status'] = 'already_assigned'
+                    elif row['found_doctor_id'] is None or row['doctor_department_id'] != row['department_id']:
+                        item['status'] = 'invalid_doctor'
+                    else:
+                        valid.append((item, row))
+            
+            if valid:
+                # 2. 逐个生成挂号费缴费单，缴费号取自各自的 INSERT 响应
+                sql = "INSERT INTO payment (patient_id, price, time, created_at) VALUES (%s, %s, NULL, NOW())"
+                for item, row in valid:
+                    cursor.execute(sql, (row['patient_id'], price))
+                    item['payment_id'] = cursor.lastrowid
+                
+                # 3. 一条 UPDATE 写入全部挂号的医生与缴费号（仅限仍待分配医生、且医生仍属于挂号科室的挂号）
+                registration_ids = [item['registration_id'] for item, _ in valid]
+                placeholders = ', '.join(['%s'] * len(valid))
+                case_sql = ' '.join(['WHEN %s THEN %s'] * len(valid))
+                sql = f"""
+                UPDATE registration 
+                SET doctor_id = CASE registration_id {case_sql} END, 
+                    payment_id = CASE registration_id {case_sql} END, 
+                    status = 'assigned', updated_at = NOW() 
+                WHERE registration_id IN ({placeholders}) AND status = 'created'
+                  AND department_id = (SELECT department_id FROM doctor 
+                                       WHERE doctor_id = CASE registration.registration_id {case_sql} END)
+                """
+                doctor_params = [value for item, _ in valid for value in (item['registration_id'], item['doctor_id'])]
+                payment_params = [value for item, _ in valid for value in (item['registration_id'], item['payment_id'])]
+                cursor.execute(sql, doctor_params + payment_params + registration_ids + doctor_params)
+                
+                # 4. 更新行数不足时（期间挂号被其他操作分配或医生调整了科室）按缴费号读回实际受理的挂号，
+                #    其余挂号报告冲突并删除为它们生成的缴费单
+                if cursor.rowcount != len(valid):
+                    cursor.execute(f"SELECT registration_id FROM registration WHERE registration_id IN ({placeholders}) "
+                                   f"AND payment_id IN ({placeholders})",
+                                   registration_ids + [item['payment_id'] for item, _ in valid])
+                    updated = {row['registration_id'] for row in cursor.fetchall()}
+                    failed = [(item, row) for item, row in valid if item['registration_id'] not in updated]
+                    cursor.execute(f"DELETE FROM payment WHERE payment_id IN ({', '.join(['%s'] * len(failed))})",
+                                   [item['payment_id'] for item, _ in failed])
+                    logger.warning("批量受理挂号：部分挂号在受理期间被其他操作修改",
+                                   extra={'registration_ids': [item['registration_id'] for item, _ in failed]})
+                    for item, _ in failed:
+                        item['status'], item['payment_id'] = 'conflict', None
+                    valid = [(item, row) for item, row in valid if item['registration_id'] in updated]
+                
+                if valid:
+                    worklist.project_registrations(cursor, [item['registration_id'] for item, _ in valid])
+                    summary_module.touch_patients(cursor, [row['patient_id'] for _, row in valid])
+        
+        for item, row in valid:
+            item['status'] = 'assigned'
+            publish_registration('assigned', dict(row, doctor_id=item['doctor_id'],
+                                                  payment_id=item['payment_id'], status='assigned'))
+        
+        for item in results:
+            item['message'] = BATCH_STATUS_MESSAGES[item['status']]
+        logger.info("批量受理挂号完成", extra={'count': len(results),
+                                         'assigned': sum(item['status'] == 'assigned' for item in results)})
+        return results
         
     except Exception as e:
-        print(f"❌ 处理挂号失败: {e}")
-        return False
+        logger.error("批量受理挂号失败", extra={'error': e})
+        return None
     
 def get_registration_info(cursor, registration_id, info_type='patient'):
     """
@@ -157,46 +260,34 @@ def get_registration_info(cursor, registration_id, info_type='patient'):
         int: 对应的ID值，如果不存在或查询失败返回None
     """
     try:
-        # 检查挂号是否存在
-        if not check_registration_exists(cursor, registration_id):
-            print(f"❌ 获取挂号信息失败：挂号编号 {registration_id} 不存在")
-            return None
-        
-        # 查询挂号记录
-        cursor.execute("SELECT patient_id, doctor_id, department_id FROM registration WHERE registration_id = %s", (registration_id,))
-        registration = cursor.fetchone()
+        # 查询挂号记录（存在性检查与读取合并为一次按主键读取）
+        registration = fetch_row(cursor, 'registration', 'registration_id', registration_id)
         
         if not registration:
-            print(f"❌ 获取挂号信息失败：挂号编号 {registration_id} 的记录不存在")
+            logger.warning("获取挂号信息失败：挂号编号不存在", extra={'registration_id': registration_id})
             return None
         
         # 根据info_type返回对应的ID
         if info_type == 'patient':
             result = registration['patient_id']
-            print(f"✅ 挂号编号 {registration_id} 对应的病历号: {result}")
         elif info_type == 'doctor':
             result = registration['doctor_id']
-            if result:
-                print(f"✅ 挂号编号 {registration_id} 对应的医生工号: {result}")
-            else:
-                print(f"⚠️ 挂号编号 {registration_id} 尚未分配医生")
+            if not result:
+                logger.warning("挂号尚未分配医生", extra={'registration_id': registration_id})
         elif info_type == 'department':
             result = registration['department_id']
-            print(f"✅ 挂号编号 {registration_id} 对应的科室编号: {result}")
         elif info_type == 'payment':
             result = registration['payment_id']
-            if result:
-                print(f"✅ 挂号编号 {registration_id} 对应的缴费号: {result}")
-            else:
-                print(f"⚠️ 挂号编号 {registration_id} 尚未关联缴费")
+            if not result:
+                logger.warning("挂号尚未关联缴费", extra={'registration_id': registration_id})
         else:
-            print(f"❌ 无效的信息类型: {info_type}，请使用 'patient', 'doctor', 'department' 或 'payment'")
+            logger.error("无效的信息类型，请使用 'patient', 'doctor', 'department' 或 'payment'", extra={'info_type': info_type})
             return None
         
         return result
         
     except Exception as e:
-        print(f"❌ 获取挂号信息失败: {e}")
+        logger.error("获取挂号信息失败", extra={'error': e})
         return None
 
 def check_registration_exists(cursor, registration_id):
@@ -211,17 +302,11 @@ def check_registration_exists(cursor, registration_id):
         bool: 存在返回True，不存在返回False
     """
     try:
-        # 查询挂号是否存在
-        cursor.execute("SELECT registration_id FROM registration WHERE registration_id = %s", (registration_id,))
-        result = cursor.fetchone()
-        
-        if result:
-            return True
-        else:
-            return False
+        # 查询挂号是否存在（同一请求内已读取过该行时不再查询）
+        return fetch_row(cursor, 'registration', 'registration_id', registration_id) is not None
             
     except Exception as e:
-        print(f"❌ 检查挂号ID失败: {e}")
+        logger.error("检查挂号ID失败", extra={'error': e})
         return False
 
 def set_registration_payment(cursor, registration_id, payment_id):
@@ -237,22 +322,20 @@ def set_registration_payment(cursor, registration_id, payment_id):
         bool: 分配是否成功
     """
     try:
-        # 1. 检查挂号是否存在
-        if not check_registration_exists(cursor, registration_id):
-            print(f"❌ 分配缴费失败：挂号编号 {registration_id} 不存在")
+        # 1. 查询挂号记录（本请求已读取过时不再查询）
+        registration = fetch_row(cursor, 'registration', 'registration_id', registration_id)
+        if not registration:
+            logger.warning("分配缴费失败：挂号编号不存在", extra={'registration_id': registration_id})
             return False
 
         # 2. 检查缴费记录是否存在 (使用新的辅助函数)
         if not payment_module.check_payment_exists(cursor, payment_id):
-            print(f"❌ 分配缴费失败：缴费号 {payment_id} 不存在")
+            logger.warning("分配缴费失败：缴费号不存在", extra={'payment_id': payment_id})
             return False
 
-        # 3. 查询当前挂号信息，检查是否已缴费
-        cursor.execute("SELECT payment_id FROM registration WHERE registration_id = %s", (registration_id,))
-        registration = cursor.fetchone()
-        
+        # 3. 检查是否已缴费
         if registration['payment_id']:
-            print(f"⚠️ 挂号 {registration_id} 已经分配过缴费号（缴费号: {registration['payment_id']}），无需重复分配")
+            logger.warning("挂号已经分配过缴费号，无需重复分配", extra={'registration_id': registration_id, 'payment_id': registration['payment_id']})
             return True
         
         # 4. 更新挂号记录，关联缴费号
@@ -261,42 +344,81 @@ def set_registration_payment(cursor, registration_id, payment_id):
         SET payment_id = %s, updated_at = NOW() 
         WHERE registration_id = %s
         """
-        cursor.execute(sql, (payment_id, registration_id))
+        with transaction(cursor):
+            cursor.execute(sql, (payment_id, registration_id))
+            worklist.project_registrations(cursor, [registration_id])
+            summary_module.touch_patients(cursor, [registration['patient_id']])
         
-        # 5. 查询并打印详细信息
-        # 获取病人姓名
-        cursor.execute("SELECT p.name FROM registration r JOIN patient p ON r.patient_id = p.patient_id WHERE r.registration_id = %s", (registration_id,))
-        patient = cursor.fetchone()
-        patient_name = patient['name'] if patient else "未知病人"
-
-        # 获取科室名称
-        cursor.execute("SELECT d.department_name FROM registration r JOIN department d ON r.department_id = d.department_id WHERE r.registration_id = %s", (registration_id,))
-        dept = cursor.fetchone()
-        dept_name = dept['department_name'] if dept else "未知科室"
+        logger.info("挂号缴费关联成功", extra={'registration_id': registration_id, 'payment_id': payment_id})
+        
+        return True
         
-        print(f"✅ 挂号缴费关联成功！")
-        print(f"   挂号编号: {registration_id}")
-        print(f"   病人: {patient_name}")
-        print(f"   科室: {dept_name}")
-        print(f"   已关联缴费号: {payment_id}")
+    except Exception as e:
+        logger.error("分配缴费失败", extra={'error': e})
+        return False
+
+def close_registration(cursor, registration_id, doctor_id=None):
+    """
+    结束就诊：费用已缴清（paid）的挂号改为 closed
+    
+    Args:
+        cursor: 数据库游标
+        registration_id: 挂号编号
+        doctor_id: 医生工号（可选，指定时只能结束分配给该医生的挂号）
+    
+    Returns:
+        bool: 是否成功
+    """
+    try:
+        sql = """
+        UPDATE registration 
+        SET status = 'closed', updated_at = NOW() 
+        WHERE registration_id = %s AND status = 'paid'
+        """
+        params = [registration_id]
+        if doctor_id:
+            sql += " AND doctor_id = %s"
+            params.append(doctor_id)
+        with transaction(cursor):
+            cursor.execute(sql, params)
+            closed = cursor.rowcount
+            if closed:
+                worklist.project_registrations(cursor, [registration_id])
+                summary_module.touch_registration(cursor, registration_id)
+        
+        if not closed:
+            logger.warning("结束就诊失败：挂号不存在、费用未缴清或不属于该医生",
+                           extra={'registration_id': registration_id, 'doctor_id': doctor_id})
+            return False
         
+        publish_registration('closed', {'registration_id': registration_id, 'status': 'closed',
+                                        'doctor_id': doctor_id or get_registration_info(cursor, registration_id, 'doctor')})
+        logger.info("就诊结束", extra={'registration_id': registration_id})
         return True
         
     except Exception as e:
-        print(f"❌ 分配缴费失败: {e}")
+        logger.error("结束就诊失败", extra={'error': e})
         return False
 
-def query_registration(cursor, registration_id=None, patient_id=None, doctor_id=None, department_id=None, unassigned_only=False):
+def query_registration(cursor, registration_id=None, patient_id=None, doctor_id=None, department_id=None, unassigned_only=False, status=None, with_names=True, after_id=None, before_id=None, limit=None):
     """
     查询挂号信息
     
+    待办队列按状态查询：未受理挂号为 status = 'created'（可加科室），走 (status, department_id, registration_id) 索引；
+    医生待办为 doctor_id 加状态，走 (doctor_id, status) 索引，都是一次索引范围扫描。
+    
     Args:
         cursor: 数据库游标
         registration_id: 挂号编号（可选）
         patient_id: 病历号（可选）
         doctor_id: 医生工号（可选）
         department_id: 科室编号（可选）
-        unassigned_only: 是否只查询未分配医生的挂号（布尔值，默认为False）
+        unassigned_only: 是否只查询未分配医生的挂号（布尔值，默认为False，等同于 status='created'）
+        status: 状态或状态列表（可选，见 REGISTRATION_STATUSES）
+        with_names: 是否关联查询病人姓名、医生姓名与科室名称（默认为True）
+        after_id: 分页游标，只返回挂号编号大于该值的记录（可选）
+        before_id: 分页游标，只返回挂号编号小于该值的记录（可选）
+        limit: 返回条数（可选，默认不分页，最多 MAX_PAGE_SIZE 条）
     
     Returns:
         list: 查询结果列表
@@ -322,61 +444,92 @@ def query_registration(cursor, registration_id=None, patient_id=None, doctor_id=
             conditions.append("r.department_id = %s")
             params.append(department_id)
 
-        # 新增：如果设置了只查询未分配的挂号，则添加条件
+        # 按状态过滤（只查询未分配的挂号即 created 状态）
         if unassigned_only:
-            conditions.append("r.doctor_id IS NULL")
-        
-        # 构建SQL查询，关联病人、科室、医生信息
-        if not conditions:
-            sql = """
-            SELECT r.*, p.name as patient_name, d.name as doctor_name, dept.department_name
-            FROM registration r
-            LEFT JOIN patient p ON r.patient_id = p.patient_id
-            LEFT JOIN doctor d ON r.doctor_id = d.doctor_id
-            LEFT JOIN department dept ON r.department_id = dept.department_id
-            ORDER BY r.registration_id
-            """
-        else:
+            status = 'created'
+        if status:
+            statuses = [status] if isinstance(status, str) else list(status)
+            conditions.append(f"r.status IN ({', '.join(['%s'] * len(statuses))})")
+            params.extend(statuses)
+        
+        order_sql, reverse = keyset_clause("r.registration_id", conditions, params, after_id, before_id, limit)
+        where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        # 构建SQL查询，需要时关联病人、科室、医生信息
+        if with_names:
             sql = f"""
             SELECT r.*, p.name as patient_name, d.name as doctor_name, dept.department_name
             FROM registration r
             LEFT JOIN patient p ON r.patient_id = p.patient_id
             LEFT JOIN doctor d ON r.doctor_id = d.doctor_id
             LEFT JOIN department dept ON r.department_id = dept.department_id
-            WHERE {' AND '.join(conditions)}
-            ORDER BY r.registration_id
+            {where_sql}
+            {order_sql}
             """
+        else:
+            sql = f"SELECT r.* FROM registration r {where_sql} {order_sql}"
         
         cursor.execute(sql, params)
         results = cursor.fetchall()
+        if reverse:
+            results = list(reversed(results))
+        logger.debug("查询挂号", extra={'row_count': len(results), 'status': status})
+        return results
         
-        # 输出查询结果
-        query_type = "未分配医生" if unassigned_only else "挂号"
-        print(f"\n🔍 查询到 {len(results)} 条{query_type}记录")
-        print("-" * 140)
-        print(f"{'挂号编号':<6} {'病历号':<5} {'病人姓名':<6} {'科室ID':<6} {'科室名称':<11} {'医生工号':<4} {'医生姓名':<6} {'缴费号':<7} {'创建时间':<16}")
-        print("-" * 140)
-        
-        if results:
-            for reg in results:
-                patient_name = reg['patient_name'] if reg['patient_name'] else '未知病人'
-                doctor_name = reg['doctor_name'] if reg['doctor_name'] else '待分配'
-                dept_name = reg['department_name'] if reg['department_name'] else '未知科室'
-                doctor_id_val = reg['doctor_id'] if reg['doctor_id'] else 'NULL'
-                payment_id_val = reg['payment_id'] if reg['payment_id'] else 'NULL'
-                created_time = str(reg['created_at']) if reg['created_at'] else 'NULL'
-                
-                print(f"{reg['registration_id']:<10} {reg['patient_id']:<8} {patient_name:<10} "
-                      f"{reg['department_id']:<8} {dept_name:<15} {doctor_id_val:<8} {doctor_name:<10} "
-                      f"{payment_id_val:<10} {created_time:<20}")
-        else:
-            print(f"  没有找到匹配的{query_type}记录")
+    except Exception as e:
+        logger.error("查询挂号失败", extra={'error': e})
+        return []
+
+
+def query_worklist(cursor, doctor_id=None, patient_id=None, department_id=None, unassigned_only=False, after_id=None, before_id=None, limit=None):
+    """
+    从工作列表读模型（registration_view）查询挂号，结果包含病人姓名、医生姓名与科室名称，不关联其他表
+    
+    医生待办（doctor_id）、病人挂号（patient_id）与未受理挂号（unassigned_only，可加科室）
+    各自对应读模型的一个索引，都是一次索引范围扫描。
+    
+    Args:
+        cursor: 数据库游标
+        doctor_id: 医生工号（可选，只返回该医生的待办挂号，即已分配且尚未结束就诊）
+        patient_id: 病历号（可选）
+        department_id: 科室编号（可选）
+        unassigned_only: 是否只查询未分配医生的挂号（布尔值，默认为False）
+        after_id: 分页游标，只返回挂号编号大于该值的记录（可选）
+        before_id: 分页游标，只返回挂号编号小于该值的记录（可选）
+        limit: 返回条数（可选，默认不分页，最多 MAX_PAGE_SIZE 条）
+    
+    Returns:
+        list: 查询结果列表
+    """
+    try:
+        conditions = []
+        params = []
         
-        print("-" * 140)
+        if doctor_id:
+            conditions.append("doctor_id = %s AND doctor_open = 1")
+            params.append(doctor_id)
+        
+        if patient_id:
+            conditions.append("patient_id = %s")
+            params.append(patient_id)
         
+        if unassigned_only:
+            conditions.append("status = 'created'")
+        
+        if department_id:
+            conditions.append("department_id = %s")
+            params.append(department_id)
+        
+        order_sql, reverse = keyset_clause("registration_id", conditions, params, after_id, before_id, limit)
+        where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        cursor.execute(f"SELECT * FROM registration_view {where_sql} {order_sql}", params)
+        results = cursor.fetchall()
+        if reverse:
+            results = list(reversed(results))
+        logger.debug("查询挂号工作列表", extra={'row_count': len(results)})
         return results
         
     except Exception as e:
-        print(f"❌ 查询挂号失败: {e}")
+        logger.error("查询挂号工作列表失败", extra={'error': e})
         return []
-
@@ -0,0 +1,257 @@
+import pymysql
+from db.backend import is_integrity_error
+from db.transaction import transaction, Rollback
+from schedule.slots import slot_index, slot_start, MAX_SLOTS
+from schedule import worklist
+import entity.summary as summary_module
+from events import publish_registration
+from log import get_logger
+
+logger = get_logger(__name__)
+
+def set_slot_template(cursor, doctor_id, weekday, start_minute, slot_minutes, slot_count):
+    """
+    设置医生某个星期几的出诊时段模板（已存在时覆盖）
+
+    只影响之后才生成的出诊日，已有预约的日期保持原来的时段安排。
+
+    Args:
+        cursor: 数据库游标
+        doctor_id: 医生工号
+        weekday: 星期（0 为周一，6 为周日）
+        start_minute: 第一个时段的开始时间（当天第几分钟，如 8:00 为 480）
+        slot_minutes: 每个时段的分钟数
+        slot_count: 时段数（1 ~ MAX_SLOTS）
+
+    Returns:
+        bool: 设置是否成功
+    """
+    if not (0 <= weekday <= 6 and slot_minutes > 0 and 1 <= slot_count <= MAX_SLOTS
+            and 0 <= start_minute and start_minute + slot_minutes * slot_count <= 24 * 60):
+        logger.warning("设置出诊时段失败：时段参数无效", extra={'doctor_id': doctor_id, 'weekday': weekday,
+                                                    'start_minute': start_minute, 'slot_minutes': slot_minutes,
+                                                    'slot_count': slot_count})
+        return False
+
+    try:
+        # 替换旧模板的删除与插入在同一事务中，插入失败时保留旧模板（医生不存在时违反外键约束）
+        with transaction(cursor):
+            cursor.execute("DELETE FROM doctor_slot_template WHERE doctor_id = %s AND weekday = %s",
+                           (doctor_id, weekday))
+            sql = """
+            INSERT INTO doctor_slot_template (doctor_id, weekday, start_minute, slot_minutes, slot_count, created_at)
+            VALUES (%s, %s, %s, %s, %s, NOW())
+            """
+            cursor.execute(sql, (doctor_id, weekday, start_minute, slot_minutes, slot_count))
+        slot_index.clear()
+
+        logger.info("出诊时段设置成功", extra={'doctor_id': doctor_id, 'weekday': weekday})
+        return True
+
+    except Exception as e:
+        if is_integrity_error(e):
+            logger.warning("设置出诊时段失败：医生工号不存在", extra={'doctor_id': doctor_id})
+        else:
+            logger.error("设置出诊时段失败", extra={'error': e})
+        return False
+
+def remove_slot_template(cursor, doctor_id, weekday):
+    """
+    删除医生某个星期几的出诊时段模板（已有预约的日期不受影响）
+
+    Args:
+        cursor: 数据库游标
+        doctor_id: 医生工号
+        weekday: 星期（0 为周一，6 为周日）
+
+    Returns:
+        bool: 删除是否成功
+    """
+    try:
+        cursor.execute("DELETE FROM doctor_slot_template WHERE doctor_id = %s AND weekday = %s", (doctor_id, weekday))
+        if not cursor.rowcount:
+            logger.warning("删除出诊时段失败：模板不存在", extra={'doctor_id': doctor_id, 'weekday': weekday})
+            return False
+        slot_index.clear()
+
+        logger.info("出诊时段删除成功", extra={'doctor_id': doctor_id, 'weekday': weekday})
+        return True
+
+    except Exception as e:
+        logger.error("删除出诊时段失败", extra={'error': e})
+        return False
+
+def query_slot_templates(cursor, doctor_id=None, department_id=None):
+    """
+    查询出诊时段模板
+
+    Args:
+        cursor: 数据库游标
+        doctor_id: 医生工号（可选）
+        department_id: 科室编号（可选）
+
+    Returns:
+        list: 查询结果列表（包含医生姓名与科室编号），按医生工号、星期排序
+    """
+    try:
+        conditions = []
+        params = []
+
+        if doctor_id:
+            conditions.append("t.doctor_id = %s")
+            params.append(doctor_id)
+
+        if department_id:
+            conditions.append("d.department_id = %s")
+            params.append(department_id)
+
+        where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        sql = f"""
+        SELECT t.*, d.name AS doctor_name, d.department_id
+        FROM doctor_slot_template t JOIN doctor d ON d.doctor_id = t.doctor_id
+        {where_sql}
+        ORDER BY t.doctor_id, t.weekday
+        """
+        cursor.execute(sql, params)
+        results = cursor.fetchall()
+        logger.debug("查询出诊时段", extra={'row_count': len(results)})
+        return results
+
+    except Exception as e:
+        logger.error("查询出诊时段失败", extra={'error': e})
+        return []
+
+def book_slot(cursor, patient_id, doctor_id, slot_date, slot_index_value, price):
+    """
+    预约医生某天的一个时段：在一个事务中占用时段、生成挂号费缴费单并创建已分配医生的挂号
+
+    占用时段是对出诊日位图的比较并设置（只有该位仍为 0 时才置 1），并发预约同一时段只有一个成功。
+    该医生当天还没有出诊记录时先按模板生成（INSERT IGNORE，并发生成时只有一条生效）再占用。
+
+    Args:
+        cursor: 数据库游标
+        patient_id: 病历号
+        doctor_id: 医生工号
+        slot_date: 预约日期（date）
+        slot_index_value: 时段序号
+        price: 挂号费
+
+    Returns:
+        dict: registration_id、payment_id、doctor_id、department_id、slot_date、slot_index、start（时段开始时间）；
+              时段已被预约、医生当天不出诊或其他原因失败时返回 None
+    """
+    bit = 1 << slot_index_value
+    cas_sql = """
+    UPDATE doctor_slot_day
+    SET booked = booked | %s
+    WHERE doctor_id = %s AND slot_date = %s AND slot_count > %s AND (booked & %s) = 0
+    """
+    cas_params = (bit, doctor_id, slot_date, slot_index_value, bit)
+
+    result = None
+    taken = False
+    try:
+        with transaction(cursor):
+            # 1. 比较并设置：仅当该时段未被预约时占用
+            cursor.execute(cas_sql, cas_params)
+            if not cursor.rowcount:
+                # 当天尚无出诊记录时按模板生成后重试
+                sql = """
+                INSERT IGNORE INTO doctor_slot_day (doctor_id, slot_date, start_minute, slot_minutes, slot_count, booked)
+                SELECT doctor_id, %s, start_minute, slot_minutes, slot_count, 0
+                FROM doctor_slot_template WHERE doctor_id = %s AND weekday = %s
+                """
+                cursor.execute(sql, (slot_date, doctor_id, slot_date.weekday()))
+                if cursor.rowcount:
+                    cursor.execute(cas_sql, cas_params)
+                if not cursor.rowcount:
+                    taken = True
+                    logger.warning("预约失败：时段已被预约或医生当天不出诊",
+                                   extra={'doctor_id': doctor_id, 'slot_date': slot_date, 'slot_index': slot_index_value})
+                    raise Rollback
+
+            # 2. 读取时段安排与医生所属科室
+            sql = """
+            SELECT s.start_minute, s.slot_minutes, s.slot_count, d.department_id
+            FROM doctor_slot_day s JOIN doctor d ON d.doctor_id = s.doctor_id
+            WHERE s.doctor_id = %s AND s.slot_date = %s
+            """
+            cursor.execute(sql, (doctor_id, slot_date))
+            day = cursor.fetchone()
+            if not day or day['department_id'] is None:
+                logger.warning("预约失败：医生不属于任何科室", extra={'doctor_id': doctor_id})
+                raise Rollback
+
+            # 3. 生成挂号费缴费单（病人不存在时违反外键约束）
+            sql = """
+            INSERT INTO payment (patient_id, price, time, created_at)
+            VALUES (%s, %s, NULL, NOW())
+            """
+            cursor.execute(sql, (patient_id, price))
+            payment_id = cursor.lastrowid
+
+            # 4. 创建已分配医生、关联时段的挂号
+            sql = """
+            INSERT INTO registration (patient_id, department_id, doctor_id, payment_id, status, slot_date, slot_index, created_at)
+            VALUES (%s, %s, %s, %s, 'assigned', %s, %s, NOW())
+            """
+            cursor.execute(sql, (patient_id, day['department_id'], doctor_id, payment_id, slot_date, slot_index_value))
+            registration_id = cursor.lastrowid
+            worklist.project_registrations(cursor, [registration_id])
+            summary_module.touch_patients(cursor, [patient_id])
+
+            layout = (day['start_minute'], day['slot_minutes'], day['slot_count'])
+            result = {
+                'registration_id': registration_id,
+                'payment_id': payment_id,
+                'doctor_id': doctor_id,
+                'department_id': day['department_id'],
+                'slot_date': slot_date,
+                'slot_index': slot_index_value,
+                'start': slot_start(slot_date, day['start_minute'], day['slot_minutes'], slot_index_value),
+            }
+
+        if result:
+            slot_index.mark_booked(doctor_id, slot_date, slot_index_value, layout)
+            publish_registration('assigned', dict(result, patient_id=patient_id, status='assigned'))
+            logger.info("预约成功", extra={'patient_id': patient_id, **result})
+        elif taken:
+            # 时段已被其他进程预约，记入本进程的位图，下次查找时跳过
+            slot_index.mark_booked(doctor_id, slot_date, slot_index_value)
+        return result
+
+    except Exception as e:
+        if is_integrity_error(e):
+            logger.warning("预约失败：病历号不存在", extra={'patient_id': patient_id})
+        else:
+            logger.error("预约失败", extra={'error': e})
+        return None
+
+def book_next_slot(cursor, patient_id, department_id, price, after=None, attempts=3):
+    """
+    预约科室最早的空闲时段
+
+    空闲时段在内存中查找；若选中的时段刚被其他进程预约，跳过它再找下一个，最多尝试 attempts 次。
+
+    Args:
+        cursor: 数据库游标
+        patient_id: 病历号
+        department_id: 科室编号
+        price: 挂号费
+        after: 只预约开始时间不早于该时间的时段（默认当前时间）
+        attempts: 最多尝试次数
+
+    Returns:
+        dict: 同 book_slot；没有空闲时段或多次尝试均失败时返回 None
+    """
+    exclude = []
+    for _ in range(attempts):
+        slot = slot_index.next_free(cursor, department_id, after=after, exclude=exclude)
+        if slot is None:
+            logger.warning("预约失败：科室近期没有空闲时段", extra={'department_id': department_id})
+            return None
+        result = book_slot(cursor, patient_id, slot['doctor_id'], slot['slot_date'], slot['slot_index'], price)
+        if result:
+            return result
+        exclude.append((slot['doctor_id'], slot['slot_date'], slot['slot_index']))
+    return None
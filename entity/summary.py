@@ -0,0 +1,176 @@
+"""
+病人概览
+
+病人控制台与 /patient/summary 一次查询取得病人资料、未结束的挂号（含科室、医生名称）、
+待缴费用与合计、最近开具的处方：四部分用 UNION ALL 拼成一条语句，每部分各自走索引，
+各行按 kind 列区分后在 Python 中分组。
+
+每位病人有一个概览版本号（patient_summary_version），entity 层修改病人的资料、挂号、缴费或处方时
+在同一事务中递增（touch_*）。版本号与概览在同一条语句中读出，作为 ETag；
+再次访问时只需按主键读取版本号，未变化即返回 304。
+
+处方金额按开具时保存的单价（prescription.unit_price）计算，药品调价不改变概览。
+升级前开具的处方没有保存单价，仍按药品的当前单价计算，这些处方的药品调价时递增相关病人的版本号（touch_drug）。
+"""
+from decimal import Decimal
+
+from log import get_logger
+
+logger = get_logger(__name__)
+
+RECENT_PRESCRIPTION_LIMIT = 10
+
+# UNION ALL 各部分共用的列，某部分没有的列为 NULL
+_COLUMNS = ('kind', 'id', 'name', 'gender', 'phone_number', 'registration_id', 'department_name', 'doctor_name',
+            'payment_id', 'status', 'slot_date', 'slot_index', 'drug_name', 'quantity', 'price', 'time',
+            'created_at', 'version')
+
+# 各部分返回给调用方的字段（id 列按部分改名为对应的编号）
+_FIELDS = {
+    'patient': ('patient_id', 'name', 'gender', 'phone_number', 'created_at'),
+    'registration': ('registration_id', 'department_name', 'doctor_name', 'payment_id', 'status',
+                     'slot_date', 'slot_index', 'created_at'),
+    'payment': ('payment_id', 'price', 'created_at'),
+    'prescription': ('prescription_id', 'registration_id', 'drug_name', 'quantity', 'price', 'payment_id',
+                     'time', 'created_at'),
+}
+
+
+def _part(kind, source, **columns):
+    """UNION ALL 的一部分：按 _COLUMNS 的顺序选出各列，未给出的列为 NULL"""
+    columns['kind'] = f"'{kind}'"
+    select = ', '.join(f"{columns.get(column, 'NULL')} AS {column}" for column in _COLUMNS)
+    return f"SELECT {select} {source}"
+
+
+_SUMMARY = ' UNION ALL '.join([
+    _part('patient', """
+        FROM patient p LEFT JOIN patient_summary_version v ON v.patient_id = p.patient_id
+        WHERE p.patient_id = %s""",
+          id='p.patient_id', name='p.name', gender='p.gender', phone_number='p.phone_number',
+          created_at='p.created_at', version='v.version'),
+    # 未结束的挂号：读模型的 (patient_id, registration_id) 索引
+    _part('registration', """
+        FROM registration_view WHERE patient_id = %s AND status <> 'closed'""",
+          id='registration_id', registration_id='registration_id', department_name='department_name',
+          doctor_name='doctor_name', payment_id='payment_id', status='status', slot_date='slot_date',
+          slot_index='slot_index', created_at='created_at'),
+    # 待缴费用：(patient_id, time) 索引
+    _part('payment', """
+        FROM payment WHERE patient_id = %s AND time IS NULL""",
+          id='payment_id', payment_id='payment_id', price='price', created_at='created_at'),
+    # 最近的处方
+    "SELECT * FROM (" + _part('prescription', """
+        FROM prescription pr
+        JOIN registration r ON r.registration_id = pr.registration_id
+        JOIN drug d ON d.drug_id = pr.drug_id
+        LEFT JOIN payment y ON y.payment_id = pr.payment_id
+        WHERE r.patient_id = %s
+        ORDER BY pr.prescription_id DESC LIMIT %s""",
+          id='pr.prescription_id', registration_id='pr.registration_id', drug_name='d.drug_name',
+          quantity='pr.quantity', price='COALESCE(pr.unit_price, d.drug_price) * pr.quantity', payment_id='pr.payment_id',
+          time='y.time', created_at='pr.created_at') + ") recent",
+])
+
+
+def _touch(cursor, patients_sql, params):
+    cursor.execute(f"UPDATE patient_summary_version SET version = version + 1 WHERE patient_id IN ({patients_sql})",
+                   params)
+
+
+def touch_patients(cursor, patient_ids):
+    """
+    递增病人的概览版本号，应与病人资料、挂号、缴费或处方的修改在同一事务中调用
+
+    Args:
+        cursor: 数据库游标
+        patient_ids: 病历号列表
+    """
+    patient_ids = sorted(set(patient_ids))
+    if patient_ids:
+        _touch(cursor, ', '.join(['%s'] * len(patient_ids)), patient_ids)
+
+
+def touch_registration(cursor, registration_id):
+    """递增挂号所属病人的概览版本号（调用方不知道病历号时使用）"""
+    _touch(cursor, "SELECT patient_id FROM registration WHERE registration_id = %s", (registration_id,))
+
+
+def touch_department(cursor, department_id):
+    """科室改名后递增在该科室挂过号的病人的概览版本号"""
+    _touch(cursor, "SELECT patient_id FROM registration_view WHERE department_id = %s", (department_id,))
+
+
+def touch_drug(cursor, drug_id):
+    """药品调价后递增有该药品未保存单价的（升级前开具的）处方的病人的概览版本号"""
+    _touch(cursor, """
+        SELECT r.patient_id FROM prescription pr JOIN registration r ON r.registration_id = pr.registration_id
+        WHERE pr.drug_id = %s AND pr.unit_price IS NULL""", (drug_id,))
+
+
+def init_summary_version(cursor, patient_id):
+    """为病人建立概览版本号（已存在时跳过），新病人注册时调用"""
+    cursor.execute("INSERT IGNORE INTO patient_summary_version (patient_id, version) VALUES (%s, 0)", (patient_id,))
+
+
+def get_summary_version(cursor, patient_id):
+    """
+    读取病人的概览版本号（一次主键读取）
+
+    Returns:
+        int: 版本号，尚未建立或查询失败时返回 None
+    """
+    try:
+        cursor.execute("SELECT version FROM patient_summary_version WHERE patient_id = %s", (patient_id,))
+        row = cursor.fetchone()
+        return row['version'] if row else None
+
+    except Exception as e:
+        logger.error("查询概览版本号失败", extra={'error': e})
+        return None
+
+
+def query_patient_summary(cursor, patient_id, prescription_limit=RECENT_PRESCRIPTION_LIMIT):
+    """
+    一次查询取得病人概览
+
+    Args:
+        cursor: 数据库游标
+        patient_id: 病历号
+        prescription_limit: 返回最近处方的条数
+
+    Returns:
+        dict: patient（资料）、registrations（未结束的挂号，按挂号编号排序）、payments（待缴费用，按缴费号排序）、
+              owed（待缴合计）、prescriptions（最近的处方，新的在前）、version（概览版本号，尚未建立时为 None）；
+              病人不存在或查询失败返回None
+    """
+    try:
+        cursor.execute(_SUMMARY, (patient_id, patient_id, patient_id, patient_id, prescription_limit))
+        parts = {kind: [] for kind in _FIELDS}
+        version = None
+        for row in cursor.fetchall():
+            kind, fields = row['kind'], _FIELDS[row['kind']]
+            if kind == 'patient':
+                version = row['version']
+            parts[kind].append({field: row['id'] if field == fields[0] else row[field] for field in fields})
+
+        if not parts['patient']:
+            logger.warning("查询病人概览失败：病历号不存在", extra={'patient_id': patient_id})
+            return None
+
+        # UNION ALL 不保证各部分的顺序
+        parts['registration'].sort(key=lambda item: item['registration_id'])
+        parts['payment'].sort(key=lambda item: item['payment_id'])
+        parts['prescription'].sort(key=lambda item: item['prescription_id'], reverse=True)
+        return {
+            'patient': parts['patient'][0],
+            'registrations': parts['registration'],
+            'payments': parts['payment'],
+            'owed': sum((Decimal(str(item['price'])) for item in parts['payment']), Decimal('0')),
+            'prescriptions': parts['prescription'],
+            'version': version,
+        }
+
+    except Exception as e:
+        logger.error("查询病人概览失败", extra={'error': e})
+        return None
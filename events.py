@@ -0,0 +1,166 @@
+"""
+进程内事件总线
+
+entity 层在挂号状态变化（分配医生、开具处方、缴清费用、结束就诊）并提交后发布事件，
+医生工作台通过 /doctor/registrations/stream（Server-Sent Events）订阅自己的事件，
+页面按事件增量更新，不再反复刷新、查询挂号列表。
+
+每个订阅者有一个有界队列，发布只是把事件放入订阅了该主题的队列，不做任何 I/O；
+订阅者消费过慢、队列已满时丢弃该订阅者后续的事件并标记 overflowed，
+由推送端通知页面整体刷新一次。
+
+事件只在本进程内分发：多进程部署时，医生连接的进程只能收到该进程内发生的变化，
+其他工作进程中发生的变化（如其他进程受理的挂号）不会推送，页面重新连接（或刷新）时才会取得最新列表。
+
+每条订阅（SSE 连接）在服务器上长期占用一个线程或协程，max_subscribers 限制本进程的订阅数，
+达到上限时 subscribe 返回 None，由推送端返回 503。
+"""
+import queue
+import threading
+
+
+def doctor_topic(doctor_id):
+    """医生工作台的事件主题"""
+    return ('doctor', doctor_id)
+
+
+class Subscription:
+    """一个订阅者（如一条 SSE 连接）的事件队列"""
+
+    def __init__(self, bus, topic, queue_size):
+        self.bus = bus
+        self.topic = topic
+        self.overflowed = False
+        self._queue = queue.Queue(maxsize=queue_size)
+
+    def put(self, event):
+        if self.overflowed:
+            return
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout=None):
+        """
+        取出下一个事件
+
+        Returns:
+            dict: 事件，timeout 秒内没有事件时返回 None
+        """
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """按主题分发事件的进程内总线"""
+
+    def __init__(self, queue_size=100, max_subscribers=None):
+        """
+        Args:
+            queue_size: 每个订阅者最多积压的事件数
+            max_subscribers: 本进程最多的订阅者数，None 表示不限
+        """
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers = {}  # 主题 -> set(Subscription)
+        self._count = 0
+        self._published = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    def configure(self, queue_size=None, max_subscribers=None):
+        """修改配置（只影响之后的订阅）"""
+        if queue_size is not None:
+            self.queue_size = queue_size
+        if max_subscribers is not None:
+            self.max_subscribers = max_subscribers
+
+    def subscribe(self, topic):
+        """
+        订阅一个主题
+
+        Returns:
+            Subscription: 使用完毕后调用 close() 取消订阅；订阅者数已达上限时返回 None
+        """
+        subscription = Subscription(self, topic, self.queue_size)
+        with self._lock:
+            if self.max_subscribers is not None and self._count >= self.max_subscribers:
+                self._rejected += 1
+                return None
+            self._subscribers.setdefault(topic, set()).add(subscription)
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """取消订阅（可重复调用）"""
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.topic)
+            if subscribers is not None and subscription in subscribers:
+                subscribers.discard(subscription)
+                self._count -= 1
+                if not subscribers:
+                    del self._subscribers[subscription.topic]
+
+    def has_subscribers(self, topic):
+        """主题是否有订阅者（没有时发布方可以省去准备事件内容的查询）"""
+        with self._lock:
+            return topic in self._subscribers
+
+    def publish(self, topic, event):
+        """
+        向主题的全部订阅者发布事件（不阻塞）
+
+        Returns:
+            int: 收到事件的订阅者数
+        """
+        with self._lock:
+            subscribers = list(self._subscribers.get(topic, ()))
+            self._published += 1
+        for subscription in subscribers:
+            subscription.put(event)
+        return len(subscribers)
+
+    def stats(self):
+        """
+        Returns:
+            dict: 主题数、订阅者数、订阅者数上限、因达到上限被拒绝的订阅数与已发布的事件数
+        """
+        with self._lock:
+            return {
+                'topics': len(self._subscribers),
+                'subscribers': self._count,
+                'max_subscribers': self.max_subscribers,
+                'rejected': self._rejected,
+                'published': self._published,
+            }
+
+
+# 进程内共享的事件总线，由 app.py 按 config.EVENT_CONFIG 配置
+event_bus = EventBus()
+
+# 推送给医生工作台的挂号字段
+REGISTRATION_FIELDS = ('registration_id', 'patient_id', 'department_id', 'doctor_id', 'payment_id', 'status',
+                       'slot_date', 'slot_index', 'created_at')
+
+
+def publish_registration(event_type, registration):
+    """
+    向挂号所属医生的工作台发布挂号变化
+
+    Args:
+        event_type: 事件类型：assigned（新分配）、prescribed（已开处方）、paid（已缴清）、closed（已结束就诊）
+        registration: 挂号字段（至少包含 registration_id 与 doctor_id，其余字段缺省为 None）
+    """
+    doctor_id = registration.get('doctor_id')
+    if not doctor_id:
+        return
+    event_bus.publish(doctor_topic(doctor_id), {
+        'type': event_type,
+        'registration': {field: registration.get(field) for field in REGISTRATION_FIELDS},
+    })
@@ -7,6 +7,7 @@ import entity.payment as payment_module
 import entity.doctor as doctor_module
 import entity.drug as drug_module
 import setup
+import presenter
 
 registration_fee = 50 # 挂号费用
 
@@ -65,7 +66,7 @@ def doctor_menu(cursor):
         print("未找到您的信息，请先联系管理员入职")
         return
     else:
-        doctor_module.query_doctor(cursor, doctor_id=doctor_id)
+        presenter.print_doctors(doctor_module.query_doctor(cursor, doctor_id=doctor_id))
     
     while True:
         print("""
@@ -143,7 +144,7 @@ def patient_query(cursor):
         except ValueError:
             print("输入错误，请重新输入")
             continue
-    patient_module.query_patient(cursor, **{query_type: query_key})
+    presenter.print_patients(patient_module.query_patient(cursor, **{query_type: query_key}))
 
 def patient_register(cursor):
     print("""
@@ -161,6 +162,7 @@ def patient_login(cursor):
     patient_id = int(input("请输入病历号："))
     print("正在查询您的信息...")
     result = patient_module.query_patient(cursor, patient_id=patient_id)
+    presenter.print_patients(result)
     if not result:
         print("未找到您的信息，请先注册")
         return
@@ -186,10 +188,10 @@ def patient_login(cursor):
         elif choice == "4":
             patient_creat_registrations(cursor, patient_id)
         elif choice == "5":
-            registration_module.query_registration(cursor, patient_id=patient_id)
+            presenter.print_registrations(registration_module.query_registration(cursor, patient_id=patient_id))
         elif choice == "6":
             registration_id = int(input("请输入要查询的处方对应的挂号ID："))
-            prescription_module.query_prescription(cursor, registration_id=registration_id)
+            presenter.print_prescriptions(prescription_module.query_prescription(cursor, registration_id=registration_id))
         elif choice == "7":
             patient_pay(cursor, patient_id)
         elif choice == "8":
@@ -218,19 +220,19 @@ def patient_change_info(cursor, patient_id):
 def patient_query_department(cursor):
     department_name = input("请输入科室名称（留空查询所有科室）：")
     if department_name:
-        department_module.query_department(cursor, department_name=department_name)
+        presenter.print_departments(department_module.query_department(cursor, department_name=department_name))
     else:
-        department_module.query_department(cursor)
+        presenter.print_departments(department_module.query_department(cursor))
 
 def patient_creat_registrations(cursor, patient_id):
     print("正在列出所有科室...")
-    department_module.query_department(cursor)
+    presenter.print_departments(department_module.query_department(cursor))
     department_id = int(input("请输入科室ID："))
     registration_module.create_registration(cursor, patient_id, department_id)
 
 def patient_pay(cursor, patient_id):
     print("正在列出所有待缴费信息")
-    payment_module.query_payment(cursor, patient_id=patient_id, time_is_null=True)
+    presenter.print_payments(payment_module.query_payment(cursor, patient_id=patient_id, time_is_null=True))
     payment_id = int(input("请输入要缴费的缴费单ID："))
     payment_module.complete_payment(cursor, payment_id)
 
@@ -238,37 +240,39 @@ def patient_pay(cursor, patient_id):
 def doctor_query_registration(cursor, doctor_id):
     print("这里是医生查看待办挂号界面")
     print("正在列出所有与您相关挂号信息...")
-    registration_module.query_registration(cursor, doctor_id=doctor_id)
+    presenter.print_registrations(registration_module.query_registration(cursor, doctor_id=doctor_id))
 
 def doctor_create_prescription(cursor, doctor_id):
     print("这里是医生开具处方界面")
     registration_id = int(input("请输入要开处方的挂号ID："))
     print("正在列出所有药品信息")
-    drug_module.query_drug(cursor)
-    drug_id = int(input("请输入药品ID："))
-    quantity = int(input("请输入药品数量："))
-    print("正在查询药品信息...")
-    if not drug_module.check_drug_exists(cursor, drug_id):
-        print("未找到药品信息，请先联系管理员添加药品")
+    presenter.print_drugs(drug_module.query_drug(cursor))
+    print("请逐行输入处方明细，格式：\"药品ID 数量\"，如\"1 2\"，直接回车结束输入")
+    items = []
+    while True:
+        line = input("请输入处方明细：")
+        if not line:
+            break
+        try:
+            drug_id, quantity = line.split()
+            items.append((int(drug_id), int(quantity)))
+        except ValueError:
+            print("输入错误，请重新输入")
+    print("正在生成缴费单并开具处方...")
+    result = prescription_module.prescribe_drugs(cursor, registration_id, items)
+    if not result:
+        print("处方开具失败：请检查挂号编号、药品及库存")
         return
-
-    print("正在生成缴费单...")
-    price = drug_module.get_drug_info(cursor, drug_id, info_type='price') * quantity
-    patient_id = registration_module.get_registration_info(cursor, registration_id, info_type='patient')
-    payment_id = payment_module.create_payment(cursor, patient_id, price)
-    print("正在生成处方...")
-    prescription_module.create_prescription(cursor, registration_id, drug_id, quantity, payment_id)
-    print("正在为处方预留药品...")
-    original_quantity = drug_module.get_drug_info(cursor, drug_id, info_type='quantity')
-    drug_module.update_drug_info(cursor, drug_id, stored_quantity=original_quantity - quantity)
-    print("药品剩余库存：", original_quantity - quantity)
+    print("处方开具成功，缴费单号：", result['payment_id'], "应缴金额：", result['price'])
+    for line in result['lines']:
+        print("药品", line['drug_id'], "剩余库存：", line['stored_quantity'])
 
 # admin
 
 def department_mangement(cursor):
     print("这里是科室管理界面")
     print("正在列出所有科室信息...")
-    department_module.query_department(cursor)
+    presenter.print_departments(department_module.query_department(cursor))
     while True:
         print("""
 请选择操作：
@@ -292,7 +296,7 @@ def department_mangement(cursor):
 def registration_process(cursor):
     print("这里是挂号受理界面")
     print("正在列出所有未受理挂号信息...")
-    registration_module.query_registration(cursor, unassigned_only=True)
+    presenter.print_registrations(registration_module.query_registration(cursor, unassigned_only=True), unassigned_only=True)
     registration_id = int(input("请输入挂号ID："))
     doctor_id = int(input("请输入医生ID："))
     if registration_module.process_registration(cursor, registration_id, doctor_id):
@@ -305,7 +309,7 @@ def registration_process(cursor):
 def doctors_management(cursor):
     print("这里是医生管理界面")
     print("正在列出所有医生信息...")
-    doctor_module.query_doctor(cursor)
+    presenter.print_doctors(doctor_module.query_doctor(cursor))
     while True:
         print("""
 请选择操作：
@@ -317,7 +321,7 @@ def doctors_management(cursor):
         choice = input("请输入您的选择：")
         if choice == "1":
             print("正在列出所有科室信息...")
-            department_module.query_department(cursor)
+            presenter.print_departments(department_module.query_department(cursor))
             doctor_id = int(input("请输入医生ID："))
             department_id = int(input("请输入新的科室ID："))
             doctor_module.set_doctor_department(cursor, doctor_id, department_id)
@@ -338,7 +342,7 @@ def doctors_management(cursor):
 def drugs_management(cursor):
     print("这里是药品管理界面")
     print("正在列出所有药品信息...")
-    drug_module.query_drug(cursor)
+    presenter.print_drugs(drug_module.query_drug(cursor))
     while True:
         print("""
 请选择操作：
@@ -370,7 +374,10 @@ def drugs_management(cursor):
                 except ValueError:
                     print("输入错误，请重新输入")
                     continue
-            drug_module.update_drug(cursor, drug_id, **{query_type: query_key})
+            if query_type == "price":
+                drug_module.update_drug_info(cursor, drug_id, drug_price=float(query_key))
+            else:
+                drug_module.update_drug_info(cursor, drug_id, stored_quantity=int(query_key))
         elif choice == "3":
             break
         else:
@@ -0,0 +1,92 @@
+"""
+结构化日志
+
+entity 层不再直接 print，而是通过这里获取的 logger 记录事件，字段以 extra 传入：
+
+    logger.info("病人注册成功", extra={'patient_id': patient_id})
+
+输出形如 ``2024-01-01 08:00:00 INFO entity.patient 病人注册成功 patient_id=1``，
+设置 OMS_LOG_FORMAT=json 时每行输出一个 JSON 对象。
+日志级别由 OMS_LOG_LEVEL 控制（默认 WARNING），低于该级别的日志不做任何格式化。
+"""
+import json
+import logging
+import os
+import sys
+
+# LogRecord 自带的属性，其余属性都视为通过 extra 传入的结构化字段
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_configured = False
+
+
+def _fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _RESERVED}
+
+
+class KeyValueFormatter(logging.Formatter):
+    """以 key=value 形式追加结构化字段"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s %(message)s', '%Y-%m-%d %H:%M:%S')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = _fields(record)
+        if fields:
+            line += ' ' + ' '.join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行 JSON"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%d %H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(_fields(record))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure(level=None, fmt=None, stream=None):
+    """
+    配置系统日志（重复调用会覆盖之前的配置）
+
+    Args:
+        level: 日志级别（如 'INFO'），默认读取 OMS_LOG_LEVEL，未设置时为 'WARNING'
+        fmt: 输出格式，'text' 或 'json'，默认读取 OMS_LOG_FORMAT
+        stream: 输出流，默认为标准错误
+    """
+    global _configured
+    level = level or os.environ.get('OMS_LOG_LEVEL', 'WARNING')
+    fmt = fmt or os.environ.get('OMS_LOG_FORMAT', 'text')
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter() if fmt == 'json' else KeyValueFormatter())
+
+    root = logging.getLogger('oms')
+    root.handlers[:] = [handler]
+    root.setLevel(level.upper())
+    root.propagate = False
+    _configured = True
+
+
+def get_logger(name):
+    """
+    获取模块日志记录器
+
+    Args:
+        name: 模块名，通常传入 __name__
+
+    Returns:
+        logging.Logger: 日志记录器
+    """
+    if not _configured:
+        configure()
+    return logging.getLogger(f'oms.{name}')
@@ -1,4 +1,6 @@
+import os
 import pymysql
+import log
 import setup
 import frontend
 import entity.department 
@@ -8,23 +10,18 @@ import entity.registration
 import entity.prescription 
 import entity.payment 
 import entity.drug 
+from config import DB_BACKEND, DB_CONFIG, SQLITE_CONFIG, POOL_CONFIG
+from db.backend import create_backend
 
 
 
-# 配置数据库连接
-config = {
-    'host': '124.70.86.207',
-    'port': 3306,
-    'user': 'u23371057', # 设置为你的用户名
-    'password': 'Aa727319', # 设置为你的密码
-    'database': 'try_db23371057', # 设置为你的数据库名
-    'charset': 'utf8mb4',
-    'cursorclass': pymysql.cursors.DictCursor, # 设置返回结果为字典类型
-    'autocommit': True  # 设置自动提交
-}
+# 命令行界面默认输出 INFO 级别日志，便于查看每步操作结果
+log.configure(level=os.environ.get('OMS_LOG_LEVEL', 'INFO'))
 
-# 建立连接
-connection = pymysql.connect(**config)
+# 建立连接池并借出一个连接供命令行界面使用
+backend = create_backend(DB_BACKEND, mysql_config=DB_CONFIG, sqlite_config=SQLITE_CONFIG)
+pool = backend.create_pool(**POOL_CONFIG)
+connection = pool.acquire()
 cursor = connection.cursor()
 
 # 可选：重置数据库，然后添加一些初始数据，第一次运行时没有数据库，需要先creat_table
@@ -41,4 +38,8 @@ entity.drug.add_drug(cursor, '头孢呋辛', 100, 9.5)
 entity.patient.register_patient(cursor, '张三', '男', '13812345678')
 entity.patient.register_patient(cursor, '王五', '男', '13856789123')
 
-frontend.start(cursor)
\ No newline at end of file
+try:
+    frontend.start(cursor)
+finally:
+    pool.release(connection)
+    pool.close()
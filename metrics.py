@@ -0,0 +1,252 @@
+"""
+运行指标（Prometheus 文本格式）
+
+只使用标准库实现计数器与直方图，通过 /metrics 以 Prometheus 文本格式输出：
+
+- oms_http_request_duration_seconds: 各路由的请求耗时直方图
+- oms_http_responses_total: 各路由按状态码统计的响应数
+- oms_db_statements_per_request: 每个请求执行的语句数直方图
+- oms_db_statements_total / oms_db_time_seconds_total / oms_db_errors_total: 按 SQL 指纹统计的执行次数、耗时与出错数
+- oms_db_rows_total: 各路由读取的行数
+- oms_pool_* / oms_query_cache_*: 连接池与查询缓存状态
+
+每个请求的统计先记录在请求自己的 QueryStats 中，请求结束时一次性合并，
+记录单条语句时不需要加锁。
+"""
+import threading
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """只增不减的计数器"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, tuple(zip(self.labelnames, key)), value
+
+
+class Histogram:
+    """累计分桶的直方图"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # 标签 -> [各桶计数..., 总和, 总数]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[index] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(entry)) for key, entry in self._values.items()]
+        for key, entry in items:
+            labels = tuple(zip(self.labelnames, key))
+            for bound, count in zip(self.buckets, entry):
+                yield f'{self.name}_bucket', labels + (('le', _format_value(float(bound))),), count
+            yield f'{self.name}_bucket', labels + (('le', '+Inf'),), entry[-1]
+            yield f'{self.name}_sum', labels, entry[-2]
+            yield f'{self.name}_count', labels, entry[-1]
+
+
+class Gauge:
+    """取值时由回调函数计算的指标"""
+
+    def __init__(self, name, documentation, callback, labelnames=(), kind='gauge'):
+        """
+        Args:
+            callback: 无参函数，返回 [(标签值元组, 数值), ...]
+            kind: 'gauge' 或 'counter'（回调返回的是累计值时）
+        """
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+
+    def samples(self):
+        for key, value in self.callback():
+            yield self.name, tuple(zip(self.labelnames, key)), value
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """
+        以 Prometheus 文本格式输出所有指标
+
+        Returns:
+            str: 指标文本
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+class AppMetrics:
+    """门诊系统的 Web 与数据库指标"""
+
+    def __init__(self, pool=None, cache=None, max_fingerprints=500):
+        """
+        Args:
+            pool: 连接池（可选），输出其统计信息
+            cache: 查询缓存（可选），输出其命中统计
+            max_fingerprints: 最多单独统计的 SQL 指纹数，超出的归入 "other"，避免标签无限增长
+        """
+        self.max_fingerprints = max_fingerprints
+        self._fingerprints = set()
+        self._lock = threading.Lock()
+
+        self.registry = Registry()
+        register = self.registry.register
+        self.request_duration = register(Histogram(
+            'oms_http_request_duration_seconds', '请求处理耗时（秒）', ('route', 'method')))
+        self.responses = register(Counter(
+            'oms_http_responses_total', '按状态码统计的响应数', ('route', 'method', 'status')))
+        self.exceptions = register(Counter(
+            'oms_http_exceptions_total', '请求处理中未捕获的异常数', ('route',)))
+        self.statements_per_request = register(Histogram(
+            'oms_db_statements_per_request', '每个请求执行的 SQL 语句数', ('route',), STATEMENT_BUCKETS))
+        self.db_time_per_request = register(Histogram(
+            'oms_db_time_per_request_seconds', '每个请求的数据库耗时（秒）', ('route',)))
+        self.rows = register(Counter(
+            'oms_db_rows_total', '读取的结果行数', ('route',)))
+        self.statements = register(Counter(
+            'oms_db_statements_total', '按 SQL 指纹统计的执行次数', ('fingerprint',)))
+        self.db_time = register(Counter(
+            'oms_db_time_seconds_total', '按 SQL 指纹统计的数据库耗时（秒）', ('fingerprint',)))
+        self.db_errors = register(Counter(
+            'oms_db_errors_total', '按 SQL 指纹统计的执行出错次数', ('fingerprint',)))
+
+        if pool is not None:
+            self._register_pool(pool)
+        if cache is not None:
+            self._register_cache(cache)
+
+    def _register_pool(self, pool):
+        def connections():
+            stats = pool.stats()
+            return [((state,), stats[state]) for state in ('idle', 'in_use', 'opened')]
+
+        def single(key):
+            return lambda: [((), pool.stats()[key])]
+
+        register = self.registry.register
+        register(Gauge('oms_pool_connections', '连接池中的连接数', connections, ('state',)))
+        register(Gauge('oms_pool_waiting', '正在等待连接的线程数', single('waiting')))
+        register(Gauge('oms_pool_checkouts_total', '累计借出连接次数', single('checkouts'), kind='counter'))
+        register(Gauge('oms_pool_timeouts_total', '累计等待连接超时次数', single('timeouts'), kind='counter'))
+        register(Gauge('oms_pool_wait_seconds_total', '累计等待连接时间（秒）', single('wait_time_total'),
+                       kind='counter'))
+
+    def _register_cache(self, cache):
+        def lookups():
+            stats = cache.stats()
+            return [(('hit',), stats['hits']), (('miss',), stats['misses'])]
+
+        register = self.registry.register
+        register(Gauge('oms_query_cache_lookups_total', '查询缓存的查找次数', lookups, ('result',), kind='counter'))
+        register(Gauge('oms_query_cache_evictions_total', '查询缓存淘汰的条目数',
+                       lambda: [((), cache.stats()['evictions'])], kind='counter'))
+        register(Gauge('oms_query_cache_entries', '查询缓存当前条目数', lambda: [((), cache.stats()['entries'])]))
+
+    def _fingerprint_label(self, fingerprint):
+        with self._lock:
+            if fingerprint in self._fingerprints:
+                return fingerprint
+            if len(self._fingerprints) < self.max_fingerprints:
+                self._fingerprints.add(fingerprint)
+                return fingerprint
+        return 'other'
+
+    def observe_request(self, route, method, status, duration, stats=None, exception=None):
+        """
+        记录一个请求
+
+        Args:
+            route: 路由规则（如 '/admin/drugs'）
+            method: 请求方法
+            status: 响应状态码
+            duration: 请求耗时（秒）
+            stats: 该请求的 QueryStats（可选）
+            exception: 请求处理中未捕获的异常（可选）
+        """
+        self.request_duration.observe(duration, route=route, method=method)
+        self.responses.inc(route=route, method=method, status=str(status))
+        if exception is not None:
+            self.exceptions.inc(route=route)
+        if stats is None:
+            return
+
+        self.statements_per_request.observe(stats.statements, route=route)
+        self.db_time_per_request.observe(stats.db_time, route=route)
+        if stats.rows:
+            self.rows.inc(stats.rows, route=route)
+        for fingerprint, (count, elapsed, errors) in stats.fingerprints().items():
+            label = self._fingerprint_label(fingerprint)
+            self.statements.inc(count, fingerprint=label)
+            self.db_time.inc(elapsed, fingerprint=label)
+            if errors:
+                self.db_errors.inc(errors, fingerprint=label)
+
+    def render(self):
+        return self.registry.render()
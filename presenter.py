@@ -0,0 +1,143 @@
+"""
+命令行表格输出
+
+entity 层的查询函数只返回数据，命令行界面（frontend.py）通过这里的函数把结果打印成表格。
+"""
+
+
+def print_patients(results):
+    """打印病人查询结果"""
+    print(f"\n🔍 查询到 {len(results)} 条病人记录")
+    print("-" * 90)
+    print(f"{'病历号':<8} {'姓名':<10} {'性别':<6} {'电话号码':<15} {'创建时间':<20}")
+    print("-" * 90)
+
+    if results:
+        for patient in results:
+            created_time = str(patient['created_at']) if patient['created_at'] else 'NULL'
+            print(f"{patient['patient_id']:<8} {patient['name']:<10} {patient['gender']:<6} "
+                  f"{patient['phone_number']:<15} {created_time:<20}")
+    else:
+        print("  没有找到匹配的病人记录")
+
+    print("-" * 90)
+
+
+def print_departments(results):
+    """打印科室查询结果"""
+    print(f"\n🔍 查询到 {len(results)} 条科室记录")
+    print("-" * 80)
+    print(f"{'科室编号':<10} {'科室名称':<20} {'创建时间':<20} {'更新时间':<20}")
+    print("-" * 80)
+
+    if results:
+        for dept in results:
+            created_time = str(dept['created_at']) if dept['created_at'] else 'NULL'
+            updated_time = str(dept['updated_at']) if dept['updated_at'] else 'NULL'
+            print(f"{dept['department_id']:<10} {dept['department_name']:<20} "
+                  f"{created_time:<20} {updated_time:<20}")
+    else:
+        print("  没有找到匹配的科室记录")
+
+    print("-" * 80)
+
+
+def print_doctors(results):
+    """打印医生查询结果"""
+    print(f"\n🔍 查询到 {len(results)} 条医生记录")
+    print("-" * 120)
+    print(f"{'工号':<8} {'姓名':<10} {'性别':<6} {'电话号码':<15} {'职称':<12} {'科室':<15} {'科室ID':<8} {'创建时间':<20}")
+    print("-" * 120)
+
+    if results:
+        for doctor in results:
+            dept_name = doctor['department_name'] if doctor['department_name'] else '未分配'
+            dept_id = doctor['department_id'] if doctor['department_id'] else 'NULL'
+            position = doctor['position'] if doctor['position'] else '未分配'
+            created_time = str(doctor['created_at']) if doctor['created_at'] else 'NULL'
+            print(f"{doctor['doctor_id']:<8} {doctor['name']:<10} {doctor['gender']:<6} "
+                  f"{doctor['phone_number']:<15} {position:<12} {dept_name:<15} {dept_id:<8} {created_time:<20}")
+    else:
+        print("  没有找到匹配的医生记录")
+
+    print("-" * 120)
+
+
+def print_drugs(results):
+    """打印药品查询结果"""
+    print(f"\n🔍 查询到 {len(results)} 条药品记录")
+    print("-" * 90)
+    print(f"{'药品编号':<8} {'药品名称':<20} {'库存数量':<10} {'单价':<10} {'创建时间':<20}")
+    print("-" * 90)
+
+    if results:
+        for drug in results:
+            created_time = str(drug['created_at']) if drug['created_at'] else 'NULL'
+            print(f"{drug['drug_id']:<8} {drug['drug_name']:<20} {drug['stored_quantity']:<10} "
+                  f"{drug['drug_price']:<10} {created_time:<20}")
+    else:
+        print("  没有找到匹配的药品记录")
+
+    print("-" * 90)
+
+
+def print_payments(results):
+    """打印缴费查询结果"""
+    print(f"\n🔍 查询到 {len(results)} 条缴费记录")
+    print("-" * 120)
+    print(f"{'缴费号':<10} {'病历号':<10} {'缴费价格':<12} {'缴费时间':<20} {'创建时间':<20}")
+    print("-" * 120)
+
+    if results:
+        for payment in results:
+            payment_time = str(payment['time']) if payment['time'] else 'NULL'
+            created_time = str(payment['created_at']) if payment['created_at'] else 'NULL'
+            print(f"{payment['payment_id']:<10} {payment['patient_id']:<10} {payment['price']:<12} "
+                  f"{payment_time:<20} {created_time:<20}")
+    else:
+        print("  没有找到匹配的缴费记录")
+
+    print("-" * 120)
+
+
+def print_registrations(results, unassigned_only=False):
+    """打印挂号查询结果"""
+    query_type = "未分配医生" if unassigned_only else "挂号"
+    print(f"\n🔍 查询到 {len(results)} 条{query_type}记录")
+    print("-" * 140)
+    print(f"{'挂号编号':<6} {'病历号':<5} {'病人姓名':<6} {'科室ID':<6} {'科室名称':<11} {'医生工号':<4} {'医生姓名':<6} {'缴费号':<7} {'创建时间':<16}")
+    print("-" * 140)
+
+    if results:
+        for reg in results:
+            patient_name = reg['patient_name'] if reg['patient_name'] else '未知病人'
+            doctor_name = reg['doctor_name'] if reg['doctor_name'] else '待分配'
+            dept_name = reg['department_name'] if reg['department_name'] else '未知科室'
+            doctor_id_val = reg['doctor_id'] if reg['doctor_id'] else 'NULL'
+            payment_id_val = reg['payment_id'] if reg['payment_id'] else 'NULL'
+            created_time = str(reg['created_at']) if reg['created_at'] else 'NULL'
+            print(f"{reg['registration_id']:<10} {reg['patient_id']:<8} {patient_name:<10} "
+                  f"{reg['department_id']:<8} {dept_name:<15} {doctor_id_val:<8} {doctor_name:<10} "
+                  f"{payment_id_val:<10} {created_time:<20}")
+    else:
+        print(f"  没有找到匹配的{query_type}记录")
+
+    print("-" * 140)
+
+
+def print_prescriptions(results):
+    """打印处方查询结果"""
+    print(f"\n🔍 查询到 {len(results)} 条处方记录")
+    print("-" * 100)
+    print(f"{'处方号':<10} {'挂号号':<10} {'药品ID':<8} {'数量':<8} {'缴费号':<10} {'创建时间':<20}")
+    print("-" * 100)
+
+    if results:
+        for pre in results:
+            created_time = str(pre['created_at']) if pre['created_at'] else 'NULL'
+            print(f"{pre['prescription_id']:<10} {pre['registration_id']:<10} {pre['drug_id']:<8} "
+                  f"{pre['quantity']:<8} {pre['payment_id']:<10} {created_time:<20}")
+    else:
+        print("  没有找到匹配的处方记录")
+
+    print("-" * 100)
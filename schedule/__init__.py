@@ -0,0 +1,3 @@
+"""
+挂号调度（自动分配医生、挂号状态回填、挂号工作列表读模型等）
+"""
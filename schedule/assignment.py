@@ -0,0 +1,197 @@
+"""
+挂号自动分配医生（负载均衡）
+
+每个科室在内存中维护一个医生小顶堆，堆顶是“再分配一个挂号后负担最轻”的医生：
+
+    score = (当日待诊（assigned 状态）的挂号数 + 1) / 职称权重
+
+新挂号从所属科室的堆顶取医生并把该医生的负担加一，时间复杂度 O(log n)。
+堆中过期的条目（医生负担已变化、调走或被删除）在出堆时按版本号丢弃。
+
+手工受理、开具处方等在其他地方发生的变化不逐一通知调度器，而是每 reconcile_interval 秒
+按挂号表重新统计一次各医生的负担（对账），多进程部署时各进程也由此保持大致一致。
+"""
+import heapq
+import threading
+import time
+from datetime import datetime
+
+import entity.registration as registration_module
+from log import get_logger
+
+logger = get_logger(__name__)
+
+
+class DoctorAssigner:
+    """按科室负载均衡地为新挂号分配医生"""
+
+    def __init__(self, reconcile_interval=60, position_weights=None):
+        """
+        Args:
+            reconcile_interval: 按挂号表对账的间隔（秒）
+            position_weights: 职称 -> 权重（默认 1.0），权重越大分到的挂号越多，
+                              如 {'主任医师': 0.5} 表示主任医师分到的挂号约为其他医生的一半
+        """
+        self.reconcile_interval = reconcile_interval
+        self.position_weights = dict(position_weights or {})
+        self._doctors = {}  # 医生工号 -> {'department_id', 'weight', 'workload', 'version'}
+        self._heaps = {}    # 科室编号 -> [(score, 医生工号, version), ...]
+        self._reconciled_at = None
+        self._lock = threading.Lock()
+
+    def configure(self, reconcile_interval=None, position_weights=None):
+        """修改配置，下次分配前重新对账"""
+        if reconcile_interval is not None:
+            self.reconcile_interval = reconcile_interval
+        if position_weights is not None:
+            self.position_weights = dict(position_weights)
+        self.clear()
+
+    def clear(self):
+        """清空内存状态，下次分配前重新对账"""
+        with self._lock:
+            self._doctors.clear()
+            self._heaps.clear()
+            self._reconciled_at = None
+
+    @staticmethod
+    def _score(doctor):
+        return (doctor['workload'] + 1) / doctor['weight']
+
+    def _push(self, doctor_id, doctor):
+        heap = self._heaps.setdefault(doctor['department_id'], [])
+        heapq.heappush(heap, (self._score(doctor), doctor_id, doctor['version']))
+
+    def reconcile(self, cursor):
+        """
+        按挂号表重新统计各医生当日待诊的挂号数（不含预约在以后日期的挂号），重建所有科室的堆（走 (doctor_id, status) 索引）
+
+        Args:
+            cursor: 数据库游标
+        """
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        sql = """
+        SELECT d.doctor_id, d.department_id, d.position, COUNT(r.registration_id) AS workload
+        FROM doctor d
+        LEFT JOIN registration r ON r.doctor_id = d.doctor_id AND r.status = 'assigned' AND r.created_at >= %s
+             AND (r.slot_date IS NULL OR r.slot_date <= %s)
+        WHERE d.department_id IS NOT NULL
+        GROUP BY d.doctor_id, d.department_id, d.position
+        """
+        cursor.execute(sql, (today, today.date()))
+        rows = cursor.fetchall()
+
+        doctors = {row['doctor_id']: {
+            'department_id': row['department_id'],
+            'weight': float(self.position_weights.get(row['position'], 1.0)) or 1.0,
+            'workload': row['workload'],
+            'version': 0,
+        } for row in rows}
+        heaps = {}
+        for doctor_id, doctor in doctors.items():
+            heaps.setdefault(doctor['department_id'], []).append((self._score(doctor), doctor_id, 0))
+        for heap in heaps.values():
+            heapq.heapify(heap)
+
+        with self._lock:
+            self._doctors = doctors
+            self._heaps = heaps
+            self._reconciled_at = time.monotonic()
+        logger.debug("挂号分配对账完成", extra={'doctor_count': len(doctors)})
+
+    def _stale(self):
+        if self._reconciled_at is None:
+            return True
+        return time.monotonic() - self._reconciled_at > self.reconcile_interval
+
+    def pick(self, department_id):
+        """
+        取出科室中负担最轻的医生并把其负担加一（不访问数据库）
+
+        Args:
+            department_id: 科室编号
+
+        Returns:
+            int: 医生工号，科室没有医生时返回 None
+        """
+        with self._lock:
+            heap = self._heaps.get(department_id)
+            while heap:
+                _, doctor_id, version = heap[0]
+                doctor = self._doctors.get(doctor_id)
+                if doctor is None or doctor['version'] != version or doctor['department_id'] != department_id:
+                    heapq.heappop(heap)
+                    continue
+                doctor['workload'] += 1
+                doctor['version'] += 1
+                heapq.heapreplace(heap, (self._score(doctor), doctor_id, doctor['version']))
+                return doctor_id
+            return None
+
+    def release(self, doctor_id):
+        """撤销一次 pick（分配未能写入数据库时调用）"""
+        with self._lock:
+            doctor = self._doctors.get(doctor_id)
+            if doctor is not None and doctor['workload'] > 0:
+                doctor['workload'] -= 1
+                doctor['version'] += 1
+                self._push(doctor_id, doctor)
+
+    def assign(self, cursor, registration_id, department_id, price):
+        """
+        为新挂号自动分配医生并生成挂号费缴费单
+
+        Args:
+            cursor: 数据库游标
+            registration_id: 挂号编号
+            department_id: 挂号科室编号
+            price: 挂号费
+
+        Returns:
+            int: 分配的医生工号；科室没有医生或分配失败时返回 None（挂号留待管理员手工受理）
+        """
+        try:
+            if self._stale():
+                self.reconcile(cursor)
+            doctor_id = self.pick(department_id)
+            if doctor_id is None:
+                logger.warning("自动分配失败：科室没有可分配的医生", extra={'department_id': department_id})
+                return None
+
+            results = registration_module.process_registrations(cursor, [(registration_id, doctor_id)], price)
+            status = results[0]['status'] if results else None
+            if status != 'assigned':
+                # 医生可能已调离科室等，撤销本次计数并在下次分配前重新对账
+                self.release(doctor_id)
+                self._reconciled_at = None
+                logger.warning("自动分配失败", extra={'registration_id': registration_id, 'doctor_id': doctor_id,
+                                                  'status': status})
+                return None
+
+            logger.info("挂号已自动分配医生", extra={'registration_id': registration_id, 'doctor_id': doctor_id})
+            return doctor_id
+
+        except Exception as e:
+            logger.error("自动分配医生失败", extra={'error': e})
+            return None
+
+    def stats(self):
+        """
+        Returns:
+            dict: 科室编号 -> [{doctor_id, workload, weight}, ...]（按负担升序）与距上次对账的秒数
+        """
+        with self._lock:
+            departments = {}
+            for doctor_id, doctor in self._doctors.items():
+                departments.setdefault(doctor['department_id'], []).append(
+                    {'doctor_id': doctor_id, 'workload': doctor['workload'], 'weight': doctor['weight']})
+            for doctors in departments.values():
+                doctors.sort(key=lambda item: (item['workload'], item['doctor_id']))
+            return {
+                'departments': departments,
+                'age': None if self._reconciled_at is None else time.monotonic() - self._reconciled_at,
+            }
+
+
+# 进程内共享的分配器，由 app.py 按 config.ASSIGNMENT_CONFIG 配置
+doctor_assigner = DoctorAssigner()
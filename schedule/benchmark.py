@@ -0,0 +1,102 @@
+"""
+挂号自动分配的吞吐量测试
+
+在临时的 SQLite 数据库中建表并生成科室、医生和病人，然后分两步测量：
+
+1. 只在内存中从堆里取医生（pick），得到调度本身的吞吐量；
+2. 端到端地创建挂号并自动分配（create_registration + assign，包括写挂号与缴费单），
+   得到每分钟可处理的挂号数，并检查各科室医生负担是否均衡。
+
+    python -m schedule.benchmark --departments 10 --doctors 200 --registrations 5000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import entity.department as department_module
+import entity.doctor as doctor_module
+import entity.patient as patient_module
+import entity.registration as registration_module
+import setup
+from db.backend import create_backend
+from schedule.assignment import DoctorAssigner
+
+
+def _seed(cursor, departments, doctors, patients):
+    setup.create_table(cursor)
+    department_ids = [department_module.create_department(cursor, f"科室{index}") for index in range(departments)]
+    for index in range(doctors):
+        doctor_module.register_doctor(cursor, f"医生{index}", '男', '13800000000', '主治医师',
+                                      department_ids[index % departments])
+    patient_ids = [patient_module.register_patient(cursor, f"病人{index}", '女', '13900000000')
+                   for index in range(patients)]
+    return department_ids, patient_ids
+
+
+def run(departments=10, doctors=200, registrations=5000, picks=200000, database=None):
+    """
+    执行吞吐量测试
+
+    Returns:
+        dict: pick_per_second、registrations_per_minute 与各科室医生负担的最大差值 max_spread
+    """
+    path = database or os.path.join(tempfile.mkdtemp(prefix='oms-bench-'), 'bench.db')
+    connection = create_backend('sqlite', sqlite_config={'database': path}).connect()
+    try:
+        cursor = connection.cursor()
+        department_ids, patient_ids = _seed(cursor, departments, doctors, min(registrations, 1000))
+
+        # 1. 内存中取医生
+        assigner = DoctorAssigner(reconcile_interval=3600)
+        assigner.reconcile(cursor)
+        start = time.perf_counter()
+        for index in range(picks):
+            assigner.pick(department_ids[index % departments])
+        pick_elapsed = time.perf_counter() - start
+
+        # 2. 端到端创建挂号并自动分配
+        assigner.reconcile(cursor)
+        rng = random.Random(0)
+        start = time.perf_counter()
+        assigned = 0
+        for _ in range(registrations):
+            department_id = rng.choice(department_ids)
+            registration_id = registration_module.create_registration(cursor, rng.choice(patient_ids), department_id)
+            if assigner.assign(cursor, registration_id, department_id, 50):
+                assigned += 1
+        elapsed = time.perf_counter() - start
+
+        # 对账后各科室医生负担的最大差值（均衡时不超过 1）
+        assigner.reconcile(cursor)
+        spread = max((max(item['workload'] for item in items) - min(item['workload'] for item in items))
+                     for items in assigner.stats()['departments'].values())
+        return {
+            'pick_per_second': picks / pick_elapsed,
+            'registrations_per_minute': registrations / elapsed * 60,
+            'assigned': assigned,
+            'max_spread': spread,
+        }
+    finally:
+        connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='挂号自动分配吞吐量测试（SQLite）')
+    parser.add_argument('--departments', type=int, default=10, help='科室数')
+    parser.add_argument('--doctors', type=int, default=200, help='医生数')
+    parser.add_argument('--registrations', type=int, default=5000, help='端到端测试的挂号数')
+    parser.add_argument('--picks', type=int, default=200000, help='内存取医生的次数')
+    parser.add_argument('--database', help='SQLite 数据库文件（默认使用临时文件）')
+    args = parser.parse_args(argv)
+
+    result = run(args.departments, args.doctors, args.registrations, args.picks, args.database)
+    print(f"内存取医生: {result['pick_per_second']:,.0f} 次/秒")
+    print(f"创建并自动分配挂号: {result['registrations_per_minute']:,.0f} 个/分钟"
+          f"（成功分配 {result['assigned']}/{args.registrations}）")
+    print(f"各科室医生负担最大差值: {result['max_spread']}")
+
+
+if __name__ == '__main__':
+    main()
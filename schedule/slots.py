@@ -0,0 +1,238 @@
+"""
+预约时段与空闲时段查找
+
+每位医生按星期几设置出诊时段模板（doctor_slot_template）：第一个时段的开始时间、每个时段的分钟数与时段数。
+某天第一次有人预约时按模板生成该医生当天的出诊记录（doctor_slot_day），已预约的时段保存为一个整数位图
+booked：第 i 位为 1 表示第 i 个时段已被预约。预约即一条条件更新（比较并设置）：
+
+    UPDATE doctor_slot_day SET booked = booked | 位 WHERE ... AND (booked & 位) = 0
+
+两个请求同时预约同一时段时只有一个能更新成功，无需加锁。
+
+SlotIndex 在进程内保存全部模板和未来 horizon_days 天已生成的出诊记录，“某科室最早的空闲时段”
+只在内存中对每位医生的空闲位图取最低位，不访问数据库。本进程的预约成功后增量更新；
+多进程部署时其他进程的预约最迟在 reload_interval 秒后可见，在此之前选中的时段若已被占用，
+预约时的条件更新会失败并标记该时段，调用方换下一个空闲时段重试即可。
+
+升级已有数据库时执行一次（补建时段表与挂号表的预约列）：
+
+    python -m schedule.slots upgrade
+"""
+import argparse
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+MAX_SLOTS = 63  # booked 为有符号 BIGINT，最多使用 63 位
+
+
+def slot_start(slot_date, start_minute, slot_minutes, slot_index):
+    """时段的开始时间"""
+    minute = start_minute + slot_index * slot_minutes
+    return datetime.combine(slot_date, datetime.min.time()) + timedelta(minutes=minute)
+
+
+def _first_free(layout, booked, after_minute=None):
+    """
+    最早的空闲时段序号
+
+    Args:
+        layout: (start_minute, slot_minutes, slot_count)
+        booked: 已预约位图
+        after_minute: 只考虑开始时间不早于当天该分钟的时段（可选）
+
+    Returns:
+        int: 时段序号，没有空闲时段时返回 None
+    """
+    start_minute, slot_minutes, slot_count = layout
+    free = ((1 << slot_count) - 1) & ~booked
+    if after_minute is not None and after_minute > start_minute:
+        skip = -(-(after_minute - start_minute) // slot_minutes)  # 向上取整
+        free &= ~((1 << skip) - 1)
+    if not free:
+        return None
+    return (free & -free).bit_length() - 1
+
+
+class SlotIndex:
+    """进程内的医生出诊时段与空闲位图"""
+
+    def __init__(self, reload_interval=60, horizon_days=14):
+        """
+        Args:
+            reload_interval: 整体重新加载的间隔（秒）
+            horizon_days: 可预约的天数（含今天）
+        """
+        self.reload_interval = reload_interval
+        self.horizon_days = horizon_days
+        self._templates = {}     # 科室编号 -> {医生工号: {星期几: (start_minute, slot_minutes, slot_count)}}
+        self._days = {}          # (医生工号, 日期) -> [(start_minute, slot_minutes, slot_count), booked]
+        self._loaded_at = None
+        self._loaded_on = None   # 加载时的日期，跨天后重新加载
+        self._lock = threading.Lock()
+
+    def configure(self, reload_interval=None, horizon_days=None):
+        """修改配置并清空索引（下次使用时重新加载）"""
+        if reload_interval is not None:
+            self.reload_interval = reload_interval
+        if horizon_days is not None:
+            self.horizon_days = horizon_days
+        self.clear()
+
+    def clear(self):
+        """清空索引，下次查询时从数据库重新加载（修改模板或医生科室后调用）"""
+        with self._lock:
+            self._templates.clear()
+            self._days.clear()
+            self._loaded_at = None
+
+    def _stale(self):
+        if self._loaded_at is None or self._loaded_on != date.today():
+            return True
+        return time.monotonic() - self._loaded_at > self.reload_interval
+
+    def load(self, cursor):
+        """从模板表与出诊日表重新加载（只加载属于某个科室的医生和今天起 horizon_days 天内的出诊记录）"""
+        today = date.today()
+        cursor.execute("""
+        SELECT t.doctor_id, d.department_id, t.weekday, t.start_minute, t.slot_minutes, t.slot_count
+        FROM doctor_slot_template t JOIN doctor d ON d.doctor_id = t.doctor_id
+        WHERE d.department_id IS NOT NULL
+        """)
+        templates = {}
+        for row in cursor.fetchall():
+            templates.setdefault(row['department_id'], {}).setdefault(row['doctor_id'], {})[row['weekday']] = (
+                row['start_minute'], row['slot_minutes'], row['slot_count'])
+
+        cursor.execute("""
+        SELECT doctor_id, slot_date, start_minute, slot_minutes, slot_count, booked
+        FROM doctor_slot_day WHERE slot_date >= %s AND slot_date < %s
+        """, (today, today + timedelta(days=self.horizon_days)))
+        days = {(row['doctor_id'], row['slot_date']): [(row['start_minute'], row['slot_minutes'], row['slot_count']),
+                                                       row['booked']]
+                for row in cursor.fetchall()}
+
+        with self._lock:
+            self._templates = templates
+            self._days = days
+            self._loaded_at = time.monotonic()
+            self._loaded_on = today
+
+    def _layout(self, department_id, doctor_id, slot_date):
+        """医生某天的时段安排与已预约位图，当天不出诊时返回 (None, 0)"""
+        day = self._days.get((doctor_id, slot_date))
+        if day is not None:
+            return day[0], day[1]
+        weekdays = self._templates.get(department_id, {}).get(doctor_id, {})
+        return weekdays.get(slot_date.weekday()), 0
+
+    def next_free(self, cursor, department_id, after=None, exclude=()):
+        """
+        查找科室最早的空闲时段（只在内存中计算）
+
+        Args:
+            cursor: 数据库游标（索引尚未加载或需要重新加载时使用）
+            department_id: 科室编号
+            after: 只考虑开始时间不早于该时间的时段（默认当前时间）
+            exclude: 需要跳过的 (医生工号, 日期, 时段序号)，如刚预约失败的时段
+
+        Returns:
+            dict: doctor_id、slot_date、slot_index、start（开始时间）；未来 horizon_days 天内没有空闲时段时返回 None
+        """
+        if self._stale():
+            self.load(cursor)
+        after = after or datetime.now()
+        first_day = max(after.date(), date.today())
+
+        with self._lock:
+            doctors = self._templates.get(department_id, {})
+            for offset in range((date.today() + timedelta(days=self.horizon_days) - first_day).days):
+                slot_date = first_day + timedelta(days=offset)
+                after_minute = after.hour * 60 + after.minute if slot_date == after.date() else None
+                best = None
+                for doctor_id in doctors:
+                    layout, booked = self._layout(department_id, doctor_id, slot_date)
+                    if layout is None:
+                        continue
+                    for skipped_doctor, skipped_date, skipped_index in exclude:
+                        if skipped_doctor == doctor_id and skipped_date == slot_date:
+                            booked |= 1 << skipped_index
+                    slot_index = _first_free(layout, booked, after_minute)
+                    if slot_index is None:
+                        continue
+                    start = slot_start(slot_date, layout[0], layout[1], slot_index)
+                    if best is None or (start, doctor_id) < (best['start'], best['doctor_id']):
+                        best = {'doctor_id': doctor_id, 'slot_date': slot_date, 'slot_index': slot_index,
+                                'start': start}
+                if best:
+                    return best
+        return None
+
+    def mark_booked(self, doctor_id, slot_date, slot_index, layout=None):
+        """
+        记录一个已预约的时段（本进程预约成功，或条件更新失败说明已被其他进程预约）
+
+        Args:
+            layout: (start_minute, slot_minutes, slot_count)，出诊记录尚未加载时使用
+        """
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            day = self._days.get((doctor_id, slot_date))
+            if day is None:
+                if layout is None:
+                    return
+                day = self._days[(doctor_id, slot_date)] = [tuple(layout), 0]
+            day[1] |= 1 << slot_index
+
+    def stats(self):
+        """
+        Returns:
+            dict: 有模板的医生数、已加载的出诊记录数与距上次加载的秒数
+        """
+        with self._lock:
+            return {
+                'doctors': sum(len(doctors) for doctors in self._templates.values()),
+                'days': len(self._days),
+                'age': None if self._loaded_at is None else time.monotonic() - self._loaded_at,
+            }
+
+
+# 进程内共享的时段索引，由 app.py 按 config.SLOT_CONFIG 配置
+slot_index = SlotIndex()
+
+
+def _ensure_columns(cursor):
+    """升级前的数据库补建挂号表的预约列与唯一索引"""
+    try:
+        cursor.execute("SELECT slot_date, slot_index FROM registration LIMIT 1")
+        cursor.fetchall()
+        return
+    except Exception:
+        pass
+    cursor.execute("ALTER TABLE registration ADD COLUMN slot_date DATE NULL")
+    cursor.execute("ALTER TABLE registration ADD COLUMN slot_index TINYINT NULL")
+    cursor.execute("CREATE UNIQUE INDEX uk_registration_slot ON registration (doctor_id, slot_date, slot_index)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='预约时段')
+    parser.add_argument('command', choices=('upgrade',), help='upgrade: 补建时段表与挂号表的预约列')
+    parser.parse_args(argv)
+
+    import setup
+    from config import DB_BACKEND, DB_CONFIG, SQLITE_CONFIG
+    from db.backend import create_backend
+
+    connection = create_backend(DB_BACKEND, mysql_config=DB_CONFIG, sqlite_config=SQLITE_CONFIG).connect()
+    try:
+        cursor = connection.cursor()
+        _ensure_columns(cursor)
+        setup.create_table(cursor)
+        print("预约时段表与挂号预约列已就绪")
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+挂号状态回填
+
+挂号状态（registration.status）由 entity 层在写入时维护：
+
+    created  --分配医生-->  assigned  --开具处方-->  prescribed  --费用缴清-->  paid  --结束就诊-->  closed
+                              |                                        ^
+                              +--------未开处方，挂号费缴清-------------+
+
+升级前的数据库没有状态列，执行一次回填，按医生、处方和缴费记录推算每个挂号当前的状态
+（closed 无法推算，已是 closed 的挂号保持不变）：
+
+    python -m schedule.status backfill
+"""
+import argparse
+
+from db.transaction import transaction
+
+BACKFILL_BATCH_SIZE = 1000
+
+_BACKFILL = """
+UPDATE registration
+SET status = CASE
+    WHEN doctor_id IS NULL THEN 'created'
+    WHEN EXISTS (SELECT 1 FROM prescription p WHERE p.registration_id = registration.registration_id)
+        THEN CASE
+            WHEN EXISTS (SELECT 1 FROM payment y WHERE y.payment_id = registration.payment_id AND y.time IS NULL)
+              OR EXISTS (SELECT 1 FROM prescription p JOIN payment y ON y.payment_id = p.payment_id
+                         WHERE p.registration_id = registration.registration_id AND y.time IS NULL)
+                THEN 'prescribed'
+            ELSE 'paid'
+        END
+    WHEN EXISTS (SELECT 1 FROM payment y WHERE y.payment_id = registration.payment_id AND y.time IS NOT NULL)
+        THEN 'paid'
+    ELSE 'assigned'
+END
+WHERE registration_id > %s AND registration_id <= %s AND status <> 'closed'
+"""
+
+
+def _ensure_column(cursor):
+    """升级前的数据库补建 status 列与待办队列索引"""
+    try:
+        cursor.execute("SELECT status FROM registration LIMIT 1")
+        cursor.fetchall()
+        return
+    except Exception:
+        pass
+    cursor.execute("ALTER TABLE registration ADD COLUMN status "
+                   "ENUM('created', 'assigned', 'prescribed', 'paid', 'closed') NOT NULL DEFAULT 'created'")
+    cursor.execute("CREATE INDEX idx_registration_status_department "
+                   "ON registration (status, department_id, registration_id)")
+    cursor.execute("CREATE INDEX idx_registration_doctor_status ON registration (doctor_id, status)")
+
+
+def backfill(cursor):
+    """
+    按医生、处方与缴费记录重新推算挂号状态，按挂号编号分批，每批一个事务
+
+    Args:
+        cursor: 数据库游标
+
+    Returns:
+        int: 更新的挂号数
+    """
+    _ensure_column(cursor)
+    cursor.execute("SELECT MAX(registration_id) AS max_id FROM registration")
+    max_id = cursor.fetchone()['max_id'] or 0
+    count = 0
+    for start in range(0, max_id, BACKFILL_BATCH_SIZE):
+        with transaction(cursor):
+            cursor.execute(_BACKFILL, (start, start + BACKFILL_BATCH_SIZE))
+            count += cursor.rowcount
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='挂号状态回填')
+    parser.add_argument('command', choices=('backfill',), help='backfill: 按已有记录推算并写入挂号状态')
+    parser.parse_args(argv)
+
+    from config import DB_BACKEND, DB_CONFIG, SQLITE_CONFIG
+    from db.backend import create_backend
+
+    connection = create_backend(DB_BACKEND, mysql_config=DB_CONFIG, sqlite_config=SQLITE_CONFIG).connect()
+    try:
+        print(f"已更新 {backfill(connection.cursor())} 个挂号的状态")
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+挂号工作列表（读模型）
+
+医生待办、病人挂号查询与未受理挂号页面显示的列（含病人姓名、医生姓名与科室名称）
+预先保存在 registration_view 表中，每个挂号一行。读取时不再关联病人、医生和科室表，
+每个页面都是一次索引范围扫描：
+
+    医生待办    WHERE doctor_id = ? AND doctor_open = 1      (doctor_id, doctor_open, registration_id)
+    病人挂号    WHERE patient_id = ?                         (patient_id, registration_id)
+    未受理挂号  WHERE status = 'created' [AND department_id = ?]  (status, department_id, registration_id)
+
+entity 层修改挂号（创建、分配医生、预约、开具处方、缴费、结束就诊）时在同一事务中调用
+project_registrations，用一条 REPLACE INTO ... SELECT 按挂号编号重新生成对应的行；
+病人或科室改名时同步更新姓名列。读模型与挂号表一起提交，不会读到旧状态。
+
+升级已有数据库（或回填挂号状态、预约列）后从挂号表整体重建，该命令同时补建病人概览所需的
+版本号表与处方单价列：
+
+    python -m schedule.worklist rebuild
+"""
+import argparse
+
+from db.transaction import transaction
+
+REBUILD_BATCH_SIZE = 1000
+
+# 按挂号表重新生成读模型中的行，{where} 为挂号表（别名 r）上的条件
+_PROJECT = """
+REPLACE INTO registration_view (registration_id, patient_id, patient_name, department_id, department_name,
+                                doctor_id, doctor_name, payment_id, status, doctor_open,
+                                slot_date, slot_index, created_at)
+SELECT r.registration_id, r.patient_id, p.name, r.department_id, dept.department_name,
+       r.doctor_id, d.name, r.payment_id, r.status,
+       CASE WHEN r.doctor_id IS NOT NULL AND r.status IN ('assigned', 'prescribed', 'paid') THEN 1 ELSE 0 END,
+       r.slot_date, r.slot_index, r.created_at
+FROM registration r
+JOIN patient p ON p.patient_id = r.patient_id
+JOIN department dept ON dept.department_id = r.department_id
+LEFT JOIN doctor d ON d.doctor_id = r.doctor_id
+WHERE {where}
+"""
+
+
+def project_registrations(cursor, registration_ids):
+    """
+    按挂号表重新生成这些挂号在读模型中的行，应与挂号的写入在同一事务中调用
+
+    Args:
+        cursor: 数据库游标
+        registration_ids: 挂号编号列表
+    """
+    registration_ids = list(registration_ids)
+    if not registration_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(registration_ids))
+    cursor.execute(_PROJECT.format(where=f"r.registration_id IN ({placeholders})"), registration_ids)
+
+
+def rename_patient(cursor, patient_id, name):
+    """病人改名后同步读模型中的病人姓名"""
+    cursor.execute("UPDATE registration_view SET patient_name = %s WHERE patient_id = %s", (name, patient_id))
+
+
+def rename_department(cursor, department_id, department_name):
+    """科室改名后同步读模型中的科室名称"""
+    cursor.execute("UPDATE registration_view SET department_name = %s WHERE department_id = %s",
+                   (department_name, department_id))
+
+
+def rebuild(cursor):
+    """
+    按挂号表重建读模型
+
+    按挂号编号分批，每批在一个事务中替换该区间内的行，重建期间各页面仍可正常读取。
+
+    Args:
+        cursor: 数据库游标
+
+    Returns:
+        int: 重建的挂号数
+    """
+    cursor.execute("SELECT MAX(registration_id) AS max_id FROM registration")
+    max_id = cursor.fetchone()['max_id'] or 0
+    for start in range(0, max_id, REBUILD_BATCH_SIZE):
+        with transaction(cursor):
+            cursor.execute(_PROJECT.format(where="r.registration_id > %s AND r.registration_id <= %s"),
+                           (start, start + REBUILD_BATCH_SIZE))
+    # 删除挂号表中已不存在的挂号
+    cursor.execute("""
+    DELETE FROM registration_view
+    WHERE NOT EXISTS (SELECT 1 FROM registration r WHERE r.registration_id = registration_view.registration_id)
+    """)
+    cursor.execute("SELECT COUNT(*) AS count FROM registration_view")
+    return cursor.fetchone()['count']
+
+
+def _ensure_unit_price(cursor):
+    """升级前的数据库补建处方表的单价列（已有处方留空，概览按药品当前单价显示）"""
+    try:
+        cursor.execute("SELECT unit_price FROM prescription LIMIT 1")
+        cursor.fetchall()
+        return
+    except Exception:
+        pass
+    cursor.execute("ALTER TABLE prescription ADD COLUMN unit_price DECIMAL(10,2) NULL")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='挂号工作列表（读模型）')
+    parser.add_argument('command', choices=('rebuild',), help='rebuild: 按挂号表重建读模型')
+    parser.parse_args(argv)
+
+    import setup
+    from config import DB_BACKEND, DB_CONFIG, SQLITE_CONFIG
+    from db.backend import create_backend
+
+    connection = create_backend(DB_BACKEND, mysql_config=DB_CONFIG, sqlite_config=SQLITE_CONFIG).connect()
+    try:
+        cursor = connection.cursor()
+        setup.create_table(cursor)  # 升级前的数据库补建读模型表与概览版本号表（已存在时跳过）
+        _ensure_unit_price(cursor)
+        print(f"已重建 {rebuild(cursor)} 个挂号")
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
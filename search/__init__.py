@@ -0,0 +1,3 @@
+"""
+检索索引（姓名 n-gram 与拼音、电话尾号），供 entity 层的模糊查询使用
+"""
@@ -0,0 +1,171 @@
+"""
+药品名称联想（自动补全）
+
+DrugIndex 在进程内保存全部药品的名称、单价与库存，以及按字典序排列的检索键：
+
+- 药品名称及其每个后缀（"阿司匹林" -> 阿司匹林、司匹林、匹林、林），输入名称中间的字也能匹配
+- 拼音全拼与首字母（asipilin、aspl）
+
+联想查询在检索键上二分查找前缀，不访问数据库。add_drug、update_drug_info 与开具处方成功后
+增量更新索引；多进程部署时其他进程的修改最迟在 reload_interval 秒后随整体重新加载可见。
+"""
+import bisect
+import threading
+import time
+from decimal import Decimal
+
+from search import pinyin
+
+# 检索键的排序等级：越小越靠前
+RANK_NAME = 0       # 名称前缀
+RANK_PINYIN = 1     # 拼音或首字母前缀
+RANK_INFIX = 2      # 名称中间的字
+
+_FIELDS = ('drug_id', 'drug_name', 'drug_price', 'stored_quantity')
+
+
+def _normalize(text):
+    return ''.join((text or '').lower().split())
+
+
+def _coerce(field, value):
+    # 表单提交的是字符串，与数据库读出的类型保持一致
+    if field == 'drug_price':
+        return Decimal(str(value))
+    if field == 'stored_quantity':
+        return int(value)
+    return value
+
+
+def drug_keys(drug_name):
+    """
+    计算药品名称的检索键
+
+    Returns:
+        set: {(检索键, 排序等级), ...}
+    """
+    name = _normalize(drug_name)
+    if not name:
+        return set()
+    keys = {(name, RANK_NAME)}
+    keys.update((name[i:], RANK_INFIX) for i in range(1, len(name)))
+    full = pinyin.to_pinyin(drug_name)
+    if full:
+        keys.add((full, RANK_PINYIN))
+        keys.add((pinyin.initials(drug_name), RANK_PINYIN))
+    return keys
+
+
+class DrugIndex:
+    """进程内的药品名称前缀索引"""
+
+    def __init__(self, reload_interval=300):
+        """
+        Args:
+            reload_interval: 整体重新加载的间隔（秒），为 0 时只在首次使用时加载
+        """
+        self.reload_interval = reload_interval
+        self._drugs = {}       # 药品编号 -> {drug_id, drug_name, drug_price, stored_quantity}
+        self._keys = []        # 按字典序排列的 (检索键, 排序等级, 药品编号)
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def configure(self, reload_interval=None):
+        """修改配置并清空索引（下次使用时重新加载）"""
+        if reload_interval is not None:
+            self.reload_interval = reload_interval
+        self.clear()
+
+    def clear(self):
+        """清空索引，下次查询时从数据库重新加载"""
+        with self._lock:
+            self._drugs.clear()
+            self._keys = []
+            self._loaded_at = None
+
+    def _stale(self):
+        if self._loaded_at is None:
+            return True
+        return bool(self.reload_interval) and time.monotonic() - self._loaded_at > self.reload_interval
+
+    def load(self, cursor):
+        """从药品表重新加载全部药品"""
+        cursor.execute("SELECT drug_id, drug_name, drug_price, stored_quantity FROM drug")
+        drugs = {row['drug_id']: {field: row[field] for field in _FIELDS} for row in cursor.fetchall()}
+        keys = sorted((key, rank, drug_id) for drug_id, drug in drugs.items()
+                      for key, rank in drug_keys(drug['drug_name']))
+        with self._lock:
+            self._drugs = drugs
+            self._keys = keys
+            self._loaded_at = time.monotonic()
+
+    def upsert(self, drug_id, drug_name, drug_price, stored_quantity):
+        """新增或替换一种药品（已加载时增量更新，未加载时等下次整体加载）"""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            if drug_id in self._drugs:
+                self._keys = [item for item in self._keys if item[2] != drug_id]
+            self._drugs[drug_id] = {'drug_id': drug_id, 'drug_name': drug_name,
+                                    'drug_price': _coerce('drug_price', drug_price),
+                                    'stored_quantity': _coerce('stored_quantity', stored_quantity)}
+            for key, rank in drug_keys(drug_name):
+                bisect.insort(self._keys, (key, rank, drug_id))
+
+    def update(self, drug_id, **fields):
+        """更新药品的单价或库存（名称不变，检索键无需调整）"""
+        with self._lock:
+            drug = self._drugs.get(drug_id)
+            if drug is not None:
+                drug.update((field, _coerce(field, value)) for field, value in fields.items()
+                            if field in ('drug_price', 'stored_quantity') and value is not None)
+
+    def search(self, cursor, keyword, limit=20):
+        """
+        按名称、拼音或首字母前缀联想药品
+
+        排序依次为：名称前缀、拼音/首字母前缀、名称中间的字；同一等级内完全匹配的在前，其次名称较短的在前。
+
+        Args:
+            cursor: 数据库游标（索引尚未加载或需要重新加载时使用）
+            keyword: 已输入的文字
+            limit: 最多返回条数
+
+        Returns:
+            list: 药品（drug_id、drug_name、drug_price、stored_quantity）的副本
+        """
+        if self._stale():
+            self.load(cursor)
+        text = _normalize(keyword)
+        if not text:
+            return []
+
+        best = {}  # 药品编号 -> (排序等级, 是否非完全匹配)
+        with self._lock:
+            index = bisect.bisect_left(self._keys, (text,))
+            while index < len(self._keys) and self._keys[index][0].startswith(text):
+                key, rank, drug_id = self._keys[index]
+                score = (rank, key != text)
+                if drug_id not in best or score < best[drug_id]:
+                    best[drug_id] = score
+                index += 1
+            drugs = {drug_id: dict(self._drugs[drug_id]) for drug_id in best}
+
+        ranked = sorted(best, key=lambda drug_id: (best[drug_id], len(drugs[drug_id]['drug_name']), drug_id))
+        return [drugs[drug_id] for drug_id in ranked[:limit]]
+
+    def stats(self):
+        """
+        Returns:
+            dict: 药品数、检索键数与距上次加载的秒数
+        """
+        with self._lock:
+            return {
+                'drugs': len(self._drugs),
+                'keys': len(self._keys),
+                'age': None if self._loaded_at is None else time.monotonic() - self._loaded_at,
+            }
+
+
+# 进程内共享的药品联想索引，由 app.py 按 config.DRUG_INDEX_CONFIG 配置
+drug_index = DrugIndex()
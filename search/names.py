@@ -0,0 +1,256 @@
+"""
+病人、医生姓名检索索引
+
+name_search_token 表为每个姓名保存以下检索词（均为小写、去掉空白）：
+
+- name:     完整姓名，用于精确匹配与前缀匹配（"张" -> 张三、张三丰）
+- gram:     单字与相邻两字（"张三丰" -> 张、三、丰、张三、三丰），用于包含匹配
+- pinyin:   全拼（zhangsan），用于拼音前缀匹配（"zhangs" -> 张三）
+- initials: 拼音首字母（zs），用于首字母匹配（"zs" -> 张三）
+
+查询只在 (entity_type, token) 索引上做等值或范围扫描，不再对病人表做 LIKE '%name%' 全表扫描。
+索引在 register_patient、update_patient、register_doctor 中与姓名同一事务内维护；
+已有数据（或升级前的数据库）执行一次重建：
+
+    python -m search.names rebuild
+"""
+import argparse
+
+from db.transaction import transaction
+from search import pinyin
+
+# 实体类型 -> (表名, 主键列)
+ENTITIES = {
+    'patient': ('patient', 'patient_id'),
+    'doctor': ('doctor', 'doctor_id'),
+}
+
+MAX_TOKEN_LENGTH = 64    # 与 name_search_token.token 的长度一致
+REBUILD_BATCH_SIZE = 1000
+
+_PREFIX_KINDS = "('name', 'pinyin', 'initials')"
+
+
+def normalize(text):
+    """小写并去掉空白"""
+    return ''.join((text or '').lower().split())
+
+
+def _grams(text, sizes):
+    return {text[i:i + size] for size in sizes for i in range(len(text) - size + 1)}
+
+
+def name_tokens(name):
+    """
+    计算一个姓名的全部检索词
+
+    Args:
+        name: 姓名
+
+    Returns:
+        set: {(检索词, 类型), ...}
+    """
+    text = normalize(name)
+    if not text:
+        return set()
+    tokens = {(text, 'name')}
+    tokens.update((gram, 'gram') for gram in _grams(text, (1, 2)))
+    full = pinyin.to_pinyin(name)
+    if full:
+        tokens.add((full, 'pinyin'))
+        tokens.add((pinyin.initials(name), 'initials'))
+    return {(token[:MAX_TOKEN_LENGTH], kind) for token, kind in tokens}
+
+
+def query_grams(text):
+    """查询词用于包含匹配的 gram：两个字以上取相邻两字，单字取该字"""
+    return sorted(_grams(text, (2,))) if len(text) > 1 else [text]
+
+
+def _prefix_end(text):
+    """前缀范围的上界（不含）：最后一个字符加一"""
+    return text[:-1] + chr(ord(text[-1]) + 1)
+
+
+def index_name(cursor, entity_type, entity_id, name):
+    """
+    写入（或替换）一个姓名的检索词，应与姓名的写入在同一事务中调用
+
+    Args:
+        cursor: 数据库游标
+        entity_type: 'patient' 或 'doctor'
+        entity_id: 病历号或医生工号
+        name: 姓名
+    """
+    remove_name(cursor, entity_type, entity_id)
+    rows = [(entity_type, entity_id, token, kind) for token, kind in sorted(name_tokens(name))]
+    if rows:
+        cursor.executemany(
+            "INSERT INTO name_search_token (entity_type, entity_id, token, kind) VALUES (%s, %s, %s, %s)", rows)
+
+
+def remove_name(cursor, entity_type, entity_id):
+    """
+    删除一个实体的全部检索词
+
+    Args:
+        cursor: 数据库游标
+        entity_type: 'patient' 或 'doctor'
+        entity_id: 病历号或医生工号
+    """
+    cursor.execute("DELETE FROM name_search_token WHERE entity_type = %s AND entity_id = %s",
+                   (entity_type, entity_id))
+
+
+def name_filter(entity_type, column, name):
+    """
+    生成 "姓名包含 name" 的候选条件，与 column LIKE '%name%' 一起使用
+
+    候选集是包含查询词全部相邻两字的实体，LIKE 只在这些行上校验，结果与单独使用 LIKE 相同。
+
+    Args:
+        entity_type: 'patient' 或 'doctor'
+        column: 主键列（可带表别名，如 'd.doctor_id'）
+        name: 查询的姓名
+
+    Returns:
+        tuple: (条件 SQL, 参数列表)；查询词为空时返回 (None, [])
+    """
+    text = normalize(name)
+    if not text:
+        return None, []
+    grams = query_grams(text)
+    placeholders = ', '.join(['%s'] * len(grams))
+    sql = f"""{column} IN (
+        SELECT entity_id FROM name_search_token
+        WHERE entity_type = %s AND kind = 'gram' AND token IN ({placeholders})
+        GROUP BY entity_id HAVING COUNT(DISTINCT token) = %s
+    )"""
+    return sql, [entity_type, *grams, len(grams)]
+
+
+def search_names(cursor, entity_type, keyword, limit=20):
+    """
+    按姓名、拼音或拼音首字母检索，返回按匹配程度排序的实体编号
+
+    排序依次为：完整姓名/全拼/首字母精确匹配，前缀匹配，包含查询词的相邻两字越多越靠前
+    （汉字查询允许只匹配部分相邻两字，如 "张三风" 也能找到 "张三丰"）。
+
+    单个字符的查询（如 "张"、"z"）几乎能匹配所有同姓的实体，只做前缀匹配，并在索引上按检索词顺序
+    最多取 limit 倍前缀类型数的检索词作为候选，扫描行数与实体总数无关；结果按精确匹配、匹配的检索词排序。
+
+    Args:
+        cursor: 数据库游标
+        entity_type: 'patient' 或 'doctor'
+        keyword: 查询词，如 "张三"、"zhangs"、"zs"
+        limit: 最多返回条数
+
+    Returns:
+        list: 病历号或医生工号，失败时抛出异常由调用方处理
+    """
+    text = normalize(keyword)
+    if not text:
+        return []
+
+    if len(text) == 1:
+        # 每个实体最多有 name、pinyin、initials 三个前缀检索词，取 limit * 3 个检索词足以凑满 limit 个实体
+        sql = f"""
+        SELECT entity_id, MAX(CASE WHEN token = %s THEN 1 ELSE 0 END) AS exact, MIN(token) AS first_token
+        FROM (
+            SELECT entity_id, token FROM name_search_token
+            WHERE entity_type = %s AND kind IN {_PREFIX_KINDS} AND token >= %s AND token < %s
+            ORDER BY token
+            LIMIT %s
+        ) candidates
+        GROUP BY entity_id
+        ORDER BY exact DESC, first_token, entity_id
+        LIMIT %s
+        """
+        cursor.execute(sql, (text, entity_type, text, _prefix_end(text), limit * 3, limit))
+        return [row['entity_id'] for row in cursor.fetchall()]
+
+    params = [text, entity_type, text, _prefix_end(text)]
+    match_sql = f"(kind IN {_PREFIX_KINDS} AND token >= %s AND token < %s)"
+    min_hits = 1
+    if pinyin.has_cjk(text):
+        grams = query_grams(text)
+        match_sql = f"({match_sql} OR (kind = 'gram' AND token IN ({', '.join(['%s'] * len(grams))})))"
+        params.extend(grams)
+        min_hits = (len(grams) + 1) // 2
+    params.extend([min_hits, limit])
+
+    sql = f"""
+    SELECT entity_id,
+           MAX(CASE WHEN kind = 'gram' THEN 0 WHEN token = %s THEN 2 ELSE 1 END) AS prefix_rank,
+           COUNT(DISTINCT CASE WHEN kind = 'gram' THEN token END) AS gram_hits
+    FROM name_search_token
+    WHERE entity_type = %s AND {match_sql}
+    GROUP BY entity_id
+    HAVING prefix_rank > 0 OR gram_hits >= %s
+    ORDER BY prefix_rank DESC, gram_hits DESC, entity_id
+    LIMIT %s
+    """
+    cursor.execute(sql, params)
+    return [row['entity_id'] for row in cursor.fetchall()]
+
+
+def rebuild(cursor, entity_type):
+    """
+    按表中现有姓名重建某类实体的检索词
+
+    按主键分批，每批在一个事务中替换该主键区间内的检索词，重建期间检索仍可正常使用。
+
+    Args:
+        cursor: 数据库游标
+        entity_type: 'patient' 或 'doctor'
+
+    Returns:
+        int: 重建的实体数
+    """
+    table, key = ENTITIES[entity_type]
+    count, last_id = 0, 0
+    while True:
+        cursor.execute(f"SELECT {key} AS entity_id, name FROM {table} WHERE {key} > %s ORDER BY {key} LIMIT %s",
+                       (last_id, REBUILD_BATCH_SIZE))
+        batch = cursor.fetchall()
+        if not batch:
+            # 删除已不存在的实体的检索词
+            cursor.execute("DELETE FROM name_search_token WHERE entity_type = %s AND entity_id > %s",
+                           (entity_type, last_id))
+            return count
+        rows = [(entity_type, row['entity_id'], token, kind)
+                for row in batch for token, kind in sorted(name_tokens(row['name']))]
+        with transaction(cursor):
+            cursor.execute(
+                "DELETE FROM name_search_token WHERE entity_type = %s AND entity_id > %s AND entity_id <= %s",
+                (entity_type, last_id, batch[-1]['entity_id']))
+            if rows:
+                cursor.executemany(
+                    "INSERT INTO name_search_token (entity_type, entity_id, token, kind) VALUES (%s, %s, %s, %s)",
+                    rows)
+        count += len(batch)
+        last_id = batch[-1]['entity_id']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='病人、医生姓名检索索引')
+    parser.add_argument('command', choices=('rebuild',), help='rebuild: 按现有数据重建检索词')
+    parser.add_argument('--entity', choices=tuple(ENTITIES), help='只重建某类实体（默认全部）')
+    args = parser.parse_args(argv)
+
+    import setup
+    from config import DB_BACKEND, DB_CONFIG, SQLITE_CONFIG
+    from db.backend import create_backend
+
+    connection = create_backend(DB_BACKEND, mysql_config=DB_CONFIG, sqlite_config=SQLITE_CONFIG).connect()
+    try:
+        cursor = connection.cursor()
+        setup.create_table(cursor)  # 升级前的数据库补建检索表（已存在时跳过）
+        for entity_type in ([args.entity] if args.entity else list(ENTITIES)):
+            print(f"{entity_type}: 已重建 {rebuild(cursor, entity_type)} 条")
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
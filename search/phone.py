@@ -0,0 +1,132 @@
+"""
+电话号码规范化与尾号检索
+
+病人的电话号码在写入时规范化为纯数字（去掉空格、横线和 +86/0086 国家码），
+同时保存反转后的号码 phone_reversed：
+
+    13812345678  ->  phone_reversed = 87654321831
+
+"尾号为 5678" 即 phone_reversed 以 8765 开头，与完整号码的精确匹配一样是一次索引范围扫描。
+已有数据（或升级前的数据库）执行一次回填：
+
+    python -m search.phone backfill
+"""
+import argparse
+import re
+
+from db.transaction import transaction
+
+FULL_LENGTH = 11          # 大陆手机号位数，达到该位数时按完整号码精确匹配
+BACKFILL_BATCH_SIZE = 1000
+
+_NON_DIGIT = re.compile(r'\D')
+
+
+def normalize_phone(phone_number):
+    """
+    规范化电话号码
+
+    Args:
+        phone_number: 用户输入的号码，如 "+86 138-1234-5678"
+
+    Returns:
+        str: 纯数字号码，如 "13812345678"；输入中没有数字时返回去掉首尾空白的原值
+    """
+    raw = (phone_number or '').strip()
+    digits = _NON_DIGIT.sub('', raw)
+    if not digits:
+        return raw
+    if digits.startswith('0086') and len(digits) == FULL_LENGTH + 4:
+        digits = digits[4:]
+    elif digits.startswith('86') and len(digits) == FULL_LENGTH + 2:
+        digits = digits[2:]
+    return digits
+
+
+def reverse_phone(phone_number):
+    """反转号码，用于尾号检索"""
+    return phone_number[::-1]
+
+
+def phone_filter(column, reversed_column, phone_number):
+    """
+    生成按号码查询的条件：完整号码精确匹配，较短的数字按尾号匹配
+
+    Args:
+        column: 号码列（如 'phone_number'）
+        reversed_column: 反转号码列（如 'phone_reversed'）
+        phone_number: 查询的号码或尾号
+
+    Returns:
+        tuple: (条件 SQL, 参数列表)
+    """
+    digits = normalize_phone(phone_number)
+    if not digits.isdigit():
+        # 没有数字的输入按原方式模糊匹配
+        return f"{column} LIKE %s", [f"%{digits}%"]
+    if len(digits) >= FULL_LENGTH:
+        return f"{column} = %s", [digits]
+    return f"{reversed_column} LIKE %s", [f"{reverse_phone(digits)}%"]
+
+
+def _ensure_column(cursor):
+    """升级前的数据库补建 phone_reversed 列与索引"""
+    try:
+        cursor.execute("SELECT phone_reversed FROM patient LIMIT 1")
+        cursor.fetchall()
+        return
+    except Exception:
+        pass
+    cursor.execute("ALTER TABLE patient ADD COLUMN phone_reversed VARCHAR(20) NOT NULL DEFAULT ''")
+    cursor.execute("CREATE INDEX idx_patient_phone ON patient (phone_number)")
+    cursor.execute("CREATE INDEX idx_patient_phone_reversed ON patient (phone_reversed)")
+
+
+def backfill(cursor):
+    """
+    规范化已有病人的电话号码并回填 phone_reversed，按病历号分批，每批一个事务
+
+    Args:
+        cursor: 数据库游标
+
+    Returns:
+        int: 更新的病人数
+    """
+    _ensure_column(cursor)
+    count, last_id = 0, 0
+    while True:
+        cursor.execute("SELECT patient_id, phone_number, phone_reversed FROM patient "
+                       "WHERE patient_id > %s ORDER BY patient_id LIMIT %s", (last_id, BACKFILL_BATCH_SIZE))
+        batch = cursor.fetchall()
+        if not batch:
+            return count
+        rows = []
+        for row in batch:
+            phone_number = normalize_phone(row['phone_number'])
+            if phone_number != row['phone_number'] or reverse_phone(phone_number) != row['phone_reversed']:
+                rows.append((phone_number, reverse_phone(phone_number), row['patient_id']))
+        if rows:
+            with transaction(cursor):
+                cursor.executemany("UPDATE patient SET phone_number = %s, phone_reversed = %s WHERE patient_id = %s",
+                                   rows)
+        count += len(rows)
+        last_id = batch[-1]['patient_id']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='病人电话号码规范化与尾号索引')
+    parser.add_argument('command', choices=('backfill',), help='backfill: 规范化已有号码并回填尾号索引')
+    parser.parse_args(argv)
+
+    from config import DB_BACKEND, DB_CONFIG, SQLITE_CONFIG
+    from db.backend import create_backend
+
+    connection = create_backend(DB_BACKEND, mysql_config=DB_CONFIG, sqlite_config=SQLITE_CONFIG).connect()
+    try:
+        print(f"已更新 {backfill(connection.cursor())} 位病人的电话号码")
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+汉字转拼音
+
+使用 pypinyin 把姓名、药品名等转换为全拼（"张三" -> "zhangsan"）和首字母（"zs"），
+用于拼音检索。未安装 pypinyin 时 available() 返回 False，调用方只按汉字检索。
+"""
+import re
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:  # pragma: no cover - 可选依赖
+    lazy_pinyin = None
+
+_CJK = re.compile(r'[\u3400-\u9fff\uf900-\ufaff]')
+
+
+def available():
+    """是否可以转换拼音（已安装 pypinyin）"""
+    return lazy_pinyin is not None
+
+
+def has_cjk(text):
+    """文本中是否包含汉字"""
+    return bool(_CJK.search(text or ''))
+
+
+def syllables(text):
+    """
+    把文本拆分为拼音音节，非汉字部分按空白拆分为单词
+
+    Args:
+        text: 文本
+
+    Returns:
+        list: 小写的音节与单词，如 "张三" -> ['zhang', 'san']；未安装 pypinyin 时返回空列表
+    """
+    if not text or lazy_pinyin is None:
+        return []
+    result = []
+    for item in lazy_pinyin(text):
+        result.extend(word.lower() for word in item.split())
+    return result
+
+
+def to_pinyin(text):
+    """全拼，如 "张三" -> "zhangsan" """
+    return ''.join(syllables(text))
+
+
+def initials(text):
+    """拼音首字母，如 "张三" -> "zs" """
+    return ''.join(word[0] for word in syllables(text))
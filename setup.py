@@ -8,10 +8,13 @@ def create_table(cursor):
             patient_id INT AUTO_INCREMENT PRIMARY KEY COMMENT '病历号',
             name VARCHAR(50) NOT NULL COMMENT '姓名',
             gender ENUM('男', '女') NOT NULL COMMENT '性别',
-            phone_number VARCHAR(20) NOT NULL COMMENT '电话号码',
+            phone_number VARCHAR(20) NOT NULL COMMENT '电话号码（纯数字）',
+            phone_reversed VARCHAR(20) NOT NULL DEFAULT '' COMMENT '反转的电话号码，用于尾号查询',
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
             updated_at TIMESTAMP NULL DEFAULT NULL ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
-            INDEX idx_patient_name (name)
+            INDEX idx_patient_name (name),
+            INDEX idx_patient_phone (phone_number),
+            INDEX idx_patient_phone_reversed (phone_reversed)
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='病人信息表'
     """)
     
@@ -77,13 +80,18 @@ def create_table(cursor):
             department_id INT NOT NULL COMMENT '科室编号',
             doctor_id INT NULL COMMENT '医生工号',
             payment_id INT NULL COMMENT '缴费号',
+            status ENUM('created', 'assigned', 'prescribed', 'paid', 'closed') NOT NULL DEFAULT 'created' COMMENT '状态',
+            slot_date DATE NULL COMMENT '预约日期（现场挂号为空）',
+            slot_index TINYINT NULL COMMENT '预约时段序号',
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
             updated_at TIMESTAMP NULL DEFAULT NULL ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
             FOREIGN KEY (patient_id) REFERENCES patient(patient_id) ON DELETE CASCADE,
             FOREIGN KEY (department_id) REFERENCES department(department_id) ON DELETE RESTRICT,
             FOREIGN KEY (doctor_id) REFERENCES doctor(doctor_id) ON DELETE SET NULL,
             FOREIGN KEY (payment_id) REFERENCES payment(payment_id) ON DELETE SET NULL,
-            INDEX idx_registration_doctor (doctor_id),
+            INDEX idx_registration_status_department (status, department_id, registration_id),
+            INDEX idx_registration_doctor_status (doctor_id, status),
+            UNIQUE INDEX uk_registration_slot (doctor_id, slot_date, slot_index),
             INDEX idx_registration_patient (patient_id),
             INDEX idx_registration_doctor_patient (doctor_id, patient_id)
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='挂号记录表'
@@ -96,6 +104,7 @@ def create_table(cursor):
             registration_id INT NOT NULL COMMENT '挂号编号',
             drug_id INT NOT NULL COMMENT '药品编号',
             quantity INT NOT NULL COMMENT '药品数量',
+            unit_price DECIMAL(10,2) NULL COMMENT '开具时的药品单价',
             payment_id INT NOT NULL COMMENT '缴费号',
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
             updated_at TIMESTAMP NULL DEFAULT NULL ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
@@ -105,6 +114,79 @@ def create_table(cursor):
             INDEX idx_prescription_registration (registration_id)
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='处方记录表'
     """)
+    
+    # 8. 创建姓名检索表 (name_search_token)，由 search.names 维护
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS name_search_token (
+            entity_type ENUM('patient', 'doctor') NOT NULL COMMENT '实体类型',
+            entity_id INT NOT NULL COMMENT '病历号或医生工号',
+            token VARCHAR(64) NOT NULL COMMENT '检索词',
+            kind ENUM('name', 'gram', 'pinyin', 'initials') NOT NULL COMMENT '检索词类型',
+            PRIMARY KEY (entity_type, entity_id, token, kind),
+            INDEX idx_name_search_token (entity_type, token)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='姓名检索表'
+    """)
+
+    # 9. 创建医生出诊时段模板表 (doctor_slot_template)，每位医生每个星期几一条
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS doctor_slot_template (
+            doctor_id INT NOT NULL COMMENT '医生工号',
+            weekday TINYINT NOT NULL COMMENT '星期（0 为周一，6 为周日）',
+            start_minute SMALLINT NOT NULL COMMENT '第一个时段的开始时间（当天第几分钟）',
+            slot_minutes SMALLINT NOT NULL COMMENT '每个时段的分钟数',
+            slot_count TINYINT NOT NULL COMMENT '时段数（不超过 63）',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+            updated_at TIMESTAMP NULL DEFAULT NULL ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+            PRIMARY KEY (doctor_id, weekday),
+            FOREIGN KEY (doctor_id) REFERENCES doctor(doctor_id) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='医生出诊时段模板表'
+    """)
+    
+    # 10. 创建医生出诊日表 (doctor_slot_day)，首次预约某天时按模板生成，booked 为已预约时段位图
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS doctor_slot_day (
+            doctor_id INT NOT NULL COMMENT '医生工号',
+            slot_date DATE NOT NULL COMMENT '出诊日期',
+            start_minute SMALLINT NOT NULL COMMENT '第一个时段的开始时间（当天第几分钟）',
+            slot_minutes SMALLINT NOT NULL COMMENT '每个时段的分钟数',
+            slot_count TINYINT NOT NULL COMMENT '时段数',
+            booked BIGINT NOT NULL DEFAULT 0 COMMENT '已预约时段位图（第 i 位为 1 表示第 i 个时段已预约）',
+            PRIMARY KEY (doctor_id, slot_date),
+            FOREIGN KEY (doctor_id) REFERENCES doctor(doctor_id) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='医生出诊日表'
+    """)
+
+    # 11. 创建挂号工作列表读模型 (registration_view)，每个挂号一行，由 schedule/worklist.py 与挂号同一事务维护
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS registration_view (
+            registration_id INT NOT NULL PRIMARY KEY COMMENT '挂号编号',
+            patient_id INT NOT NULL COMMENT '病历号',
+            patient_name VARCHAR(50) NOT NULL COMMENT '病人姓名',
+            department_id INT NOT NULL COMMENT '科室编号',
+            department_name VARCHAR(100) NOT NULL COMMENT '科室名称',
+            doctor_id INT NULL COMMENT '医生工号',
+            doctor_name VARCHAR(50) NULL COMMENT '医生姓名',
+            payment_id INT NULL COMMENT '缴费号',
+            status ENUM('created', 'assigned', 'prescribed', 'paid', 'closed') NOT NULL COMMENT '状态',
+            doctor_open TINYINT NOT NULL DEFAULT 0 COMMENT '是否在医生待办中（已分配且未结束就诊）',
+            slot_date DATE NULL COMMENT '预约日期',
+            slot_index TINYINT NULL COMMENT '预约时段序号',
+            created_at TIMESTAMP NULL COMMENT '挂号时间',
+            FOREIGN KEY (registration_id) REFERENCES registration(registration_id) ON DELETE CASCADE,
+            INDEX idx_registration_view_doctor (doctor_id, doctor_open, registration_id),
+            INDEX idx_registration_view_patient (patient_id, registration_id),
+            INDEX idx_registration_view_status (status, department_id, registration_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='挂号工作列表读模型'
+    """)
+    
+    # 12. 创建病人概览版本号表 (patient_summary_version)，病人的资料、挂号、缴费或处方变化时递增，用作 ETag
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS patient_summary_version (
+            patient_id INT NOT NULL PRIMARY KEY COMMENT '病历号',
+            version INT NOT NULL DEFAULT 0 COMMENT '概览版本号',
+            FOREIGN KEY (patient_id) REFERENCES patient(patient_id) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='病人概览版本号表'
+    """)
 
 def show_table_content(cursor, table_name):
     """
@@ -114,31 +196,38 @@ def show_table_content(cursor, table_name):
         cursor: 数据库游标
         table_name: 表名
     """
+    # 使用不缓冲结果集的游标逐行打印，表再大也不会一次性载入内存
+    # （SQLite 连接忽略游标类型，其游标本身就是逐行读取的）
+    stream = cursor.connection.cursor(pymysql.cursors.SSDictCursor)
     try:
         # 获取表数据
-        cursor.execute(f"SELECT * FROM {table_name}")
-        records = cursor.fetchall()
+        stream.execute(f"SELECT * FROM {table_name}")
+        headers = [column[0] for column in stream.description]
         
         print(f"\n=== {table_name} 表内容 ===")
-        if records:
-            # 显示列名
-            headers = list(records[0].keys())
-            header_line = " | ".join(f"{h:<15}" for h in headers)
-            print(header_line)
-            print("-" * len(header_line))
-            
-            # 显示数据
-            for record in records:
-                row_data = " | ".join(f"{str(v):<15}" for v in record.values())
-                print(row_data)
-            
+        header_line = " | ".join(f"{h:<15}" for h in headers)
+        count = 0
+        
+        # 显示数据
+        for record in stream:
+            if count == 0:
+                # 显示列名
+                print(header_line)
+                print("-" * len(header_line))
+            row_data = " | ".join(f"{str(v):<15}" for v in record.values())
+            print(row_data)
+            count += 1
+        
+        if count:
             print("-" * len(header_line))
-            print(f"记录数: {len(records)}")
+            print(f"记录数: {count}")
         else:
             print("表为空")
             
     except Exception as e:
         print(f"查询表 {table_name} 失败: {e}")
+    finally:
+        stream.close()
 
 def drop_all_tables_for_testing(cursor):
     """
@@ -153,6 +242,11 @@ def drop_all_tables_for_testing(cursor):
         
         # 删除所有表（按照从依赖表到基础表的顺序）
         tables_to_drop = [
+            'name_search_token',  # 姓名检索表
+            'registration_view',  # 挂号工作列表读模型（依赖挂号）
+            'patient_summary_version',  # 病人概览版本号表（依赖病人）
+            'doctor_slot_day',    # 医生出诊日表（依赖医生）
+            'doctor_slot_template',  # 医生出诊时段模板表（依赖医生）
             'prescription',    # 处方表（依赖挂号、药品、缴费）
             'registration',    # 挂号表（依赖病人、科室、医生、缴费）
             'payment',         # 缴费表（依赖病人）
@@ -0,0 +1,101 @@
+"""
+测试夹具
+
+测试使用内嵌的 SQLite 后端（无需 MySQL）：每个测试建立一个新库、建表并写入同一组基础数据。
+
+    科室  1 内科、2 外科
+    医生  1 张医生（内科，主任医师）、2 李医生（外科，主任医师）
+    药品  1 阿司匹林（库存 100，单价 5.5）、2 头孢（库存 100，单价 9.5）
+    病人  1 张三
+"""
+import os
+import sys
+
+# 必须在导入 config 之前设置
+os.environ['OMS_DB_BACKEND'] = 'sqlite'
+os.environ['OMS_SQLITE_DATABASE'] = ':memory:'
+os.environ['OMS_AUTO_ASSIGN'] = '0'
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import setup
+import entity.department as department_module
+import entity.doctor as doctor_module
+import entity.drug as drug_module
+import entity.patient as patient_module
+from config import POOL_CONFIG
+from db.cache import query_cache
+from db.sqlite_backend import SQLiteBackend
+from schedule.assignment import doctor_assigner
+from schedule.slots import slot_index
+from search.drugs import drug_index
+
+
+def _seed(cursor):
+    setup.create_table(cursor)
+    department_module.create_department(cursor, '内科')
+    department_module.create_department(cursor, '外科')
+    doctor_module.register_doctor(cursor, '张医生', '男', '13812345678', '主任医师', 1)
+    doctor_module.register_doctor(cursor, '李医生', '女', '13812345679', '主任医师', 2)
+    drug_module.add_drug(cursor, '阿司匹林', 100, 5.5)
+    drug_module.add_drug(cursor, '头孢', 100, 9.5)
+    patient_module.register_patient(cursor, '张三', '男', '13812345678')
+
+
+def _reset_process_state():
+    """清空进程内的缓存与索引，避免上一个测试的数据残留"""
+    query_cache.clear()
+    drug_index.clear()
+    slot_index.clear()
+    doctor_assigner.clear()
+
+
+def _open(backend):
+    _reset_process_state()
+    connection = backend.connect()
+    _seed(connection.cursor())
+    return connection
+
+
+@pytest.fixture
+def backend():
+    """内存数据库后端，连接池中的连接共享同一个库"""
+    return SQLiteBackend(':memory:')
+
+
+@pytest.fixture
+def file_backend(tmp_path):
+    """文件数据库后端（WAL），用于多线程并发写入的测试"""
+    return SQLiteBackend(str(tmp_path / 'oms.db'))
+
+
+@pytest.fixture
+def cursor(backend):
+    """已建表并写入基础数据的游标"""
+    connection = _open(backend)
+    yield connection.cursor()
+    connection.close()
+
+
+@pytest.fixture
+def file_cursor(file_backend):
+    """已建表并写入基础数据的文件数据库游标"""
+    connection = _open(file_backend)
+    yield connection.cursor()
+    connection.close()
+
+
+@pytest.fixture
+def client(backend, monkeypatch):
+    """使用内存数据库的 Flask 测试客户端"""
+    import app as app_module
+
+    connection = _open(backend)
+    pool = backend.create_pool(**POOL_CONFIG)
+    monkeypatch.setattr(app_module, 'pool', pool)
+    app_module.app.testing = True
+    yield app_module.app.test_client()
+    pool.close()
+    connection.close()
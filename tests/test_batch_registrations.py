@@ -0,0 +1,91 @@
+"""
+批量受理挂号：每个挂号对应本批生成的缴费单，受理期间被修改的挂号单独报告冲突
+"""
+import pytest
+
+import entity.doctor as doctor_module
+import entity.patient as patient_module
+import entity.payment as payment_module
+import entity.registration as registration_module
+
+
+def test_process_registrations_payment_ids(cursor):
+    patient_module.register_patient(cursor, '李四', '女', '13900000000')
+    # 先生成一张无关的缴费单，本批缴费号不从 1 开始
+    payment_module.create_payment(cursor, 2, 10)
+    registration_ids = [registration_module.create_registration(cursor, patient_id, 1) for patient_id in (1, 2, 1)]
+
+    results = registration_module.process_registrations(
+        cursor, [(registration_id, 1) for registration_id in registration_ids] + [(999, 1)], 50)
+
+    assert [item['status'] for item in results] == ['assigned', 'assigned', 'assigned', 'not_found']
+    assert [item['payment_id'] for item in results] == [2, 3, 4, None]
+    cursor.execute("SELECT r.registration_id, r.patient_id, y.patient_id AS payer, y.price FROM registration r "
+                   "JOIN payment y ON y.payment_id = r.payment_id ORDER BY r.registration_id")
+    for row in cursor.fetchall():
+        assert row['payer'] == row['patient_id']
+        assert row['price'] == 50
+
+
+class _InterleavingCursor:
+    """在批量受理写入挂号之前先执行一条其他操作的语句，模拟校验之后的并发修改"""
+
+    def __init__(self, cursor, sql):
+        self._cursor = cursor
+        self._sql = sql
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def execute(self, sql, params=None):
+        if self._sql and 'CASE registration_id' in sql:
+            self._cursor.execute(self._sql)
+            self._sql = None
+        return self._cursor.execute(sql, params)
+
+
+@pytest.mark.parametrize('concurrent_sql', [
+    "UPDATE registration SET doctor_id = 1, status = 'assigned' WHERE registration_id = 2",
+    "UPDATE doctor SET department_id = 2 WHERE doctor_id = 3",
+])
+def test_process_registrations_reports_only_modified_rows(cursor, concurrent_sql):
+    assert doctor_module.register_doctor(cursor, '王医生', '男', '13812345670', '主治医师', 1) == 3
+    registration_ids = [registration_module.create_registration(cursor, 1, 1) for _ in range(3)]
+
+    results = registration_module.process_registrations(
+        _InterleavingCursor(cursor, concurrent_sql), [(1, 1), (2, 3), (3, 1)], 50)
+
+    assert [item['status'] for item in results] == ['assigned', 'conflict', 'assigned']
+    assert [item['payment_id'] for item in results] == [1, None, 3]
+    # 为冲突的挂号生成的缴费单随之删除
+    cursor.execute("SELECT payment_id FROM payment ORDER BY payment_id")
+    assert [row['payment_id'] for row in cursor.fetchall()] == [1, 3]
+    cursor.execute("SELECT registration_id, payment_id FROM registration_view WHERE status = 'assigned' "
+                   "AND registration_id IN (%s, %s) ORDER BY registration_id", (registration_ids[0], registration_ids[2]))
+    assert [row['payment_id'] for row in cursor.fetchall()] == [1, 3]
+
+
+def test_sqlite_lastrowid_only_adjusted_for_insert(cursor):
+    # 多行 INSERT 与 MySQL 一致返回第一行的编号
+    cursor.execute("INSERT INTO department (department_name) VALUES (%s), (%s)", ('儿科', '眼科'))
+    assert cursor.lastrowid == 3
+    # REPLACE 不按 rowcount 推算
+    cursor.execute("REPLACE INTO department (department_id, department_name) VALUES (%s, %s), (%s, %s)",
+                   (5, '口腔科', 4, '皮肤科'))
+    assert cursor.lastrowid == 4
+
+
+@pytest.mark.parametrize('data', [
+    {'registration_id': 1},
+    {'doctor_id': '', 'registration_id': 1},
+    {'doctor_id': 'x', 'registration_id': 1},
+    {'doctor_id': 1, 'registration_id': 'x'},
+])
+def test_admin_registrations_rejects_invalid_form(client, data):
+    client.post('/patient/login', data={'patient_id': 1})
+    client.post('/patient/create_registration', data={'department_id': 1})
+
+    response = client.post('/admin/registrations', data=data)
+    assert response.status_code == 302
+    response = client.get(response.headers['Location'])
+    assert '请选择医生并勾选要受理的挂号' in response.get_data(as_text=True)
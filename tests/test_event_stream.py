@@ -0,0 +1,46 @@
+"""
+医生工作台推送：本进程推送连接数的上限
+"""
+import pytest
+
+from events import EventBus, doctor_topic, event_bus
+
+
+def test_event_bus_max_subscribers():
+    bus = EventBus(max_subscribers=2)
+    first = bus.subscribe(doctor_topic(1))
+    second = bus.subscribe(doctor_topic(2))
+    assert bus.subscribe(doctor_topic(1)) is None
+    assert bus.stats()['subscribers'] == 2
+    assert bus.stats()['rejected'] == 1
+
+    first.close()
+    first.close()  # 重复取消订阅不影响计数
+    assert bus.stats()['subscribers'] == 1
+    assert bus.subscribe(doctor_topic(1)) is not None
+    second.close()
+    assert bus.stats()['subscribers'] == 1
+
+
+@pytest.fixture
+def doctor(client, monkeypatch):
+    monkeypatch.setattr(event_bus, 'max_subscribers', 1)
+    client.post('/doctor/login', data={'doctor_id': 1})
+    return client
+
+
+def test_stream_rejects_connections_over_limit(doctor):
+    first = doctor.get('/doctor/registrations/stream')
+    assert first.status_code == 200
+    assert event_bus.stats()['subscribers'] == 1
+
+    rejected = doctor.get('/doctor/registrations/stream')
+    assert rejected.status_code == 503
+    assert rejected.headers['Retry-After']
+
+    # 连接关闭（即使没有读取响应）后释放名额
+    first.close()
+    assert event_bus.stats()['subscribers'] == 0
+    second = doctor.get('/doctor/registrations/stream')
+    assert second.status_code == 200
+    second.close()
@@ -0,0 +1,58 @@
+"""
+请求内的标识映射：写语句按表使已读取的记录失效
+"""
+import pytest
+
+from db.identity import IdentityMap, fetch_row
+from db.instrument import InstrumentedCursor, QueryStats
+from db.transaction import Rollback, transaction
+
+
+@pytest.fixture
+def identity_map():
+    return IdentityMap()
+
+
+def _cursor(cursor, identity_map):
+    """与请求中的 get_db_cursor() 一样：同一连接上的新游标，共享本请求的标识映射"""
+    return InstrumentedCursor(cursor.connection.cursor(), QueryStats(), identity_map=identity_map)
+
+
+def test_repeated_reads_hit(cursor, identity_map):
+    reader = _cursor(cursor, identity_map)
+    assert fetch_row(reader, 'patient', 'patient_id', 1)['name'] == '张三'
+    assert fetch_row(reader, 'patient', 'patient_id', '1')['name'] == '张三'
+    assert fetch_row(reader, 'patient', 'patient_id', 999) is None
+    assert fetch_row(reader, 'patient', 'patient_id', 999) is None
+    assert (identity_map.hits, identity_map.misses) == (2, 2)
+    assert reader.stats.statements == 2
+
+
+def test_write_through_another_cursor_invalidates(cursor, identity_map):
+    reader, writer = _cursor(cursor, identity_map), _cursor(cursor, identity_map)
+    assert fetch_row(reader, 'patient', 'patient_id', 1)['name'] == '张三'
+    assert fetch_row(reader, 'department', 'department_id', 1)['department_name'] == '内科'
+
+    writer.execute("UPDATE patient SET name = %s WHERE patient_id = %s", ('张四', 1))
+    assert fetch_row(reader, 'patient', 'patient_id', 1)['name'] == '张四'
+    # 其他表的记录不受影响
+    assert fetch_row(reader, 'department', 'department_id', 1)['department_name'] == '内科'
+    assert reader.stats.statements == 3
+
+
+def test_write_invalidates_whole_table(cursor, identity_map):
+    # 按表失效：写入其他行也会使已读取的行重新查询一次
+    reader, writer = _cursor(cursor, identity_map), _cursor(cursor, identity_map)
+    fetch_row(reader, 'drug', 'drug_id', 1)
+    writer.execute("UPDATE drug SET stored_quantity = 50 WHERE drug_id = 2")
+    assert fetch_row(reader, 'drug', 'drug_id', 1)['stored_quantity'] == 100
+    assert reader.stats.statements == 2
+
+
+def test_rollback_clears(cursor, identity_map):
+    reader = _cursor(cursor, identity_map)
+    with transaction(reader):
+        reader.execute("UPDATE patient SET name = %s WHERE patient_id = %s", ('张四', 1))
+        assert fetch_row(reader, 'patient', 'patient_id', 1)['name'] == '张四'
+        raise Rollback
+    assert fetch_row(reader, 'patient', 'patient_id', 1)['name'] == '张三'
@@ -0,0 +1,103 @@
+"""
+姓名检索：检索词、拼音与首字母匹配、按匹配程度排序
+"""
+import pytest
+
+import entity.patient as patient_module
+from search import names
+
+
+@pytest.fixture
+def patients(cursor):
+    """在基础数据的 1 张三之外再注册几位病人"""
+    for name in ('张三丰', '李张三', '王五', '张珊'):
+        patient_module.register_patient(cursor, name, '男', '13900000000')
+    return cursor  # 病历号：1 张三、2 张三丰、3 李张三、4 王五、5 张珊
+
+
+def test_normalize():
+    assert names.normalize(' Zhang San ') == 'zhangsan'
+    assert names.normalize(None) == ''
+
+
+def test_name_tokens():
+    assert names.name_tokens('张三丰') == {
+        ('张三丰', 'name'),
+        ('张', 'gram'), ('三', 'gram'), ('丰', 'gram'), ('张三', 'gram'), ('三丰', 'gram'),
+        ('zhangsanfeng', 'pinyin'),
+        ('zsf', 'initials'),
+    }
+    assert names.name_tokens('  ') == set()
+
+
+def test_query_grams():
+    assert names.query_grams('张三丰') == ['三丰', '张三']
+    assert names.query_grams('张') == ['张']
+
+
+def test_register_patient_indexes_name(patients):
+    patients.execute("SELECT token, kind FROM name_search_token WHERE entity_type = 'patient' AND entity_id = 1")
+    assert {(row['token'], row['kind']) for row in patients.fetchall()} == names.name_tokens('张三')
+
+
+def test_search_by_initials(patients):
+    # 首字母完全相同的排在前面，其余按前缀匹配
+    assert names.search_names(patients, 'patient', 'zs') == [1, 5, 2]
+    assert names.search_names(patients, 'patient', 'ZS') == [1, 5, 2]
+
+
+def test_search_by_pinyin_prefix(patients):
+    assert names.search_names(patients, 'patient', 'zhangs') == [1, 2, 5]
+    assert names.search_names(patients, 'patient', 'zhangsan') == [1, 2]
+    assert names.search_names(patients, 'patient', 'wangwu') == [4]
+
+
+def test_search_by_name_ranking(patients):
+    # 完整姓名 > 前缀 > 包含
+    assert names.search_names(patients, 'patient', '张三') == [1, 2, 3]
+    # 只匹配一半相邻两字也能找到（"张三风" 只命中 "张三"），命中数相同时按编号
+    assert names.search_names(patients, 'patient', '张三风') == [1, 2, 3]
+    assert names.search_names(patients, 'patient', '三丰') == [2]
+
+
+def test_search_single_character(patients):
+    # 单字只做前缀匹配（不含 "李张三"），按匹配的检索词排序
+    assert names.search_names(patients, 'patient', '张') == [1, 2, 5]
+    assert names.search_names(patients, 'patient', '张', limit=2) == [1, 2]
+    assert names.search_names(patients, 'patient', 'z') == [1, 2, 5]
+    assert names.search_names(patients, 'patient', '三') == []
+    # 与单字同名的实体排在最前
+    patient_module.register_patient(patients, '张', '男', '13900000000')
+    assert names.search_names(patients, 'patient', '张', limit=1) == [6]
+
+
+def test_search_limit_and_empty(patients):
+    assert names.search_names(patients, 'patient', 'zs', limit=1) == [1]
+    assert names.search_names(patients, 'patient', '   ') == []
+    assert names.search_names(patients, 'patient', '赵六') == []
+    assert names.search_names(patients, 'doctor', 'zys') == [1]
+
+
+def test_search_patient_keeps_rank_order(patients):
+    assert [row['name'] for row in patient_module.search_patient(patients, 'zs')] == ['张三', '张珊', '张三丰']
+
+
+def test_query_patient_by_name(patients):
+    # 包含匹配：候选集来自检索表，结果与 LIKE '%name%' 相同
+    assert [row['patient_id'] for row in patient_module.query_patient(patients, name='张三')] == [1, 2, 3]
+    assert [row['patient_id'] for row in patient_module.query_patient(patients, name='三丰')] == [2]
+    assert [row['patient_id'] for row in patient_module.query_patient(patients, name='张')] == [1, 2, 3, 5]
+    assert patient_module.query_patient(patients, name='赵') == []
+
+
+def test_rename_reindexes(patients):
+    assert patient_module.update_patient(patients, 4, name='赵六')
+    assert names.search_names(patients, 'patient', 'wangwu') == []
+    assert names.search_names(patients, 'patient', 'zl') == [4]
+    assert [row['patient_id'] for row in patient_module.query_patient(patients, name='赵六')] == [4]
+
+
+def test_rebuild(patients):
+    patients.execute("DELETE FROM name_search_token")
+    assert names.rebuild(patients, 'patient') == 5
+    assert names.search_names(patients, 'patient', 'zs') == [1, 5, 2]
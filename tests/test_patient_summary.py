@@ -0,0 +1,78 @@
+"""
+病人概览：处方金额按开具时的单价计算，药品调价后概览与版本号保持一致
+"""
+from decimal import Decimal
+
+import pytest
+
+import entity.drug as drug_module
+import entity.prescription as prescription_module
+import entity.registration as registration_module
+import entity.summary as summary_module
+
+
+@pytest.fixture
+def prescribed(cursor):
+    """病人 1 的挂号 1 由张医生开具阿司匹林（单价 5.5）2 盒"""
+    registration_module.create_registration(cursor, 1, 1)
+    registration_module.process_registration(cursor, 1, 1)
+    assert prescription_module.prescribe_drugs(cursor, 1, [(1, 2)])
+    return cursor
+
+
+def _prescription(cursor):
+    summary = summary_module.query_patient_summary(cursor, 1)
+    return summary['prescriptions'][0], summary['version']
+
+
+def test_prescription_stores_unit_price(prescribed):
+    prescribed.execute("SELECT unit_price FROM prescription WHERE prescription_id = 1")
+    assert prescribed.fetchone()['unit_price'] == Decimal('5.5')
+    prescription, _ = _prescription(prescribed)
+    assert prescription['price'] == Decimal('11')
+
+
+def test_price_change_does_not_change_summary(prescribed):
+    before, version = _prescription(prescribed)
+    assert drug_module.update_drug_info(prescribed, 1, drug_price=8)
+
+    after, version_after = _prescription(prescribed)
+    assert after['price'] == before['price'] == Decimal('11')
+    assert version_after == version
+
+
+def test_price_change_touches_summaries_without_unit_price(prescribed):
+    # 升级前开具的处方没有保存单价，按药品当前单价显示，调价时递增版本号
+    prescribed.execute("UPDATE prescription SET unit_price = NULL")
+    _, version = _prescription(prescribed)
+
+    assert drug_module.update_drug_info(prescribed, 1, drug_price=8)
+    prescription, version_after = _prescription(prescribed)
+    assert prescription['price'] == Decimal('16')
+    assert version_after == version + 1
+
+    # 只改库存、或调价的药品与这些处方无关时不递增
+    assert drug_module.update_drug_info(prescribed, 1, stored_quantity=50)
+    assert drug_module.update_drug_info(prescribed, 2, drug_price=12)
+    assert _prescription(prescribed)[1] == version + 1
+
+
+def test_summary_etag_after_price_change(client):
+    client.post('/patient/login', data={'patient_id': 1})
+    client.post('/patient/create_registration', data={'department_id': 1})
+    client.post('/admin/registrations', data={'doctor_id': 1, 'registration_id': 1})
+    client.post('/doctor/login', data={'doctor_id': 1})
+    client.post('/doctor/create_prescription', data={'registration_id': 1, 'drug_id': 1, 'quantity': 2})
+    client.post('/patient/login', data={'patient_id': 1})
+
+    response = client.get('/patient/summary')
+    etag = response.headers['ETag']
+    assert Decimal(str(response.get_json()['prescriptions'][0]['price'])) == Decimal('11')
+
+    response = client.post('/admin/drugs', data={'action': 'update', 'drug_id': 1, 'update_type': 'price',
+                                                 'update_value': '8'})
+    assert '药品更新成功' in response.get_data(as_text=True)
+
+    assert client.get('/patient/summary', headers={'If-None-Match': etag}).status_code == 304
+    response = client.get('/patient/summary')
+    assert Decimal(str(response.get_json()['prescriptions'][0]['price'])) == Decimal('11')
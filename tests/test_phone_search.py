@@ -0,0 +1,70 @@
+"""
+电话号码规范化与尾号检索
+"""
+import pytest
+
+import entity.patient as patient_module
+from search import phone
+from search.phone import normalize_phone, phone_filter
+
+
+@pytest.mark.parametrize('raw, expected', [
+    ('13812345678', '13812345678'),
+    (' 138 1234 5678 ', '13812345678'),
+    ('138-1234-5678', '13812345678'),
+    ('+86 138-1234-5678', '13812345678'),
+    ('0086 13812345678', '13812345678'),
+    ('8613812345678', '13812345678'),
+    ('86123', '86123'),             # 短号码不去掉 86
+    ('010-12345678', '01012345678'),
+    ('  无  ', '无'),               # 没有数字时保留原值
+    (None, ''),
+])
+def test_normalize_phone(raw, expected):
+    assert normalize_phone(raw) == expected
+
+
+def test_phone_filter():
+    assert phone_filter('phone_number', 'phone_reversed', '+86 138-1234-5678') == \
+        ("phone_number = %s", ['13812345678'])
+    assert phone_filter('phone_number', 'phone_reversed', '5678') == ("phone_reversed LIKE %s", ['8765%'])
+    assert phone_filter('p.phone_number', 'p.phone_reversed', '56-78') == ("p.phone_reversed LIKE %s", ['8765%'])
+    assert phone_filter('phone_number', 'phone_reversed', 'abc') == ("phone_number LIKE %s", ['%abc%'])
+
+
+@pytest.fixture
+def patients(cursor):
+    """在基础数据的 1 张三（13812345678）之外再注册两位病人"""
+    patient_module.register_patient(cursor, '李四', '女', '+86 139-0000-5678')
+    patient_module.register_patient(cursor, '王五', '男', '13900001111')
+    return cursor
+
+
+def _ids(rows):
+    return [row['patient_id'] for row in rows]
+
+
+def test_register_patient_stores_normalized(patients):
+    patients.execute("SELECT phone_number, phone_reversed FROM patient WHERE patient_id = 2")
+    assert patients.fetchone() == {'phone_number': '13900005678', 'phone_reversed': '87650000931'}
+
+
+def test_query_patient_by_phone(patients):
+    assert _ids(patient_module.query_patient(patients, phone_number='138 1234 5678')) == [1]
+    assert _ids(patient_module.query_patient(patients, phone_number='5678')) == [1, 2]
+    assert _ids(patient_module.query_patient(patients, phone_number='1111')) == [3]
+    assert patient_module.query_patient(patients, phone_number='0000') == []
+    assert _ids(patient_module.query_patient(patients, name='李', phone_number='5678')) == [2]
+
+
+def test_update_patient_phone(patients):
+    assert patient_module.update_patient(patients, 3, phone_number='138-0000-2222')
+    assert _ids(patient_module.query_patient(patients, phone_number='2222')) == [3]
+    assert patient_module.query_patient(patients, phone_number='1111') == []
+
+
+def test_backfill(patients):
+    patients.execute("UPDATE patient SET phone_number = '138-1234-5678', phone_reversed = '' WHERE patient_id = 1")
+    assert phone.backfill(patients) == 1
+    assert phone.backfill(patients) == 0
+    assert _ids(patient_module.query_patient(patients, phone_number='5678')) == [1, 2]
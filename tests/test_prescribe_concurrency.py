@@ -0,0 +1,63 @@
+"""
+并发开药：条件扣减库存不丢失更新、不扣成负数，被拒绝的开药不留下缴费单
+"""
+import threading
+
+import entity.prescription as prescription_module
+import entity.registration as registration_module
+
+THREADS = 12
+QUANTITY = 3
+INITIAL_STOCK = 20  # 只够 6 次开药
+
+
+def _count(cursor, sql):
+    cursor.execute(sql)
+    return cursor.fetchone()['count']
+
+
+def test_concurrent_prescribe_drugs(file_backend, file_cursor):
+    registration_id = registration_module.create_registration(file_cursor, 1, 1)
+    assert registration_module.process_registration(file_cursor, registration_id, 1)
+    file_cursor.execute("UPDATE drug SET stored_quantity = %s WHERE drug_id = 1", (INITIAL_STOCK,))
+
+    barrier = threading.Barrier(THREADS)
+    results = []
+    lock = threading.Lock()
+
+    def prescribe():
+        connection = file_backend.connect()
+        try:
+            barrier.wait()
+            result = prescription_module.prescribe_drugs(connection.cursor(), registration_id, [(1, QUANTITY)])
+            with lock:
+                results.append(result)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=prescribe) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    accepted = [result for result in results if result is not None]
+    assert len(results) == THREADS
+    assert len(accepted) == INITIAL_STOCK // QUANTITY
+
+    file_cursor.execute("SELECT stored_quantity FROM drug WHERE drug_id = 1")
+    stored_quantity = file_cursor.fetchone()['stored_quantity']
+    assert stored_quantity == INITIAL_STOCK - QUANTITY * len(accepted)
+    assert stored_quantity >= 0
+
+    # 每次成功的开药恰好一张缴费单和一条处方，被拒绝的开药没有留下缴费单
+    assert _count(file_cursor, "SELECT COUNT(*) AS count FROM payment") == len(accepted)
+    assert _count(file_cursor, "SELECT COUNT(*) AS count FROM prescription") == len(accepted)
+    assert _count(file_cursor, """
+        SELECT COUNT(*) AS count FROM payment y
+        WHERE NOT EXISTS (SELECT 1 FROM prescription p WHERE p.payment_id = y.payment_id)""") == 0
+    assert sorted(result['payment_id'] for result in accepted) == list(range(1, len(accepted) + 1))
+
+    # 各次开药返回的剩余库存互不相同，正好是依次扣减的结果
+    remaining = sorted(result['lines'][0]['stored_quantity'] for result in accepted)
+    assert remaining == [stored_quantity + QUANTITY * i for i in range(len(accepted))]
@@ -0,0 +1,70 @@
+"""
+主要写入路由的 SQL 语句预算
+
+预算按当前实现的语句数设定（含 POST 之后渲染页面的查询），并且不允许重复查询或 N+1：
+开具多种药品、批量缴费的语句数不随药品或缴费单的数量增长；批量受理除逐条生成的缴费单外也是如此。
+"""
+import pytest
+
+from db.querywatch import assert_query_budget
+
+REGISTRATIONS = 3
+
+
+@pytest.fixture
+def registered(client):
+    """病人 1 在内科挂号 REGISTRATIONS 次（待分配医生）"""
+    client.post('/patient/login', data={'patient_id': 1})
+    for _ in range(REGISTRATIONS):
+        client.post('/patient/create_registration', data={'department_id': 1})
+    return client
+
+
+@pytest.fixture
+def assigned(registered):
+    """上述挂号全部分配给张医生（生成挂号费缴费单）"""
+    registered.post('/admin/registrations',
+                    data={'doctor_id': 1, 'registration_id': list(range(1, REGISTRATIONS + 1))})
+    return registered
+
+
+@pytest.fixture
+def prescribed(assigned):
+    """张医生为挂号 1 开具两种药品"""
+    assigned.post('/doctor/login', data={'doctor_id': 1})
+    assigned.post('/doctor/create_prescription',
+                  data={'registration_id': 1, 'drug_id': [1, 2], 'quantity': [2, 1]})
+    assigned.post('/patient/login', data={'patient_id': 1})
+    return assigned
+
+
+@pytest.mark.parametrize('registration_ids, max_queries', [([1], 8), ([1, 2], 9)])
+def test_admin_registrations_post(registered, registration_ids, max_queries):
+    # 最后一个挂号仍留在未受理列表中，页面按科室查询医生列表；
+    # 每个挂号的缴费单逐条 INSERT（缴费号取自各自的 INSERT 响应），受理多个挂号时这条语句按挂号数重复
+    response = assert_query_budget(registered, 'post', '/admin/registrations', max_queries=max_queries,
+                                   allow_redundant=len(registration_ids) > 1,
+                                   data={'doctor_id': 1, 'registration_id': registration_ids})
+    assert response.status_code == 200
+    assert f'挂号受理成功 {len(registration_ids)} 个' in response.get_data(as_text=True)
+
+
+def test_doctor_create_prescription_post(assigned):
+    assigned.post('/doctor/login', data={'doctor_id': 1})
+    response = assert_query_budget(assigned, 'post', '/doctor/create_prescription', max_queries=7,
+                                   allow_redundant=False,
+                                   data={'registration_id': 1, 'drug_id': [1, 2], 'quantity': [2, 1]})
+    assert response.status_code == 302
+
+
+def test_patient_payment_post_single(prescribed):
+    response = assert_query_budget(prescribed, 'post', '/patient/payment', max_queries=6,
+                                   allow_redundant=False, data={'payment_id': 1})
+    assert response.status_code == 200
+
+
+def test_patient_payment_post_all(prescribed):
+    response = assert_query_budget(prescribed, 'post', '/patient/payment', max_queries=7,
+                                   allow_redundant=False, data={'action': 'all'})
+    assert response.status_code == 200
+    assert '缴费成功：共 4 笔' in response.get_data(as_text=True)
@@ -0,0 +1,52 @@
+"""
+挂号状态：未开处方的挂号缴清挂号费后可以结束就诊
+"""
+import pytest
+
+import entity.payment as payment_module
+import entity.prescription as prescription_module
+import entity.registration as registration_module
+
+
+def _status(cursor, registration_id=1):
+    cursor.execute("SELECT r.status, v.status AS view_status FROM registration r "
+                   "JOIN registration_view v ON v.registration_id = r.registration_id WHERE r.registration_id = %s",
+                   (registration_id,))
+    row = cursor.fetchone()
+    assert row['view_status'] == row['status']
+    return row['status']
+
+
+@pytest.fixture
+def assigned(cursor):
+    """挂号 1 已分配张医生，挂号费缴费单尚未缴费"""
+    registration_module.create_registration(cursor, 1, 1)
+    [item] = registration_module.process_registrations(cursor, [(1, 1)], 50)
+    assert item['status'] == 'assigned'
+    return item['payment_id']
+
+
+def test_close_without_prescription(cursor, assigned):
+    assert not registration_module.close_registration(cursor, 1, 1)  # 挂号费未缴
+
+    assert payment_module.complete_payment(cursor, assigned)
+    assert _status(cursor) == 'paid'
+    assert registration_module.close_registration(cursor, 1, 1)
+    assert _status(cursor) == 'closed'
+
+
+def test_settle_registration_fee_without_prescription(cursor, assigned):
+    result = payment_module.settle_payments(cursor, 1)
+    assert result['registration_ids'] == [1]
+    assert _status(cursor) == 'paid'
+
+
+def test_prescribe_after_registration_fee_paid(cursor, assigned):
+    assert payment_module.complete_payment(cursor, assigned)
+    result = prescription_module.prescribe_drugs(cursor, 1, [(1, 2)])
+    assert _status(cursor) == 'prescribed'
+    assert not registration_module.close_registration(cursor, 1, 1)  # 处方费用未缴
+
+    assert payment_module.complete_payment(cursor, result['payment_id'])
+    assert _status(cursor) == 'paid'
+    assert registration_module.close_registration(cursor, 1, 1)
@@ -0,0 +1,79 @@
+"""
+预约时段：两次预约争抢最后一个空闲时段时只有一个成功，另一个换下一个空闲时段
+"""
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import entity.slot as slot_module
+from schedule.slots import slot_index
+
+SLOT_COUNT = 2
+
+
+@pytest.fixture
+def tomorrow(file_cursor):
+    """张医生每天 8:00 起出诊 SLOT_COUNT 个 30 分钟的时段，明天的第一个时段已被预约，只剩最后一个"""
+    for weekday in range(7):
+        assert slot_module.set_slot_template(file_cursor, 1, weekday, 480, 30, SLOT_COUNT)
+    day = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time())
+    assert slot_module.book_slot(file_cursor, 1, 1, day.date(), 0, 50)
+    return day
+
+
+def _booked(result):
+    return result['slot_date'], result['slot_index']
+
+
+def _count(cursor, sql):
+    cursor.execute(sql)
+    return cursor.fetchone()['count']
+
+
+def test_concurrent_bookings_for_last_slot(file_backend, file_cursor, tomorrow):
+    barrier = threading.Barrier(2)
+    results = []
+    lock = threading.Lock()
+
+    def book():
+        connection = file_backend.connect()
+        try:
+            cursor = connection.cursor()
+            barrier.wait()
+            # 两个请求同时占用最后一个时段，失败的一方改约下一个空闲时段
+            result = slot_module.book_slot(cursor, 1, 1, tomorrow.date(), SLOT_COUNT - 1, 50)
+            with lock:
+                results.append(result)
+            if result is None:
+                result = slot_module.book_next_slot(cursor, 1, 1, 50, after=tomorrow)
+                with lock:
+                    results.append(result)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=book) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 只有一个占到最后一个时段，另一个换到后天的第一个时段
+    assert sum(result is None for result in results) == 1
+    assert sorted(_booked(result) for result in results if result) == [
+        (tomorrow.date(), SLOT_COUNT - 1), (tomorrow.date() + timedelta(days=1), 0)]
+    # 每次成功的预约恰好一条挂号和一张缴费单
+    assert _count(file_cursor, "SELECT COUNT(*) AS count FROM registration") == 3
+    assert _count(file_cursor, "SELECT COUNT(*) AS count FROM payment") == 3
+
+
+def test_book_next_slot_skips_slot_taken_by_another_process(file_cursor, tomorrow):
+    # 本进程的索引已加载，之后最后一个时段被其他进程预约（只改了数据库中的位图）
+    assert slot_index.next_free(file_cursor, 1, after=tomorrow)['slot_index'] == SLOT_COUNT - 1
+    file_cursor.execute("UPDATE doctor_slot_day SET booked = booked | %s WHERE doctor_id = 1 AND slot_date = %s",
+                        (1 << (SLOT_COUNT - 1), tomorrow.date()))
+
+    # 选中的时段比较并设置失败，跳过它改约下一个空闲时段，失败的尝试不留下缴费单
+    result = slot_module.book_next_slot(file_cursor, 1, 1, 50, after=tomorrow)
+    assert _booked(result) == (tomorrow.date() + timedelta(days=1), 0)
+    assert _count(file_cursor, "SELECT COUNT(*) AS count FROM payment") == 2
@@ -0,0 +1,44 @@
+"""
+出诊时段模板的设置与覆盖
+"""
+import entity.slot as slot_module
+
+
+class _FailingInsertCursor:
+    """插入出诊时段模板时报错的游标，其余语句照常执行"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def execute(self, sql, params=None):
+        if 'INSERT INTO doctor_slot_template' in sql:
+            raise RuntimeError('insert failed')
+        return self._cursor.execute(sql, params)
+
+
+def _templates(cursor):
+    cursor.execute("SELECT doctor_id, weekday, start_minute, slot_minutes, slot_count FROM doctor_slot_template "
+                   "ORDER BY doctor_id, weekday")
+    return [tuple(row.values()) for row in cursor.fetchall()]
+
+
+def test_set_slot_template_overwrites(cursor):
+    assert slot_module.set_slot_template(cursor, 1, 0, 480, 30, 8)
+    assert slot_module.set_slot_template(cursor, 1, 0, 540, 20, 6)
+    assert _templates(cursor) == [(1, 0, 540, 20, 6)]
+
+
+def test_set_slot_template_rejects_invalid(cursor):
+    assert not slot_module.set_slot_template(cursor, 1, 7, 480, 30, 8)
+    assert not slot_module.set_slot_template(cursor, 1, 0, 1380, 30, 4)  # 超过午夜
+    assert not slot_module.set_slot_template(cursor, 999, 0, 480, 30, 8)  # 医生不存在
+    assert _templates(cursor) == []
+
+
+def test_set_slot_template_keeps_old_template_when_insert_fails(cursor):
+    assert slot_module.set_slot_template(cursor, 1, 0, 480, 30, 8)
+    assert not slot_module.set_slot_template(_FailingInsertCursor(cursor), 1, 0, 540, 20, 6)
+    assert _templates(cursor) == [(1, 0, 480, 30, 8)]
@@ -0,0 +1,100 @@
+"""
+create_* 与开具处方写入路径的语句数
+
+新记录的编号随 INSERT 响应返回（cursor.lastrowid），不再单独查询 LAST_INSERT_ID()；引用的记录是否存在
+由外键约束保证，不再预先查询。除记录本身的 INSERT 外，同一事务中还会维护读模型：工作列表
+（registration_view）、病人概览版本号（patient_summary_version）与姓名检索词（name_search_token），
+这些语句是读取路径省去查询的代价，按函数如实计入下面的语句数。BEGIN/COMMIT 由连接发出，不经过游标，不计入。
+"""
+import pytest
+
+import entity.drug as drug_module
+import entity.patient as patient_module
+import entity.payment as payment_module
+import entity.prescription as prescription_module
+import entity.registration as registration_module
+from db.instrument import InstrumentedCursor, QueryStats
+
+# 每个函数发出的语句数（含读模型维护语句）
+STATEMENT_BUDGET = {
+    # INSERT patient、重建姓名检索词（DELETE + 批量 INSERT）、初始化概览版本号
+    'register_patient': 4,
+    # INSERT drug
+    'add_drug': 1,
+    # INSERT payment、递增概览版本号
+    'create_payment': 2,
+    # INSERT registration、写入工作列表、递增概览版本号
+    'create_registration': 3,
+    # 条件扣减库存、读取单价与挂号、INSERT payment、批量 INSERT prescription、
+    # 挂号改为 prescribed、写入工作列表、递增概览版本号
+    'prescribe_drugs': 7,
+}
+
+
+@pytest.fixture
+def counting(cursor):
+    """记录语句的游标"""
+    return InstrumentedCursor(cursor, QueryStats())
+
+
+def _assert_statements(counting, expected):
+    statements = list(counting.stats.by_fingerprint)
+    assert counting.stats.statements == expected, statements
+    assert not any('LAST_INSERT_ID' in sql for sql in statements)
+
+
+def test_register_patient(counting):
+    assert patient_module.register_patient(counting, '李四', '女', '138-1234-5670') == 2
+    _assert_statements(counting, STATEMENT_BUDGET['register_patient'])
+
+
+def test_add_drug(counting):
+    assert drug_module.add_drug(counting, '布洛芬', 50, 12.0) == 3
+    _assert_statements(counting, STATEMENT_BUDGET['add_drug'])
+
+
+def test_create_payment(counting):
+    assert payment_module.create_payment(counting, 1, 50) == 1
+    _assert_statements(counting, STATEMENT_BUDGET['create_payment'])
+
+
+def test_create_registration(counting):
+    assert registration_module.create_registration(counting, 1, 1) == 1
+    _assert_statements(counting, STATEMENT_BUDGET['create_registration'])
+
+
+def test_prescribe_drugs(counting, cursor):
+    registration_module.create_registration(cursor, 1, 1)
+    registration_module.process_registration(cursor, 1, 1)
+
+    result = prescription_module.prescribe_drugs(counting, 1, [(1, 2)])
+    assert result['payment_id'] == 1
+    _assert_statements(counting, STATEMENT_BUDGET['prescribe_drugs'])
+
+
+@pytest.mark.parametrize('patient_id, department_id', [(999, 1), (1, 999)])
+def test_create_registration_foreign_key_violation(counting, cursor, patient_id, department_id):
+    assert registration_module.create_registration(counting, patient_id, department_id) is None
+    assert counting.stats.errors == 1
+    _assert_statements(counting, 1)  # 失败的 INSERT，之后的语句不再执行
+
+    cursor.execute("SELECT COUNT(*) AS count FROM registration")
+    assert cursor.fetchone()['count'] == 0
+    cursor.execute("SELECT COUNT(*) AS count FROM registration_view")
+    assert cursor.fetchone()['count'] == 0
+
+
+def test_create_payment_foreign_key_violation(counting, cursor):
+    assert payment_module.create_payment(counting, 999, 50) is None
+    _assert_statements(counting, 1)  # 失败的 INSERT，之后的语句不再执行
+
+    cursor.execute("SELECT COUNT(*) AS count FROM payment")
+    assert cursor.fetchone()['count'] == 0
+
+
+def test_prescribe_drugs_unknown_registration(counting, cursor):
+    assert prescription_module.prescribe_drugs(counting, 999, [(1, 2)]) is None
+    _assert_statements(counting, 2)  # 扣减库存后查不到挂号，整体回滚
+
+    cursor.execute("SELECT stored_quantity FROM drug WHERE drug_id = 1")
+    assert cursor.fetchone()['stored_quantity'] == 100